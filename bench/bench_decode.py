@@ -0,0 +1,105 @@
+"""
+Microbenchmark decode pesan kline: cara lama (json.loads semua pesan lalu
+cek k.x) vs utils.kline_decode (buang kline belum close dari raw string,
+parse hanya yang final).
+
+    python bench/bench_decode.py                      # payload sintetis format Binance
+    python bench/bench_decode.py --record 60          # rekam 60 detik dari fstream ke bench/payloads.jsonl
+    python bench/bench_decode.py --file bench/payloads.jsonl
+
+Hasil dalam pesan / detik untuk 1 core (single thread).
+"""
+import argparse, asyncio, json, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from utils.kline_decode import decode_closed_kline, JSON_BACKEND
+
+DEFAULT_FILE = os.path.join(os.path.dirname(__file__), "payloads.jsonl")
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT", "DOGEUSDT", "ADAUSDT", "LINKUSDT"]
+
+
+def synthetic_payloads(n=200_000, tf="1m", updates_per_candle=240):
+    """Payload combined stream seperti fstream: ~4 update/detik per stream, 1 final per candle."""
+    out = []
+    t0 = 1_700_000_000_000
+    for i in range(n):
+        sym = SYMBOLS[i % len(SYMBOLS)]
+        step = i // len(SYMBOLS)
+        final = step % updates_per_candle == updates_per_candle - 1
+        ot = t0 + (step // updates_per_candle) * 60_000
+        p = 100 + random.random()
+        k = {
+            "t": ot, "T": ot + 59_999, "s": sym, "i": tf, "f": 100, "L": 200,
+            "o": f"{p:.4f}", "c": f"{p + 0.1:.4f}", "h": f"{p + 0.2:.4f}", "l": f"{p - 0.2:.4f}",
+            "v": f"{random.random() * 1000:.3f}", "n": 100, "x": final,
+            "q": "12345.6", "V": "500.1", "Q": "6000.2", "B": "0",
+        }
+        data = {"e": "kline", "E": ot + 250 * (step % updates_per_candle), "s": sym, "k": k}
+        out.append(json.dumps({"stream": f"{sym.lower()}@kline_{tf}", "data": data}, separators=(",", ":")))
+    return out
+
+
+async def record(seconds, path):
+    import websockets
+    streams = "/".join(f"{s.lower()}@kline_1m" for s in SYMBOLS)
+    url = os.getenv("BINANCE_FAPI_URL", "wss://fstream.binance.com") + "/stream?streams=" + streams
+    n = 0
+    with open(path, "w") as f:
+        async with websockets.connect(url) as ws:
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                f.write(await ws.recv() + "\n")
+                n += 1
+    print(f"Recorded {n} payloads -> {path}")
+
+
+def decode_old(raw):
+    """Cara lama SignalPipeline.on_message."""
+    parsed = json.loads(raw)
+    data = parsed.get("data", {})
+    k = data.get("k", {})
+    if not k or not k.get("x", False):
+        return None
+    return (k["s"], k["i"], int(k["t"]),
+            float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]))
+
+
+def bench(fn, payloads, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for raw in payloads:
+            fn(raw)
+        best = min(best, time.perf_counter() - t)
+    return len(payloads) / best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--file", help="payload rekaman, 1 pesan per baris")
+    ap.add_argument("--record", type=int, metavar="SEC", help="rekam payload live dari Binance dulu")
+    ap.add_argument("-n", type=int, default=200_000, help="jumlah payload sintetis")
+    args = ap.parse_args()
+
+    if args.record:
+        asyncio.run(record(args.record, args.file or DEFAULT_FILE))
+        args.file = args.file or DEFAULT_FILE
+    if args.file:
+        with open(args.file) as f:
+            payloads = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        payloads = synthetic_payloads(args.n)
+
+    final = sum(1 for raw in payloads if decode_old(raw))
+    assert [decode_old(r) for r in payloads if decode_old(r)] == \
+        [decode_closed_kline(r)[:8] for r in payloads if decode_closed_kline(r)], "hasil decode berbeda"
+    print(f"{len(payloads)} payloads, {final} final ({100 * final / len(payloads):.2f}%), backend={JSON_BACKEND}")
+
+    old = bench(decode_old, payloads)
+    new = bench(decode_closed_kline, payloads)
+    print(f"before (json.loads all): {old:>12,.0f} msg/s/core")
+    print(f"after  (fast path)     : {new:>12,.0f} msg/s/core  ({new / old:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import asyncio
-import time
-import json
 import os
-import requests
 from datetime import datetime, timezone, timedelta
 
+import httpx
+
+from utils.data_store import load_json, save_json
+from utils.http_client import get_json
+from utils.volume_ranking import VolumeRanking
+
 # ==========================
 # KONFIGURASI DASAR
 # ==========================
@@ -13,7 +16,10 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 KNOWN = os.path.join(DATA_DIR, "known_symbols.json")
 SYMBOLS = os.path.join(DATA_DIR, "symbols.json")
-FAPI = os.getenv("BINANCE_REST_URL", "https://fapi.binance.com")
+# exchangeInfo jarang berubah: cukup diambil ulang tiap beberapa jam
+EXCHANGE_INFO_TTL = int(os.getenv("EXCHANGE_INFO_TTL", "21600"))
+# ranking top volume live dari !ticker@arr (0 = REST /ticker/24hr per interval)
+TOP_VOLUME_STREAM = os.getenv("TOP_VOLUME_STREAM", "1") == "1"
 
 # Koin yang selalu dipantau (whitelist manual)
 WHITELIST = [
@@ -25,95 +31,121 @@ WHITELIST = [
 # ==========================
 # FUNGSI UTILITAS
 # ==========================
-def load_known():
-    if os.path.exists(KNOWN):
-        return json.load(open(KNOWN))
-    return {}
-
-def save_known(data):
-    json.dump(data, open(KNOWN, "w"), indent=2)
-
-def save_symbols(symbols):
-    json.dump(
-        {"symbols": symbols, "updated_at": datetime.now(timezone.utc).isoformat()},
-        open(SYMBOLS, "w"),
-        indent=2,
+# file I/O jalan di thread, tulis atomik (tmp + rename) lewat data_store
+async def load_known():
+    return await asyncio.to_thread(load_json, KNOWN) or {}
+
+async def save_known(data):
+    await asyncio.to_thread(save_json, KNOWN, data)
+
+async def save_symbols(symbols):
+    await asyncio.to_thread(
+        save_json, SYMBOLS, {"symbols": symbols, "updated_at": datetime.now(timezone.utc).isoformat()}
     )
 
 # ==========================
 # FETCH DATA DARI BINANCE
 # ==========================
-def get_all_futures_symbols():
+async def get_all_futures_symbols():
     """Ambil semua simbol futures aktif di Binance"""
     try:
-        r = requests.get(f"{FAPI}/fapi/v1/exchangeInfo", timeout=10)
-        r.raise_for_status()
-        data = r.json()
+        data = await get_json("/fapi/v1/exchangeInfo", cache_ttl=EXCHANGE_INFO_TTL)
         syms = [
             s["symbol"]
             for s in data.get("symbols", [])
             if s.get("status") == "TRADING" and s["symbol"].endswith("USDT")
         ]
         return syms
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         print(f"⚠️ Gagal ambil semua simbol futures: {e}")
         return ["BTCUSDT"]  # fallback aman
 
-def get_top_volume(limit=40):
-    """Ambil simbol berdasarkan volume 24 jam tertinggi"""
+async def get_tickers_24h():
+    """Ticker 24 jam semua simbol (seed / fallback ranking top volume)"""
     try:
-        r = requests.get(f"{FAPI}/fapi/v1/ticker/24hr", timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        usdt = [d for d in data if d.get("symbol", "").endswith("USDT")]
-        usdt_sorted = sorted(usdt, key=lambda x: float(x.get("quoteVolume", 0)), reverse=True)
-        return [d["symbol"] for d in usdt_sorted[:limit]]
-    except requests.exceptions.RequestException as e:
+        return await get_json("/fapi/v1/ticker/24hr")
+    except (httpx.HTTPError, ValueError) as e:
         print(f"⚠️ Gagal ambil data top volume: {e}")
-        return ["BTCUSDT"]
+        return []
 
 # ==========================
 # REFRESH SYMBOLS PERIODIK (ASYNC FIX)
 # ==========================
-async def refresh_symbols_periodic(top_limit=40, window_days=7, interval=3600):
-    """Perbarui daftar simbol aktif setiap jam (asynchronous)"""
-    while True:
-        try:
-            now = datetime.now(timezone.utc)
-
-            # Ambil semua futures aktif
-            all_syms = get_all_futures_symbols()
-
-            # Muat daftar simbol yang sudah dikenal
-            known = load_known()
-
-            # Tambahkan simbol baru (new listing)
-            for s in all_syms:
-                if s not in known:
-                    known[s] = now.isoformat()
-            save_known(known)
-
-            # Hitung cutoff untuk new listing
-            cutoff = now - timedelta(days=window_days)
-            new_listing = [
-                s for s, iso in known.items() if datetime.fromisoformat(iso) >= cutoff
-            ]
-
-            # Ambil top volume
-            top = get_top_volume(top_limit)
-
+async def refresh_symbols_periodic(top_limit=40, window_days=7, interval=3600, on_update=None,
+                                   stream=TOP_VOLUME_STREAM):
+    """
+    Perbarui daftar simbol aktif (asynchronous).
+    Setiap interval: exchangeInfo + new listing. Top volume datang live dari
+    stream !ticker@arr (VolumeRanking, dengan hysteresis) dan perubahan
+    anggota top langsung diterapkan; REST /ticker/24hr hanya untuk seed awal
+    dan kalau stream mati.
+    on_update(symbols) dipanggil setiap kali daftar baru tersimpan.
+    """
+    lock = asyncio.Lock()
+    new_listing = []
+    last = None
+
+    async def publish(top, reason):
+        nonlocal last
+        async with lock:
             # Gabungkan semua simbol unik (prioritaskan whitelist & aktif)
             combined = list(dict.fromkeys(WHITELIST + new_listing + top))
 
-            # Batasi maksimum (default 60)
+            # Batasi maksimum
             combined = combined[:300]
-            save_symbols(combined)
-
-            print(f"✅ Refreshed {len(combined)} symbols at {now.isoformat()}")
+            if combined == last:
+                return
+            last = combined
+            await save_symbols(combined)
+            if on_update is not None:
+                res = on_update(combined)
+                if asyncio.iscoroutine(res):
+                    await res
+            print(f"✅ Refreshed {len(combined)} symbols ({reason}) at {datetime.now(timezone.utc).isoformat()}")
             print(f"Top volume: {len(top)} | New listing: {len(new_listing)} | Whitelist: {len(WHITELIST)}")
 
-        except Exception as e:
-            print(f"❌ coin_manager error: {e}")
+    ranking = VolumeRanking(top_limit, on_change=lambda top: publish(top, "volume ranking"))
+    stream_task = None
 
-        # Tunggu sesuai interval sebelum refresh lagi
-        await asyncio.sleep(interval)
+    try:
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+
+                # Ambil semua futures aktif
+                all_syms = await get_all_futures_symbols()
+                if len(all_syms) > 1:
+                    ranking.set_allowed(all_syms)
+
+                # Muat daftar simbol yang sudah dikenal
+                known = await load_known()
+
+                # Tambahkan simbol baru (new listing)
+                for s in all_syms:
+                    if s not in known:
+                        known[s] = now.isoformat()
+                await save_known(known)
+
+                # Hitung cutoff untuk new listing
+                cutoff = now - timedelta(days=window_days)
+                new_listing[:] = [
+                    s for s, iso in known.items() if datetime.fromisoformat(iso) >= cutoff
+                ]
+
+                # Top volume: seed dari REST sekali (dan kalau stream tidak update)
+                if not stream or ranking.stale:
+                    ranking.update(await get_tickers_24h())
+                    ranking.rerank()
+                if stream and stream_task is None:
+                    stream_task = asyncio.create_task(ranking.run())
+                await publish(ranking.top(), "periodic")
+
+            except Exception as e:
+                print(f"❌ coin_manager error: {e}")
+
+            # Tunggu sesuai interval sebelum refresh lagi
+            await asyncio.sleep(interval)
+    finally:
+        # dibatalkan (mis. lease universe pindah ke worker shard lain): stream ranking ikut berhenti
+        if stream_task is not None:
+            stream_task.cancel()
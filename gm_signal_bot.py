@@ -1,146 +1,414 @@
 # gm_signal_bot.py
-import asyncio, json, os, time
-import pandas as pd
-import websockets
-from collections import deque, defaultdict
+import asyncio, os, time
+import numpy as np
+from collections import defaultdict
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
-from utils.telegram_utils import make_bot, send_message_async
-from utils.data_store import load_json, save_json
-from utils.signal_engine_v2 import detect_signal, recommend_leverage
+from utils.telegram_utils import make_bot, send_message_async, send_photo_async
+from utils.kline_buffer import KlineStore, PRICE_FIELDS, interval_to_ms
+from utils.kline_decode import decode_closed_kline
+from utils.eval_workers import EVAL_WORKERS, EvalWorkerPool, shard_of
+from utils.kline_archive import KLINE_ARCHIVE, KlineArchive
+from utils.metrics import CLOSED_CANDLES, SIGNALS, STAGE_SECONDS, WS_DROPPED
+from utils.charts import CAPTION_MAX, SIGNAL_CHARTS, ChartRenderer, chart_job
+from utils.close_batcher import CloseBatcher
+from utils.shared_store import MemoryStore, call as store_call
+from utils.backfill import backfill_history, fetch_gap
+from utils.resampler import CandleResampler
+from utils.stream_manager import StreamManager
+from utils.signal_engine_v2 import (
+    detect_signal_incremental, detect_signals_batch, make_indicator_state, recommend_leverage,
+)
 
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-FSTREAM = os.getenv("BINANCE_FAPI_URL", "wss://fstream.binance.com") + "/stream?streams="
 
 TIMEFRAMES = [tf.strip() for tf in os.getenv("TIMEFRAMES", "1m,3m,5m").split(",")]
+BASE_TF = os.getenv("BASE_TF", "1m")
+LOCAL_RESAMPLE = os.getenv("LOCAL_RESAMPLE", "1") == "1"  # bangun TF besar dari candle BASE_TF
+# TF kelipatan BASE_TF dibangun lokal, sisanya tetap subscribe langsung
+RESAMPLED_TFS = [tf for tf in TIMEFRAMES if LOCAL_RESAMPLE and CandleResampler.supports(BASE_TF, tf)]
+STREAM_TFS = list(dict.fromkeys(([BASE_TF] if RESAMPLED_TFS else []) + [tf for tf in TIMEFRAMES if tf not in RESAMPLED_TFS]))
 ALERT_COOLDOWN_SEC = int(os.getenv("COOLDOWN_SECONDS", "90"))
+TP_ATR = (0.5, 1.0, 1.5)   # TP1..TP3 = entry +/- k * ATR
+SL_ATR = 0.8
 HISTORY_LEN = int(os.getenv("HISTORY_LEN", "300"))
-BATCH_SIZE = int(os.getenv("BATCH_SIZE", "50"))  # jumlah coin per koneksi websocket
+HISTORY_DTYPE = os.getenv("HISTORY_DTYPE", "float64")  # float32 untuk hemat memori
+EVAL_MODE = os.getenv("EVAL_MODE", "batch")  # batch (per boundary) | incremental (per candle)
+BATCH_WINDOW_SEC = float(os.getenv("BATCH_WINDOW_SEC", "0.3"))  # jendela kumpul close per boundary
+BACKFILL_ON_START = os.getenv("BACKFILL_ON_START", "1") == "1"  # isi history dari REST sebelum WS
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-SIGNALS_ACTIVE = os.path.join(DATA_DIR, "signals_active.json")
-os.makedirs(DATA_DIR, exist_ok=True)
-if not os.path.exists(SIGNALS_ACTIVE):
-    save_json(SIGNALS_ACTIVE, {})
+# histogram per tahap (lihat utils/metrics.py)
+_STAGE = {name: STAGE_SECONDS.labels(stage=name) for name in (
+    "exchange", "close_to_recv", "decode", "history", "indicators", "detect", "cooldown", "tg_enqueue")}
 
 
-def save_active(d):
-    with open(SIGNALS_ACTIVE, "w") as f:
-        json.dump(d, f, indent=2, default=str)
+# ==========================================
+# PIPELINE: HISTORY -> DETEKSI -> ALERT
+# ==========================================
+class SignalPipeline:
+    """
+    State bersama semua koneksi websocket: history kline, indikator, cooldown
+    dan evaluasi sinyal (batch per boundary candle atau incremental per candle).
+    """
 
+    def __init__(self, store=None, bot=None, eval_mode=None, tracker=None, workers=0, clock=None, archive=None,
+                 shared=None, charts=None, registry=None, fill_gaps=None):
+        self.store = store if store is not None else KlineStore(HISTORY_LEN, HISTORY_DTYPE)
+        self.symbols = set()   # universe yang sedang dipantau
+        self.bot = bot
+        self.tracker = tracker
+        self.eval_mode = eval_mode or EVAL_MODE
+        self.indicators = {}
+        self.resamplers = {}
+        # cooldown / dedupe / signal aktif; SqliteStore kalau dibagi dengan worker shard lain
+        self.shared = shared if shared is not None else MemoryStore()
+        self.clock = clock or time.time   # replay memakai jam simulasi
+        self.batcher = CloseBatcher(self.evaluate_boundary, None if clock else BATCH_WINDOW_SEC)
+        self.sink = self.emit  # tujuan signal hasil evaluasi (di worker: kirim ke proses utama)
+        self.conn_of = lambda sym: ""   # symbol -> id koneksi websocket (label metrik), diisi monitor_chunk
+        # workers > 0: history & evaluasi pindah ke proses worker per shard symbol
+        self.pool = EvalWorkerPool(workers, worker_pipeline, self.emit, self._reseed_worker) if workers else None
+        self.archive = archive  # KlineArchive: rekam semua kline closed dari websocket
+        self.charts = charts    # ChartRenderer: signal dikirim sebagai foto chart (fallback teks)
+        self.registry = registry  # SignalRegistry: signal yang dikirim dicatat untuk tracker TP/SL
+        # candle websocket yang melompat (bar hilang antara backfill dan subscribe) diisi dari REST;
+        # replay (clock simulasi) tidak pernah fetch
+        self.fill_gaps = clock is None if fill_gaps is None else fill_gaps
+        self._gaps = {}   # (symbol, tf) -> candle websocket yang antri selama gap diambil
+        self._tasks = set()
 
-def load_active():
-    if not os.path.exists(SIGNALS_ACTIVE):
-        return {}
-    return json.load(open(SIGNALS_ACTIVE))
+    async def on_message(self, raw, stale=False):
+        """
+        Handler pesan combined stream: hanya kline yang sudah close diproses.
+        stale: lag stream di atas INGEST_LAG_SHED_SEC, candle hanya masuk history tanpa evaluasi.
+        """
+        try:
+            # kline yang belum close (>95% pesan) dibuang sebelum parse JSON
+            t_recv, t0 = time.time(), time.perf_counter()
+            k = decode_closed_kline(raw)
+            if k is None or k[0] not in self.symbols:
+                return
+            _STAGE["decode"].observe(time.perf_counter() - t0)
+            _STAGE["exchange"].observe(t_recv - k[8] / 1000)
+            _STAGE["close_to_recv"].observe(t_recv - (k[2] + interval_to_ms(k[1])) / 1000)
+            if self.archive is not None:
+                self.archive.add(*k[:8])
+            if self.pool is not None:
+                if self.tracker is not None and k[1] == STREAM_TFS[0]:
+                    self.tracker.on_price(k[0], k[4], k[5])
+                if not self.pool.send_candle(*k[:8], evaluate=not stale):
+                    WS_DROPPED.inc(conn=self.conn_of(k[0]), reason="eval_queue")
+                return
+            await self.on_closed_kline(*k[:8], evaluate=not stale)
+        except Exception as e:
+            print("Processing error:", e)
 
+    async def _reseed_worker(self, i):
+        """Eval worker i di-spawn ulang: history symbol miliknya diisi lagi dari cache/REST."""
+        syms = [s for s in self.symbols if shard_of(s, self.pool.workers) == i]
+        store = KlineStore(HISTORY_LEN, HISTORY_DTYPE)
+        if BACKFILL_ON_START and syms:
+            await backfill_history(store, syms, list(dict.fromkeys(STREAM_TFS + TIMEFRAMES)), HISTORY_LEN)
+        self.pool.seed(store, syms)
 
-# ==========================================
-# MONITOR UNTUK SATU BATCH SYMBOL
-# ==========================================
-async def monitor_batch(symbols):
-    """Monitor 1 batch symbol"""
-    history = {
-        s: {
-            tf: {k: deque(maxlen=HISTORY_LEN) for k in ["open_time", "open", "high", "low", "close", "volume"]}
-            for tf in TIMEFRAMES
+    def drop_symbol(self, sym):
+        """Buang semua state symbol yang keluar dari universe."""
+        self.symbols.discard(sym)
+        self.store.drop_symbol(sym)
+        if self.pool is not None:
+            self.pool.drop_symbol(sym)
+        if self.archive is not None:
+            self.archive.drop_symbol(sym)
+        self.resamplers.pop(sym, None)
+        for key in [k for k in self.indicators if k[0] == sym]:
+            del self.indicators[key]
+        self.shared.release_symbol(sym)
+
+    async def on_closed_kline(self, sym, tf, open_time, o, h, l, c, v, evaluate=True):
+        """Masukkan 1 candle closed ke history lalu jadwalkan evaluasi (evaluate=False: history saja)."""
+        key = (sym, tf)
+        pending = self._gaps.get(key)
+        if pending is not None:
+            pending.append((open_time, o, h, l, c, v, evaluate))
+            return  # diproses setelah gap terisi, urutan tetap
+        buf = self.store.get(sym, tf)
+        last_t = buf.last_open_time
+        if last_t is not None and int(open_time) <= last_t:
+            return  # candle duplikat (mis. setelah reconnect)
+        step = interval_to_ms(tf)
+        if self.fill_gaps and last_t is not None and int(open_time) > last_t + step and tf in STREAM_TFS:
+            self._gaps[key] = [(open_time, o, h, l, c, v, evaluate)]
+            start = max(last_t + step, int(open_time) - self.store.capacity * step)
+            task = asyncio.get_running_loop().create_task(self._fill_gap(sym, tf, start, int(open_time)))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return
+        await self._ingest(sym, tf, buf, open_time, o, h, l, c, v, evaluate)
+
+    async def _fill_gap(self, sym, tf, start_ms, end_ms):
+        """Ambil bar [start_ms, end_ms) dari REST (history saja), lalu proses candle yang antri."""
+        key = (sym, tf)
+        try:
+            rows = await fetch_gap(sym, tf, start_ms, end_ms)
+            print(f"🩹 Gap {sym} {tf}: {len(rows)}/{(end_ms - start_ms) // interval_to_ms(tf)} bar diisi dari REST")
+        except Exception as e:
+            rows = ()
+            print(f"⚠️ Gap {sym} {tf} gagal diisi: {e}")
+        try:
+            # symbol bisa keluar dari universe selama fetch: store.get akan membuat buffer baru
+            if key not in self.store:
+                return
+            buf = self.store.get(sym, tf)
+            for r in rows:
+                if key not in self.store:
+                    return
+                if int(r[0]) > (buf.last_open_time or -1):
+                    await self._ingest(sym, tf, buf, int(r[0]), r[1], r[2], r[3], r[4], r[5], False)
+            pending = self._gaps[key]
+            while pending and key in self.store:
+                open_time, o, h, l, c, v, evaluate = pending.pop(0)
+                if int(open_time) > (buf.last_open_time or -1):
+                    await self._ingest(sym, tf, buf, open_time, o, h, l, c, v, evaluate)
+        finally:
+            self._gaps.pop(key, None)
+
+    async def _ingest(self, sym, tf, buf, open_time, o, h, l, c, v, evaluate):
+        t0 = time.perf_counter()
+        buf.append(open_time, o, h, l, c, v)
+        _STAGE["history"].observe(time.perf_counter() - t0)
+        CLOSED_CANDLES.inc(tf=tf)
+        if self.tracker is not None and tf == STREAM_TFS[0]:
+            self.tracker.on_price(sym, h, l)  # wick candle ikut dicek TP/SL
+
+        if tf == BASE_TF and RESAMPLED_TFS:
+            for candle in self._resample(sym, buf, open_time, o, h, l, c, v):
+                await self.on_closed_kline(sym, *candle, evaluate=evaluate)
+        if tf not in TIMEFRAMES:
+            return  # base TF hanya dipakai untuk resample
+
+        if self.eval_mode == "incremental":
+            t0 = time.perf_counter()
+            state = self.indicators.get((sym, tf))
+            if state is None:
+                # seed dari history yang sudah ada (backfill + candle ini)
+                state = self.indicators[(sym, tf)] = make_indicator_state(HISTORY_LEN)
+                views = buf.views()
+                for row in zip(views["open"], views["high"], views["low"], views["close"], views["volume"]):
+                    state.update(*row)
+            else:
+                state.update(o, h, l, c, v)
+            t1 = time.perf_counter()
+            _STAGE["indicators"].observe(t1 - t0)
+            if len(state) < 100 or not evaluate:
+                return
+            sig = detect_signal_incremental(state, self.now())
+            _STAGE["detect"].observe(time.perf_counter() - t1)
+            if sig:
+                sig["bar_close"] = (open_time + interval_to_ms(tf)) / 1000
+                await self.sink(sym, tf, sig)
+            return
+
+        if len(buf) >= 100 and evaluate:
+            self.batcher.add(tf, open_time, sym)
+
+    def _resample(self, sym, buf, open_time, o, h, l, c, v):
+        rs = self.resamplers.get(sym)
+        if rs is None:
+            rs = self.resamplers[sym] = CandleResampler(BASE_TF, RESAMPLED_TFS)
+            # bucket yang sedang berjalan diisi dari history base (backfill)
+            views = buf.views(64)
+            rs.prime(zip(*(views[f][:-1] for f in ("open_time", "open", "high", "low", "close", "volume"))))
+        return rs.add(open_time, o, h, l, c, v)
+
+    async def evaluate_boundary(self, tf, open_time, symbols):
+        """Evaluasi semua symbol yang close di boundary yang sama sekaligus."""
+        # kelompokkan per panjang history supaya bisa di-stack jadi matrix
+        groups = defaultdict(list)
+        for sym in symbols:
+            buf = self.store.get(sym, tf)
+            groups[len(buf)].append(sym)
+
+        bar_close = (open_time + interval_to_ms(tf)) / 1000
+        for n, syms in groups.items():
+            # batch: "indicators" = susun matrix history, "detect" = indikator + rule (satu pass numpy)
+            t0 = time.perf_counter()
+            bufs = [self.store.get(s, tf) for s in syms]
+            cols = [np.stack([b.view(f, n) for b in bufs]) for f in PRICE_FIELDS]
+            t1 = time.perf_counter()
+            sigs = detect_signals_batch(*cols, now=self.now())
+            _STAGE["indicators"].observe(t1 - t0)
+            _STAGE["detect"].observe(time.perf_counter() - t1)
+            for sym, sig in zip(syms, sigs):
+                if sig:
+                    sig["bar_close"] = bar_close
+                    await self.sink(sym, tf, sig)
+
+    def now(self):
+        return datetime.fromtimestamp(self.clock(), timezone.utc)
+
+    async def emit(self, sym, tf, sig):
+        """Cek cooldown, susun pesan, kirim ke Telegram."""
+        key = f"{sym}|{tf}"
+        t0 = time.perf_counter()
+        now_ts = self.clock()
+        cooling = not await store_call(self.shared, "claim_cooldown", key, now_ts, ALERT_COOLDOWN_SEC)
+        _STAGE["cooldown"].observe(time.perf_counter() - t0)
+        SIGNALS.inc(tf=tf, result="cooldown" if cooling else "sent", conn=self.conn_of(sym))
+        if cooling:
+            return
+
+        atr, price = sig["atr"], sig["price"]
+        d = 1 if sig["side"] == "buy" else -1
+        tp1, tp2, tp3 = (price + d * k * atr for k in TP_ATR)
+        sl = price - d * SL_ATR * atr
+
+        leverage = recommend_leverage(sig["confidence"], sig.get("atr_pct", 0))
+        tstamp = self.now().isoformat()
+
+        msg = (
+            "🚀 *VIP GOLDEN SIGNAL* 🚀\n\n"
+            f"💎 Pair: *{sym}*\n"
+            f"🕒 TF: *{tf}*\n"
+            f"📈 Side: *{sig['side'].upper()}*\n"
+            f"💰 Entry: `{price:.6f}`\n"
+            f"🎯 Targets:\n"
+            f"• TP1: `{tp1:.6f}`\n• TP2: `{tp2:.6f}`\n• TP3: `{tp3:.6f}`\n"
+            f"🛑 Stoploss: `{sl:.6f}`\n\n"
+            f"⚙️ Confidence: *{sig['confidence']}%*\n"
+            f"🔧 Leverage Suggestion: *{leverage}*\n\n"
+            f"📖 Reason: {sig['reason']}\n"
+            f"📆 Time: {tstamp}"
+        )
+
+        trade = {
+            "symbol": sym, "tf": tf, "side": sig["side"], "entry": price,
+            "tp1": tp1, "tp2": tp2, "tp3": tp3, "sl": sl,
+            "confidence": sig["confidence"], "leverage": leverage,
+            "status": "OPEN", "opened_at": tstamp,
         }
-        for s in symbols
-    }
+        await self.publish(trade, msg, sig.get("bar_close"))
 
-    bot = make_bot(TELEGRAM_TOKEN)
-    last_alert = defaultdict(lambda: 0.0)
+    async def publish(self, trade, msg, origin=None):
+        """Kirim signal ke Telegram (replay meng-override ini untuk simulasi TP/SL)."""
+        uid = f"{trade['symbol']}|{trade['tf']}|{trade['opened_at']}"
+        if self.shared.shared:
+            # worker shard lain (mis. saat symbol pindah pemilik) bisa mengevaluasi candle yang sama
+            if origin is not None and not await store_call(
+                    self.shared, "claim_once", f"signal|{trade['symbol']}|{trade['tf']}|{trade['side']}|{origin}", self.clock()):
+                return
+            await store_call(self.shared, "put_active", uid, trade)
+        if self.registry is not None:
+            self.registry.open(uid, trade)
+        if self.bot is None:
+            self.bot = make_bot(TELEGRAM_TOKEN)
+        t0 = time.perf_counter()
+        key = (trade["symbol"], trade["tf"])
+        if self.charts is not None and key in self.store and len(msg) <= CAPTION_MAX:
+            # render di proses chart; signal lain di boundary yang sama tidak menunggu
+            task = asyncio.get_running_loop().create_task(
+                self._send_chart(chart_job(self.store.get(*key), trade), msg, origin))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            await send_message_async(self.bot, TELEGRAM_CHAT_ID, msg, origin=origin)
+        _STAGE["tg_enqueue"].observe(time.perf_counter() - t0)
+        print(f"✅ Sent {trade['symbol']} {trade['tf']} {trade['side']} ({trade['confidence']}%) lev {trade['leverage']}")
 
-    streams = "/".join(f"{s.lower()}@kline_{tf}" for s in symbols for tf in TIMEFRAMES)
-    ws_url = FSTREAM + streams
 
-    while True:
-        try:
-            async with websockets.connect(ws_url, ping_interval=20, ping_timeout=10, max_queue=None) as ws:
-                async for raw in ws:
-                    try:
-                        parsed = json.loads(raw)
-                        data = parsed.get("data", {})
-                        k = data.get("k", {})
-                        if not k or not k.get("x", False):
-                            continue
-
-                        sym, tf = k["s"], k["i"]
-                        if sym not in history:
-                            continue
-
-                        h = history[sym][tf]
-                        h["open_time"].append(int(k["t"]))
-                        h["open"].append(float(k["o"]))
-                        h["high"].append(float(k["h"]))
-                        h["low"].append(float(k["l"]))
-                        h["close"].append(float(k["c"]))
-                        h["volume"].append(float(k["v"]))
-
-                        df = pd.DataFrame(h)
-                        if len(df) < 100:
-                            continue
-
-                        sig = detect_signal(df)
-                        if not sig:
-                            continue
-
-                        key = f"{sym}|{tf}"
-                        now_ts = time.time()
-                        if now_ts - last_alert[key] < ALERT_COOLDOWN_SEC:
-                            continue
-                        last_alert[key] = now_ts
-
-                        atr, price = sig["atr"], sig["price"]
-                        tp1 = price + (0.5 * atr if sig["side"] == "buy" else -0.5 * atr)
-                        tp2 = price + (1.0 * atr if sig["side"] == "buy" else -1.0 * atr)
-                        tp3 = price + (1.5 * atr if sig["side"] == "buy" else -1.5 * atr)
-                        sl = price - (0.8 * atr if sig["side"] == "buy" else -0.8 * atr)
-
-                        leverage = recommend_leverage(sig["confidence"], sig.get("atr_pct", 0))
-                        tstamp = datetime.now(timezone.utc).isoformat()
-
-                        msg = (
-                            "🚀 *VIP GOLDEN SIGNAL* 🚀\n\n"
-                            f"💎 Pair: *{sym}*\n"
-                            f"🕒 TF: *{tf}*\n"
-                            f"📈 Side: *{sig['side'].upper()}*\n"
-                            f"💰 Entry: `{price:.6f}`\n"
-                            f"🎯 Targets:\n"
-                            f"• TP1: `{tp1:.6f}`\n• TP2: `{tp2:.6f}`\n• TP3: `{tp3:.6f}`\n"
-                            f"🛑 Stoploss: `{sl:.6f}`\n\n"
-                            f"⚙️ Confidence: *{sig['confidence']}%*\n"
-                            f"🔧 Leverage Suggestion: *{leverage}*\n\n"
-                            f"📖 Reason: {sig['reason']}\n"
-                            f"📆 Time: {tstamp}"
-                        )
-
-                        await send_message_async(bot, TELEGRAM_CHAT_ID, msg)
-                        print(f"✅ Sent {sym} {tf} {sig['side']} ({sig['confidence']}%) lev {leverage}")
-
-                    except Exception as e:
-                        print("Processing error:", e)
-                        continue
+    async def _send_chart(self, job, msg, origin):
+        png = await self.charts.render(job)
+        if png is None:
+            await send_message_async(self.bot, TELEGRAM_CHAT_ID, msg, origin=origin)
+        else:
+            await send_photo_async(self.bot, TELEGRAM_CHAT_ID, png, caption=msg, origin=origin)
 
-        except Exception as e:
-            print(f"⚠️ WS error in batch {symbols[:2]}...{symbols[-2:]}: {e}")
-            await asyncio.sleep(5)
+
+def worker_pipeline():
+    """Pipeline di proses eval worker (history + evaluasi saja, tanpa Telegram)."""
+    return SignalPipeline()
 
 
 # ==========================================
-# PEMBAGIAN BATCH
+# KONEKSI WEBSOCKET & UNIVERSE SYMBOL
 # ==========================================
-async def monitor_chunk(symbols):
-    """Bagi symbol ke beberapa batch paralel"""
-    tasks = []
-    for i in range(0, len(symbols), BATCH_SIZE):
-        chunk = symbols[i:i + BATCH_SIZE]
-        print(f"📡 Starting batch {i//BATCH_SIZE+1} with {len(chunk)} symbols...")
-        tasks.append(asyncio.create_task(monitor_batch(chunk)))
-        await asyncio.sleep(1)  # beri jeda supaya koneksi stabil
-
-    await asyncio.gather(*tasks)
+def stream_names(sym):
+    return [f"{sym.lower()}@kline_{tf}" for tf in STREAM_TFS]
+
+
+async def update_universe(pipeline, manager, symbols):
+    """
+    Terapkan daftar symbol baru tanpa reconnect: backfill symbol baru dulu,
+    SUBSCRIBE/UNSUBSCRIBE di koneksi yang hidup, lalu buang history symbol
+    yang keluar dari universe.
+    """
+    added = [s for s in symbols if s not in pipeline.symbols]
+    if added and BACKFILL_ON_START:
+        try:
+            await backfill_history(pipeline.store, added, list(dict.fromkeys(STREAM_TFS + TIMEFRAMES)), HISTORY_LEN)
+        except Exception as e:
+            print(f"⚠️ Backfill gagal, mulai dengan history kosong: {e}")
+    if added and pipeline.pool is not None:
+        # history hasil backfill pindah ke worker pemilik symbol
+        pipeline.pool.seed(pipeline.store, added)
+        for sym in added:
+            pipeline.store.drop_symbol(sym)
+    pipeline.symbols.update(added)
+
+    _, removed = await manager.apply(symbols)
+    for sym in removed:
+        pipeline.drop_symbol(sym)
+
+
+async def monitor_chunk(symbols, tracker=None, universe_updates=None, shared=None):
+    """
+    Jalankan semua koneksi websocket lewat StreamManager. Universe baru dari
+    coin_manager (queue universe_updates) diterapkan ke koneksi yang hidup.
+    shared: store bersama kalau jalan sebagai salah satu worker shard.
+    Signal yang dikirim dicatat di registry milik tracker.
+    """
+    archive = KlineArchive() if KLINE_ARCHIVE else None
+    # EVAL_WORKERS > 0: history ada di proses worker, signal tetap dikirim sebagai teks
+    charts = ChartRenderer().start() if SIGNAL_CHARTS and not EVAL_WORKERS else None
+    pipeline = SignalPipeline(bot=make_bot(TELEGRAM_TOKEN), tracker=tracker, workers=EVAL_WORKERS, archive=archive,
+                              shared=shared, charts=charts, registry=tracker.registry if tracker else None)
+    if pipeline.pool is not None:
+        pipeline.pool.start()
+    if archive is not None:
+        asyncio.create_task(archive.run_flusher())
+    manager = StreamManager(pipeline.on_message, stream_names)
+    pipeline.conn_of = manager.conn_id
+    await update_universe(pipeline, manager, symbols)
+
+    mem = pipeline.store.memory_report()
+    print(f"🧮 History buffers: {mem['streams']} streams, {mem['mb']} MB ({mem['dtype']})")
+
+    rebalancer = asyncio.create_task(manager.run_rebalancer())
+    try:
+        if universe_updates is None:
+            await rebalancer
+            return
+        while True:
+            new_symbols = await universe_updates.get()
+            try:
+                await update_universe(pipeline, manager, new_symbols)
+            except Exception as e:
+                print(f"⚠️ Universe update error: {e}")
+    finally:
+        # shutdown (main() di-cancel): stop websocket dulu, worker eval flush batch terakhir, pool chart ditutup
+        rebalancer.cancel()
+        await manager.close()
+        if pipeline.pool is not None:
+            await pipeline.pool.close()
+        if charts is not None:
+            charts.close()
+        if archive is not None:
+            # buffer yang belum jadi blok (sampai ARCHIVE_MAX_AGE_SEC) jangan hilang saat redeploy
+            try:
+                await archive.flush(force=True)
+                print(f"🗄️ Archive flushed: {archive.stats()}")
+            except Exception as e:
+                print(f"⚠️ Archive flush error: {e}")
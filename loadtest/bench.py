@@ -0,0 +1,262 @@
+"""
+Load test end-to-end: stand-in Binance + stub Telegram lokal, bot dijalankan
+sebagai subprocess lewat loadtest.bot_runner.
+
+    python -m loadtest.bench --symbols 300 --update-ms 250 --bar-sec 2 --duration 60
+    python -m loadtest.bench --save loadtest/baseline.json
+    python -m loadtest.bench --baseline loadtest/baseline.json   # exit 1 kalau regresi
+
+Laporan: pesan ingest / detik (yang benar-benar terkirim ke bot, websocket
+punya backpressure), latency close -> alert (kline final terkirim -> pesan
+diterima stub Telegram), CPU dan RSS proses bot (termasuk eval worker), dan
+p95 per tahap pipeline dari endpoint /metrics bot.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from loadtest.fake_binance import FakeBinance
+from loadtest.fake_telegram import TelegramStub
+from loadtest.market import SyntheticMarket
+from utils.kline_buffer import interval_to_ms
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+# metrik -> True kalau makin besar makin baik
+METRICS = {"ingest_msgs_per_sec": True, "latency_p95_ms": False, "cpu_pct": False, "rss_mb": False}
+
+
+def _proc_tree(pid):
+    """pid + semua turunannya (eval worker), dari /proc."""
+    children = {}
+    for d in os.listdir("/proc"):
+        if d.isdigit():
+            try:
+                with open(f"/proc/{d}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(d))
+            except (OSError, IndexError, ValueError):
+                pass
+    out, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        out.append(p)
+        todo.extend(children.get(p, []))
+    return out
+
+
+def sample_usage(pid):
+    """Returns (cpu detik, rss MB) seluruh pohon proses."""
+    cpu, rss = 0.0, 0.0
+    for p in _proc_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / CLK_TCK
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) / 1024
+        except (OSError, IndexError, ValueError):
+            pass
+    return cpu, rss
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+_PAIR = re.compile(r"Pair: \*(\w+)\*")
+_TF = re.compile(r"TF: \*(\w+)\*")
+
+
+def alert_latencies(messages, final_sent):
+    """Latency (ms) tiap alert terhadap kline final terakhir yang menutup bar TF-nya."""
+    out = []
+    for t, _, text in messages:
+        pair, tf = _PAIR.search(text), _TF.search(text)
+        if not pair or not tf:
+            continue
+        step = interval_to_ms(tf.group(1))
+        for close_ms, sent in reversed(final_sent.get(pair.group(1), ())):
+            if sent <= t and close_ms % step == 0:
+                out.append((t - sent) * 1000)
+                break
+    return out
+
+
+async def run_bench(args):
+    fake = await FakeBinance(SyntheticMarket(args.symbols, args.bar_sec), args.update_ms).start()
+    tg = await TelegramStub().start()
+    metrics_port = _free_port()
+    env = dict(
+        os.environ,
+        BINANCE_FAPI_URL=fake.ws_url, BINANCE_REST_URL=fake.rest_url,
+        TELEGRAM_API_URL=tg.url, TELEGRAM_TOKEN="123456:loadtest", TELEGRAM_CHAT_ID="1",
+        ACTIVE_HOUR_START="0", ACTIVE_HOUR_END="24",   # filter jam aktif mati: alert (dan latency) jam berapa pun
+        # limit Telegram dibuka supaya yang terukur latency pipeline, bukan rate limit
+        TG_GLOBAL_RATE="1000", TG_CHAT_RATE_PER_MIN="600000", TG_CHAT_BURST="1000",
+        BACKFILL_WEIGHT_PER_MIN="1000000", BACKFILL_CONCURRENCY="50",
+        EVAL_WORKERS=str(args.workers), EVAL_MODE=args.mode, PYTHONUNBUFFERED="1",
+        METRICS_PORT=str(metrics_port),
+    )
+    log = open(args.log, "w") if args.log else asyncio.subprocess.DEVNULL
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "loadtest.bot_runner", cwd=ROOT, env=env, stdout=log, stderr=asyncio.subprocess.STDOUT)
+
+    rss_peak = 0.0
+
+    async def sample_for(seconds):
+        nonlocal rss_peak
+        end = time.monotonic() + seconds
+        while time.monotonic() < end and proc.returncode is None:
+            rss_peak = max(rss_peak, sample_usage(proc.pid)[1])
+            await asyncio.sleep(1)
+
+    try:
+        # tunggu backfill selesai dan semua symbol ter-subscribe
+        deadline = time.monotonic() + args.startup_timeout
+        while sum(len(s) for s in fake.conns.values()) < args.symbols and time.monotonic() < deadline:
+            await sample_for(1)
+            if proc.returncode is not None:
+                raise RuntimeError(f"bot berhenti (exit {proc.returncode}), lihat --log")
+        await sample_for(args.warmup)
+        cpu0, _ = sample_usage(proc.pid)
+        sent0, finals0, n_msg0, t0 = fake.sent, fake.finals, len(tg.messages), time.monotonic()
+        await sample_for(args.duration)
+        cpu1, _ = sample_usage(proc.pid)
+        elapsed = time.monotonic() - t0
+        stats = fake.stats()
+        metrics = await scrape(metrics_port)
+        if proc.returncode is not None:
+            raise RuntimeError(f"bot berhenti (exit {proc.returncode}), lihat --log")
+    finally:
+        if proc.returncode is None:
+            proc.terminate()
+            await proc.wait()
+        await fake.close()
+        tg.close()
+
+    lat = alert_latencies(tg.messages[n_msg0:], fake.final_sent)
+    offered = stats["streams"] * 1000.0 / args.update_ms
+    report = {
+        "symbols": args.symbols, "streams": stats["streams"], "update_ms": args.update_ms,
+        "bar_sec": args.bar_sec, "workers": args.workers, "mode": args.mode, "duration_s": round(elapsed, 1),
+        "ingest_msgs_per_sec": round((fake.sent - sent0) / elapsed, 1),
+        "offered_msgs_per_sec": round(offered, 1),
+        "closed_candles_per_sec": round((fake.finals - finals0) / elapsed, 1),
+        "skipped_ticks": stats["skipped_ticks"],
+        "alerts": len(tg.messages) - n_msg0,
+        "latency_p50_ms": _round(percentile(lat, 0.5)),
+        "latency_p95_ms": _round(percentile(lat, 0.95)),
+        "latency_p99_ms": _round(percentile(lat, 0.99)),
+        "latency_max_ms": _round(max(lat) if lat else None),
+        "cpu_pct": round((cpu1 - cpu0) / elapsed * 100, 1),
+        "rss_mb": round(rss_peak, 1),
+        "rest_requests": stats["rest_requests"],
+        "stage_p95_ms": stage_p95(metrics),
+    }
+    return report
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+_BUCKET = re.compile(r'^signal_stage_seconds_bucket\{stage="(\w+)",le="([^"]+)"\} (\d+)$')
+
+
+def stage_p95(text):
+    """p95 (ms, batas atas bucket) per tahap dari teks /metrics."""
+    buckets = defaultdict(list)
+    for line in text.splitlines():
+        m = _BUCKET.match(line)
+        if m:
+            buckets[m.group(1)].append((float(m.group(2)), int(m.group(3))))
+    out = {}
+    for stage, rows in buckets.items():
+        total = rows[-1][1]
+        if total:
+            le = next(le for le, n in rows if n >= 0.95 * total)
+            out[stage] = le * 1000 if le != float("inf") else None
+    return out
+
+
+async def scrape(port):
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            return (await client.get(f"http://127.0.0.1:{port}/metrics")).text
+    except httpx.HTTPError:
+        return ""
+
+
+def _round(v):
+    return None if v is None else round(v, 1)
+
+
+def compare(report, baseline, tolerance):
+    """
+    Returns list regresi (metrik yang lebih buruk dari baseline > tolerance).
+    Metrik yang ada di baseline tapi tidak terukur sekarang (mis. latency tanpa alert) juga regresi.
+    """
+    bad = []
+    for key, higher_better in METRICS.items():
+        new, old = report.get(key), baseline.get(key)
+        if new is None and old is not None:
+            bad.append(f"{key}: {old} -> tidak terukur")
+            continue
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        if (change < -tolerance) if higher_better else (change > tolerance):
+            bad.append(f"{key}: {old} -> {new} ({change:+.0%})")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=300)
+    ap.add_argument("--update-ms", type=int, default=250, help="interval update kline per stream")
+    ap.add_argument("--bar-sec", type=float, default=2.0, help="detik nyata per bar 1m sintetis")
+    ap.add_argument("--duration", type=float, default=60)
+    ap.add_argument("--warmup", type=float, default=5, help="detik setelah semua symbol ter-subscribe sebelum mulai ukur")
+    ap.add_argument("--startup-timeout", type=float, default=120)
+    ap.add_argument("--workers", type=int, default=0, help="EVAL_WORKERS untuk bot")
+    ap.add_argument("--mode", default="batch", choices=("batch", "incremental"))
+    ap.add_argument("--log", help="simpan output bot ke file")
+    ap.add_argument("--save", help="tulis laporan JSON (mis. sebagai baseline)")
+    ap.add_argument("--baseline", help="bandingkan dengan laporan sebelumnya")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args()
+
+    report = asyncio.run(run_bench(args))
+    for k, v in report.items():
+        print(f"{k:>24}: {v}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            bad = compare(report, json.load(f), args.tolerance)
+        for line in bad:
+            print(f"❌ Regression {line}")
+        if bad:
+            sys.exit(1)
+        print("✅ No regression vs baseline")
+
+
+if __name__ == "__main__":
+    main()
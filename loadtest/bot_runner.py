@@ -0,0 +1,36 @@
+"""
+Jalankan pipeline bot (monitor_chunk + PriceTracker) terhadap endpoint dari
+env (BINANCE_FAPI_URL, BINANCE_REST_URL, TELEGRAM_API_URL). Dipakai oleh
+loadtest.bench sebagai subprocess supaya CPU/RSS bot terukur terpisah.
+"""
+import asyncio
+import os
+import tempfile
+
+import utils.backfill as backfill
+from gm_signal_bot import monitor_chunk
+from tracker import PriceTracker
+from utils.http_client import get_json
+from utils.metrics import METRICS_PORT, serve_metrics
+from utils.telegram_utils import make_bot
+
+
+async def main():
+    # cache kline sintetis jangan sampai masuk data/klines
+    backfill.CACHE_DIR = os.getenv("LOADTEST_CACHE_DIR") or tempfile.mkdtemp(prefix="loadtest-klines-")
+    info = await get_json("/fapi/v1/exchangeInfo")
+    symbols = [s["symbol"] for s in info["symbols"] if s["status"] == "TRADING"]
+    print(f"🧪 Load test: {len(symbols)} symbols")
+
+    if METRICS_PORT:
+        asyncio.create_task(serve_metrics())
+    tracker = PriceTracker(make_bot(os.environ["TELEGRAM_TOKEN"]))
+    asyncio.create_task(tracker.run())
+    await monitor_chunk(symbols, tracker)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,219 @@
+"""
+Stand-in lokal Binance USDT-M futures untuk load test:
+
+- websocket combined stream /stream (SUBSCRIBE/UNSUBSCRIBE atau ?streams=),
+  /ws/!markPrice@arr@1s dan /ws/!ticker@arr (quote volume ikut bergerak),
+- REST /fapi/v1/exchangeInfo, /ticker/24hr, /ticker/price, /klines.
+
+    python -m loadtest.fake_binance --symbols 300 --update-ms 250 --bar-sec 2
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, defaultdict, deque
+
+import websockets
+
+from loadtest.http_stub import json_response, serve_http
+from loadtest.market import SyntheticMarket
+
+
+class FakeBinance:
+    def __init__(self, market, update_ms=250):
+        self.market = market
+        self.update_ms = update_ms
+        self.conns = {}                 # websocket -> set stream
+        self.latest = {}                # stream -> payload non-final tick terakhir
+        self.pending = {}               # websocket -> deque kline final (tidak pernah dilompati)
+        self.final_sent = defaultdict(lambda: deque(maxlen=64))  # symbol -> (close_ms, waktu kirim)
+        self.sent = 0                   # pesan kline terkirim
+        self.finals = 0
+        self.skipped = 0                # tick yang terlewat karena client lambat
+        self.requests = Counter()
+        self._tick = asyncio.Event()
+        self._tick_no = 0
+        self._tasks = []
+        self.ws_server = None
+        self.rest_server = None
+
+    # ---------- websocket ----------
+    async def _ws_handler(self, ws):
+        path = ws.path
+        if path.startswith("/ws/!markPrice"):
+            return await self._mark_price(ws)
+        if path.startswith("/ws/!ticker@arr"):
+            return await self._ticker_arr(ws)
+        streams = set()
+        if "streams=" in path:
+            streams.update(path.split("streams=", 1)[1].split("/"))
+        self.conns[ws] = streams
+        self.pending[ws] = deque()
+        sender = asyncio.get_running_loop().create_task(self._pump(ws, streams))
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                params = msg.get("params", [])
+                if msg.get("method") == "SUBSCRIBE":
+                    streams.update(params)
+                elif msg.get("method") == "UNSUBSCRIBE":
+                    streams.difference_update(params)
+                await ws.send(json.dumps({"result": None, "id": msg.get("id")}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            self.conns.pop(ws, None)
+            self.pending.pop(ws, None)
+
+    async def _pump(self, ws, streams):
+        """
+        Kirim kline final yang antri lalu update terbaru tiap stream setiap
+        tick. Kalau client lambat, update non-final dilompati (seperti
+        coalescing), kline final tidak.
+        """
+        pending = self.pending[ws]
+        seen = self._tick_no
+        while True:
+            await self._tick.wait()
+            if self._tick_no > seen + 1:
+                self.skipped += self._tick_no - seen - 1
+            seen = self._tick_no
+            while pending:
+                sym, close_ms, payload = pending.popleft()
+                await ws.send(payload)
+                self.sent += 1
+                self.finals += 1
+                self.final_sent[sym].append((close_ms, time.time()))
+            for stream in list(streams):
+                payload = self.latest.get(stream)
+                if payload is not None:
+                    await ws.send(payload)
+                    self.sent += 1
+
+    async def _mark_price(self, ws):
+        try:
+            while True:
+                now = self.market.now_ms()
+                await ws.send(json.dumps([
+                    {"e": "markPriceUpdate", "E": now, "s": s, "p": f"{p:.8g}", "i": f"{p:.8g}", "r": "0.0001", "T": now}
+                    for s, p in self.market.price.items()
+                ], separators=(",", ":")))
+                await asyncio.sleep(1)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _ticker_arr(self, ws):
+        m = self.market
+        try:
+            while True:
+                now = m.now_ms()
+                for s in m.symbols:
+                    m.quote_volume[s] *= m.rng.lognormvariate(0, 0.02)
+                await ws.send(json.dumps([
+                    {"e": "24hrTicker", "E": now, "s": s, "c": f"{m.price[s]:.8g}", "q": f"{m.quote_volume[s]:.2f}"}
+                    for s in m.symbols
+                ], separators=(",", ":")))
+                await asyncio.sleep(1)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _ticker(self):
+        dt = self.update_ms
+        while True:
+            t = time.monotonic()
+            streams = set().union(*self.conns.values()) if self.conns else set()
+            payloads, finals = self.market.tick(streams, dt * self.market.speed)
+            for sym, tf, close_ms in finals:
+                stream = f"{sym.lower()}@kline_{tf}"
+                payload = payloads.pop(stream)
+                for ws, subs in self.conns.items():
+                    if stream in subs:
+                        self.pending[ws].append((sym, close_ms, payload))
+            self.latest = payloads
+            self._tick_no += 1
+            old, self._tick = self._tick, asyncio.Event()
+            old.set()
+            await asyncio.sleep(max(0.0, dt / 1000.0 - (time.monotonic() - t)))
+
+    # ---------- REST ----------
+    def _rest(self, method, path, query, body, headers):
+        self.requests[path] += 1
+        m = self.market
+        weight = {"X-MBX-USED-WEIGHT-1M": str(sum(self.requests.values()) % 1000)}
+        if path == "/fapi/v1/exchangeInfo":
+            return json_response({"symbols": [
+                {"symbol": s, "status": "TRADING", "contractType": "PERPETUAL", "quoteAsset": "USDT"} for s in m.symbols
+            ]}, headers=weight)
+        if path == "/fapi/v1/ticker/24hr":
+            rows = [{"symbol": s, "lastPrice": f"{m.price[s]:.8g}", "quoteVolume": f"{m.quote_volume[s]:.2f}",
+                     "priceChangePercent": "0.0"} for s in m.symbols]
+            if "symbol" in query:
+                rows = [r for r in rows if r["symbol"] == query["symbol"]][0]
+            return json_response(rows, headers=weight)
+        if path == "/fapi/v1/ticker/price":
+            rows = [{"symbol": s, "price": f"{m.price[s]:.8g}", "time": m.now_ms()} for s in m.symbols]
+            if "symbol" in query:
+                rows = [r for r in rows if r["symbol"] == query["symbol"]][0]
+            return json_response(rows, headers=weight)
+        if path == "/fapi/v1/klines":
+            if query.get("symbol") not in m.price:
+                return json_response({"code": -1121, "msg": "Invalid symbol."}, 400)
+            start = int(query["startTime"]) if "startTime" in query else None
+            end = int(query["endTime"]) if "endTime" in query else None
+            rows = m.klines(query["symbol"], query.get("interval", "1m"), int(query.get("limit", 500)), start, end)
+            return json_response(rows, headers=weight)
+        return json_response({"code": -1, "msg": "not found"}, 404)
+
+    # ---------- lifecycle ----------
+    async def start(self, host="127.0.0.1", ws_port=0, rest_port=0):
+        self.ws_server = await websockets.serve(self._ws_handler, host, ws_port, max_size=None)
+        self.rest_server = await serve_http(self._rest, host, rest_port)
+        self._tasks.append(asyncio.get_running_loop().create_task(self._ticker()))
+        return self
+
+    @property
+    def ws_url(self):
+        host, port = self.ws_server.sockets[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def rest_url(self):
+        host, port = self.rest_server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        for t in self._tasks:
+            t.cancel()
+        self.ws_server.close()
+        self.rest_server.close()
+
+    def stats(self):
+        return {
+            "connections": len(self.conns),
+            "streams": sum(len(s) for s in self.conns.values()),
+            "sent": self.sent,
+            "finals": self.finals,
+            "skipped_ticks": self.skipped,
+            "rest_requests": dict(self.requests),
+        }
+
+
+async def _serve(args):
+    fake = await FakeBinance(SyntheticMarket(args.symbols, args.bar_sec), args.update_ms).start(
+        args.host, args.ws_port, args.rest_port)
+    print(f"BINANCE_FAPI_URL={fake.ws_url}\nBINANCE_REST_URL={fake.rest_url}")
+    while True:
+        await asyncio.sleep(10)
+        print(fake.stats())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=300)
+    ap.add_argument("--update-ms", type=int, default=250)
+    ap.add_argument("--bar-sec", type=float, default=2.0)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--ws-port", type=int, default=9001)
+    ap.add_argument("--rest-port", type=int, default=9002)
+    asyncio.run(_serve(ap.parse_args()))
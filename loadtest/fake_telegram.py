@@ -0,0 +1,54 @@
+
+import json
+import time
+from urllib.parse import parse_qsl
+
+from loadtest.http_stub import json_response, serve_http
+
+
+class TelegramStub:
+    """
+    Stub Bot API lokal: catat semua pesan keluar (waktu terima, chat, teks).
+    Bot diarahkan ke sini lewat TELEGRAM_API_URL=http://host:port/bot.
+    retry_after_every=N: tiap pesan ke-N dibalas 429 (uji flood control).
+    """
+
+    def __init__(self, retry_after_every=0, retry_after=1):
+        self.messages = []      # (time.time(), chat_id, text)
+        self.calls = 0
+        self.retry_after_every = retry_after_every
+        self.retry_after = retry_after
+        self.server = None
+
+    def _handle(self, method, path, query, body, headers):
+        api = path.rsplit("/", 1)[-1]
+        self.calls += 1
+        if api == "getMe":
+            return json_response({"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "stub", "username": "stub_bot"}})
+        if self.retry_after_every and self.calls % self.retry_after_every == 0:
+            return json_response({"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                  "parameters": {"retry_after": self.retry_after}}, 429)
+        ctype = headers.get("content-type", "")
+        params = dict(parse_qsl(body.decode("utf-8", "replace"))) if "urlencoded" in ctype else {}
+        if "json" in ctype:
+            params = json.loads(body or b"{}")
+        chat_id = params.get("chat_id", "0")
+        text = params.get("text") or params.get("caption") or ""
+        self.messages.append((time.time(), chat_id, text))
+        return json_response({"ok": True, "result": {
+            "message_id": len(self.messages), "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "private"},
+            "text": text,
+        }})
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await serve_http(self._handle, host, port)
+        return self
+
+    @property
+    def url(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/bot"
+
+    def close(self):
+        self.server.close()
@@ -0,0 +1,55 @@
+
+import asyncio
+import json
+from urllib.parse import parse_qsl, urlsplit
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+def json_response(data, status=200, headers=None):
+    h = {"Content-Type": "application/json"}
+    h.update(headers or {})
+    return status, h, json.dumps(data, separators=(",", ":")).encode()
+
+
+async def serve_http(handler, host="127.0.0.1", port=0):
+    """
+    HTTP/1.1 server minimal (keep-alive, Content-Length) untuk stub lokal.
+    handler(method, path, query, body, headers) -> (status, headers, body),
+    boleh async. Returns asyncio.Server.
+    """
+
+    async def on_conn(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                body = b""
+                if int(headers.get("content-length", 0)):
+                    body = await reader.readexactly(int(headers["content-length"]))
+                url = urlsplit(target)
+                try:
+                    res = handler(method, url.path, dict(parse_qsl(url.query)), body, headers)
+                    if asyncio.iscoroutine(res):
+                        res = await res
+                except Exception as e:
+                    res = json_response({"msg": str(e)}, 500)
+                status, out_headers, payload = res
+                out = [f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}", f"Content-Length: {len(payload)}"]
+                out += [f"{k}: {v}" for k, v in out_headers.items()]
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(on_conn, host, port)
@@ -0,0 +1,126 @@
+
+import json
+import random
+import time
+
+from utils.kline_buffer import interval_to_ms
+
+
+class SyntheticMarket:
+    """
+    Pasar sintetis untuk load test: random walk per symbol dengan regime
+    trend dan volume spike (cukup untuk memicu signal sesekali).
+
+    Waktu pasar dipercepat: 1 bar `base_tf` berlangsung `bar_sec` detik nyata,
+    dimulai dari menit sekarang. tick() dipanggil tiap update (mis. 250 ms)
+    dan menghasilkan payload kline untuk semua stream yang diminta.
+    """
+
+    def __init__(self, symbols=300, bar_sec=2.0, base_tf="1m", seed=0, history=1500):
+        self.symbols = [f"SYN{i:04d}USDT" for i in range(symbols)]
+        self.base_step = interval_to_ms(base_tf)
+        self.speed = self.base_step / 1000.0 / float(bar_sec)
+        self.rng = random.Random(seed)
+        self.t0_real = time.time()
+        self.t0_mkt = int(self.t0_real * 1000) // self.base_step * self.base_step
+        self.price = {s: 10 ** self.rng.uniform(-2, 4) for s in self.symbols}
+        self.drift = {s: 0.0 for s in self.symbols}
+        self.quote_volume = {s: 10 ** self.rng.uniform(6, 10) for s in self.symbols}
+        self.bars = {}          # (symbol, tf) -> [open_time, o, h, l, c, v]
+        self.history_len = history
+        self._history = {}      # (symbol, tf) -> list bar closed
+        self._seeded = set()    # (symbol, tf) yang history awalnya sudah dibuat
+
+    def now_ms(self):
+        """Waktu pasar (ms) yang dipercepat."""
+        return self.t0_mkt + int((time.time() - self.t0_real) * 1000 * self.speed)
+
+    def _step_price(self, sym, dt_ms):
+        """Random walk; volatilitas per bar base ~0.3%."""
+        if self.rng.random() < dt_ms / (self.base_step * 60):
+            self.drift[sym] = self.rng.gauss(0, 0.0005)
+        frac = max(dt_ms / self.base_step, 1e-6)
+        p = self.price[sym] * (1 + self.rng.gauss(self.drift[sym] * frac, 0.003 * frac ** 0.5))
+        self.price[sym] = p
+        return p
+
+    def _volume(self, dt_ms):
+        spike = 5 if self.rng.random() < 0.05 else 1
+        return self.rng.expovariate(1) * 1000 * spike * dt_ms / self.base_step
+
+    def tick(self, streams, dt_ms):
+        """
+        Majukan harga semua symbol dari streams, returns dict stream -> payload
+        (JSON compact seperti fstream) dan list (symbol, tf, close_ms) bar yang final.
+        streams: iterable nama stream 'syn0000usdt@kline_1m'.
+        """
+        now = self.now_ms()
+        by_symbol = {}
+        for stream in streams:
+            sym, kind = stream.split("@", 1)
+            by_symbol.setdefault(sym.upper(), []).append((stream, kind.split("_", 1)[1]))
+
+        payloads, finals = {}, []
+        for sym, subs in by_symbol.items():
+            if sym not in self.price:
+                continue
+            p = self._step_price(sym, dt_ms)
+            vol = self._volume(dt_ms)
+            for stream, tf in subs:
+                step = interval_to_ms(tf)
+                bar = self.bars.get((sym, tf))
+                if bar is None:
+                    bar = self.bars[(sym, tf)] = [now // step * step, p, p, p, p, 0.0]
+                final = now >= bar[0] + step
+                if not final:
+                    bar[2] = max(bar[2], p)
+                    bar[3] = min(bar[3], p)
+                    bar[4] = p
+                    bar[5] += vol
+                payloads[stream] = self.payload(sym, tf, bar, final, now)
+                if final:
+                    finals.append((sym, tf, bar[0] + step))
+                    self._history.setdefault((sym, tf), []).append(list(bar))
+                    self.bars[(sym, tf)] = [now // step * step, p, p, p, p, vol]
+        return payloads, finals
+
+    @staticmethod
+    def payload(sym, tf, bar, final, event_ms):
+        step = interval_to_ms(tf)
+        k = {
+            "t": bar[0], "T": bar[0] + step - 1, "s": sym, "i": tf, "f": 1, "L": 2,
+            "o": f"{bar[1]:.8g}", "c": f"{bar[4]:.8g}", "h": f"{bar[2]:.8g}", "l": f"{bar[3]:.8g}",
+            "v": f"{bar[5]:.3f}", "n": 10, "x": final, "q": "0", "V": "0", "Q": "0", "B": "0",
+        }
+        return json.dumps({"stream": f"{sym.lower()}@kline_{tf}", "data": {"e": "kline", "E": event_ms, "s": sym, "k": k}},
+                          separators=(",", ":"))
+
+    def klines(self, sym, tf, limit=500, start_time=None, end_time=None):
+        """Bar historis untuk REST /klines: random walk mundur dari harga awal + bar yang sudah lewat."""
+        step = interval_to_ms(tf)
+        if (sym, tf) not in self._seeded:
+            self._seeded.add((sym, tf))
+            self._history[(sym, tf)] = self._backfill(sym, tf) + self._history.get((sym, tf), [])
+        hist = self._history[(sym, tf)]
+        rows = [b for b in hist if (start_time is None or b[0] >= start_time) and (end_time is None or b[0] <= end_time)]
+        rows = rows[:limit] if start_time is not None else rows[-limit:]
+        bar = self.bars.get((sym, tf))
+        if bar is not None and len(rows) < limit and (end_time is None or bar[0] <= end_time):
+            rows.append(bar)  # candle berjalan (seperti Binance)
+        return [[b[0], f"{b[1]:.8g}", f"{b[2]:.8g}", f"{b[3]:.8g}", f"{b[4]:.8g}", f"{b[5]:.3f}",
+                 b[0] + step - 1, "0", 10, "0", "0", "0"] for b in rows]
+
+    def _backfill(self, sym, tf):
+        step = interval_to_ms(tf)
+        rng = random.Random(f"{sym}|{tf}")
+        start = self.t0_mkt // step * step
+        p = self.price[sym]
+        out = []
+        for i in range(1, self.history_len + 1):
+            c = p
+            o = c / (1 + rng.gauss(0, 0.003))
+            h = max(o, c) * (1 + abs(rng.gauss(0, 0.0015)))
+            l = min(o, c) * (1 - abs(rng.gauss(0, 0.0015)))
+            out.append([start - i * step, o, h, l, c, rng.expovariate(1) * 1000])
+            p = o
+        return out[::-1]
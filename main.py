@@ -1,12 +1,21 @@
 import asyncio
 import os
+import signal
+import time
 import json
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 from gm_signal_bot import monitor_chunk
 from coin_manager import refresh_symbols_periodic
-from utils.telegram_utils import make_bot, send_message_async
+from tracker import PriceTracker
+from utils.http_client import close_client
+from utils.data_store import import_legacy_history
+from utils.stats_manager import get_stats
+from utils.shard import SHARD_ID, ShardCoordinator
+from utils.shared_store import open_store
+from utils.metrics import METRICS_LOG_SEC, METRICS_PORT, log_summary_periodic, serve_metrics
+from utils.telegram_utils import make_bot, send_message_async, PRIORITY_INFO
 
 # =============== LOAD ENV ===============
 load_dotenv()
@@ -40,32 +49,113 @@ async def main():
     print("🚀 Starting Future-Signal Golden Moment v2")
     print(f"🕒 {datetime.now(timezone.utc).isoformat()} UTC")
 
-    # 🔔 Kirim test message ke Telegram untuk konfirmasi bot aktif
+    # SIGTERM (Railway stop/redeploy) tidak menjalankan atexit: cancel main() lalu simpan state di shutdown()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, asyncio.current_task().cancel)
+    state = {}
     try:
-        bot = make_bot(TELEGRAM_TOKEN)
-        msg = (
-            "✅ *Future-Signal Golden Moment v2 aktif!*\n\n"
-            "Bot berhasil dijalankan di server Railway 🚀\n"
-            "Sekarang sistem sedang memantau pair dan menunggu sinyal momentum ⚡"
-        )
-        await send_message_async(bot, TELEGRAM_CHAT_ID, msg)
-        print("✅ Sent startup test message to Telegram successfully.")
+        await run(state)
+    except asyncio.CancelledError:
+        print("🛑 Shutdown diminta, simpan state...")
+    finally:
+        await shutdown(**state)
+
+
+async def shutdown(tracker=None, shared=None, coordinator=None):
+    """Flush semua state in-memory sebelum proses keluar."""
+    try:
+        get_stats().flush()
     except Exception as e:
-        print(f"⚠️ Failed to send startup message: {e}")
+        print(f"⚠️ Shutdown stats error: {e}")
+    if tracker is not None:
+        try:
+            tracker.registry.snapshot()
+        except Exception as e:
+            print(f"⚠️ Shutdown registry error: {e}")
+    if coordinator is not None:
+        # worker lain langsung mengambil alih symbol tanpa menunggu SHARD_TTL_SEC
+        try:
+            shared.remove_worker(coordinator.worker_id)
+            shared.release_lease("universe", coordinator.worker_id)
+        except Exception as e:
+            print(f"⚠️ Shutdown shard error: {e}")
+    await close_client()
+    print("👋 State tersimpan, bot berhenti.")
+
+
+async def run(state):
+    # SHARD_ID: jalan sebagai salah satu worker, pegang sebagian symbol (consistent hash)
+    universe_updates = asyncio.Queue()
+    shared = coordinator = None
+    on_universe = universe_updates.put_nowait
+    if SHARD_ID:
+        shared = open_store()
+        coordinator = ShardCoordinator(shared, SHARD_ID)
+        on_universe = coordinator.set_universe
+    state.update(shared=shared, coordinator=coordinator)
 
-    # Jalankan background refresh symbol task
+    # 🔔 Kirim test message ke Telegram untuk konfirmasi bot aktif (sekali per restart, bukan per worker)
+    if shared is not None and not shared.claim_once("startup", time.time(), 60):
+        print("ℹ️ Startup message sudah dikirim worker lain.")
+    else:
+        try:
+            bot = make_bot(TELEGRAM_TOKEN)
+            msg = (
+                "✅ *Future-Signal Golden Moment v2 aktif!*\n\n"
+                "Bot berhasil dijalankan di server Railway 🚀\n"
+                "Sekarang sistem sedang memantau pair dan menunggu sinyal momentum ⚡"
+            )
+            if await send_message_async(bot, TELEGRAM_CHAT_ID, msg, priority=PRIORITY_INFO, wait=True):
+                print("✅ Sent startup test message to Telegram successfully.")
+            else:
+                print("⚠️ Startup message was not delivered.")
+        except Exception as e:
+            print(f"⚠️ Failed to send startup message: {e}")
+
+    # Jalankan background refresh symbol task; hasilnya diterapkan live ke websocket.
+    # Mode shard: hanya pemegang lease "universe" yang refresh (exchangeInfo + !ticker@arr)
     try:
-        asyncio.create_task(refresh_symbols_periodic())
+        if coordinator is not None:
+            asyncio.create_task(coordinator.lead(lambda: refresh_symbols_periodic(on_update=on_universe)))
+        else:
+            asyncio.create_task(refresh_symbols_periodic(on_update=on_universe))
     except TypeError:
         print("⚠️ Fungsi refresh_symbols_periodic bukan async, ubah ke async def di coin_manager.py")
         return
 
+    # History lama (signals_history.json) diimpor sekali, sebelum tracker menutup trade
+    try:
+        await asyncio.to_thread(import_legacy_history)
+    except Exception as e:
+        print(f"⚠️ Impor history lama gagal: {e}")
+
+    # Statistik disimpan ke disk per interval (dan saat shutdown)
+    asyncio.create_task(get_stats().run_flusher())
+
+    # Metrik latency per tahap: endpoint Prometheus lokal + ringkasan berkala ke log
+    if METRICS_PORT:
+        asyncio.create_task(serve_metrics())
+    if METRICS_LOG_SEC:
+        asyncio.create_task(log_summary_periodic())
+
+    # Tracker TP/SL jalan di event loop yang sama (stream mark price)
+    tracker = PriceTracker(make_bot(TELEGRAM_TOKEN), shared=shared)
+    state["tracker"] = tracker
+    asyncio.create_task(tracker.run())
+    # Signal aktif: snapshot debounced (event di antaranya ada di WAL)
+    asyncio.create_task(tracker.registry.run_flusher())
+
     # Ambil daftar simbol
     symbols = get_symbols_list()
+    if coordinator is not None:
+        symbols = await coordinator.start(symbols)
+        coordinator.on_change = universe_updates.put_nowait
+        asyncio.create_task(coordinator.run())
     print(f"🧠 Monitoring {len(symbols)} symbols...")
 
     # Jalankan deteksi signal utama
-    await monitor_chunk(symbols)
+    await monitor_chunk(symbols, tracker, universe_updates, shared)
 
 
 # =============== ENTRY POINT ===============
@@ -0,0 +1,239 @@
+"""
+Replay / backtest: jalankan kline historis lewat jalur yang sama dengan
+produksi (history -> detect -> cooldown -> TP/SL) dengan jam simulasi.
+
+    python replay.py --symbols BTCUSDT,ETHUSDT --days 30 --download
+    python replay.py --data data/replay/klines --out data/replay/result
+
+File kline: <data>/<SYMBOL>_<tf>.npy, array (n, 6) open_time, open, high,
+low, close, volume (format yang sama dengan cache backfill di data/klines),
+atau arsip rekaman live (--archive, lihat utils/kline_archive.py).
+Hasil: trades.json, signals.json dan daily/monthly/breakdown stats di --out.
+"""
+import argparse, asyncio, glob, json, os, time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from gm_signal_bot import SignalPipeline, STREAM_TFS
+from tracker import match_hits
+from utils.backfill import CONCURRENCY, WeightLimiter, fetch_range
+from utils.http_client import get_client
+from utils.kline_archive import ARCHIVE_DIR, list_symbols, read_range
+from utils.kline_buffer import interval_to_ms
+from utils.stats_manager import StatsAggregator
+from utils.trigger_index import TriggerIndex
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+REPLAY_KLINES = os.path.join(DATA_DIR, "replay", "klines")
+REPLAY_OUT = os.path.join(DATA_DIR, "replay", "result")
+CHUNK = 200_000  # baris per konversi numpy -> list
+
+
+class SimClock:
+    """Pengganti time.time: detik epoch dari candle yang sedang di-replay."""
+
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+class ReplayPipeline(SignalPipeline):
+    """SignalPipeline yang mencatat signal ke TriggerIndex, bukan ke Telegram."""
+
+    def __init__(self, clock, index, eval_mode=None):
+        super().__init__(eval_mode=eval_mode, clock=clock)
+        self.index = index
+        self.opened = []
+
+    async def publish(self, trade, msg, origin=None):
+        uid = f"{trade['symbol']}|{trade['tf']}|{trade['opened_at']}"
+        self.index.add(uid, trade)
+        self.opened.append(trade)
+
+
+def load_klines(data_dir, symbols=None, timeframes=STREAM_TFS, start_ms=None, end_ms=None):
+    """Returns {(symbol, tf): array (n, 6)} dari file .npy di data_dir."""
+    if not symbols:
+        suffix = f"_{timeframes[0]}.npy"
+        symbols = sorted(os.path.basename(p)[:-len(suffix)] for p in glob.glob(os.path.join(data_dir, "*" + suffix)))
+    data = {}
+    for sym in symbols:
+        for tf in timeframes:
+            p = os.path.join(data_dir, f"{sym}_{tf}.npy")
+            if not os.path.exists(p):
+                print(f"⚠️ Tidak ada data {sym} {tf} ({p})")
+                continue
+            rows = np.load(p)
+            if start_ms is not None:
+                rows = rows[rows[:, 0] >= start_ms]
+            if end_ms is not None:
+                rows = rows[rows[:, 0] < end_ms]
+            if len(rows):
+                data[(sym, tf)] = rows
+    return data
+
+
+def load_archive(root, symbols=None, timeframes=STREAM_TFS, start_ms=None, end_ms=None):
+    """Seperti load_klines, tapi dari arsip biner kline closed (KLINE_ARCHIVE=1)."""
+    data = {}
+    for sym in symbols or list_symbols(timeframes[0], root):
+        for tf in timeframes:
+            rows = read_range(sym, tf, start_ms, end_ms, root)
+            if len(rows):
+                data[(sym, tf)] = rows
+            else:
+                print(f"⚠️ Tidak ada data arsip {sym} {tf}")
+    return data
+
+
+async def download_klines(symbols, timeframes, start_ms, end_ms, data_dir=REPLAY_KLINES):
+    """Download kline historis dari REST (menghormati weight limit) ke data_dir."""
+    os.makedirs(data_dir, exist_ok=True)
+    limiter = WeightLimiter()
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(client, sym, tf):
+        async with sem:
+            rows = await fetch_range(client, limiter, sym, tf, start_ms, end_ms)
+        np.save(os.path.join(data_dir, f"{sym}_{tf}.npy"), rows)
+        return len(rows)
+
+    t0 = time.time()
+    client = get_client()
+    counts = await asyncio.gather(*(one(client, s, tf) for s in symbols for tf in timeframes))
+    print(f"📥 Downloaded {sum(counts)} bars ({len(symbols)} symbols x {len(timeframes)} TF) in {time.time() - t0:.1f}s")
+
+
+class ReplayEngine:
+    """
+    Event-driven replay. Candle di-urutkan per close time; tiap boundary:
+    1. TP/SL signal yang terbuka dicek ke high/low candle STREAM_TFS[0]
+       (sama seperti PriceTracker menerima wick candle),
+    2. candle masuk ke SignalPipeline.on_closed_kline,
+    3. CloseBatcher di-flush (evaluasi batch) tanpa menunggu jam dinding.
+    """
+
+    def __init__(self, data, eval_mode=None, out_dir=REPLAY_OUT):
+        self.data = data
+        self.out_dir = out_dir
+        self.clock = SimClock()
+        self.index = TriggerIndex()
+        self.pipeline = ReplayPipeline(self.clock, self.index, eval_mode)
+        self.stats = StatsAggregator(data_dir=out_dir, load=False)
+        self.trades = []
+        self.candles = 0
+
+    def _events(self):
+        """Semua candle dalam urutan (close_time, urutan STREAM_TFS)."""
+        keys = list(self.data)
+        rank = {tf: i for i, tf in enumerate(STREAM_TFS)}
+        rows = np.concatenate([self.data[k] for k in keys])
+        key_idx = np.concatenate([np.full(len(self.data[k]), i) for i, k in enumerate(keys)])
+        close = rows[:, 0].astype(np.int64) + np.array([interval_to_ms(k[1]) for k in keys])[key_idx]
+        order = np.lexsort((np.array([rank[k[1]] for k in keys])[key_idx], close))
+        return keys, rows[order], key_idx[order], close[order]
+
+    async def run(self):
+        keys, rows, key_idx, close = self._events()
+        self.pipeline.symbols.update(k[0] for k in keys)
+        price_tf = STREAM_TFS[0]
+        pipeline, index = self.pipeline, self.index
+        t0 = time.perf_counter()
+
+        for c0 in range(0, len(rows), CHUNK):
+            chunk = rows[c0:c0 + CHUNK].tolist()
+            kidx = key_idx[c0:c0 + CHUNK].tolist()
+            ctimes = close[c0:c0 + CHUNK].tolist()
+            i, n = 0, len(chunk)
+            while i < n:
+                t = ctimes[i]
+                j = i
+                while j < n and ctimes[j] == t:
+                    j += 1
+                self.clock.t = t / 1000.0
+                if len(index):
+                    ranges = {}
+                    for r in range(i, j):
+                        sym, tf = keys[kidx[r]]
+                        if tf == price_tf:
+                            ranges[sym] = (chunk[r][2], chunk[r][3])
+                    now = pipeline.now().isoformat()
+                    for uid, s, rec in match_hits(index, ranges, now):
+                        self.stats.record(rec)
+                        self.trades.append(rec)
+                for r in range(i, j):
+                    sym, tf = keys[kidx[r]]
+                    ot, o, h, l, c, v = chunk[r]
+                    await pipeline.on_closed_kline(sym, tf, int(ot), o, h, l, c, v)
+                await pipeline.batcher.flush()
+                i = j
+            self.candles += n
+
+        elapsed = time.perf_counter() - t0
+        self.save()
+        self.report(elapsed)
+        return self.trades
+
+    def save(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.stats.dirty = True
+        self.stats.flush()
+        with open(os.path.join(self.out_dir, "trades.json"), "w") as f:
+            json.dump(self.trades, f, indent=2, default=str)
+        with open(os.path.join(self.out_dir, "signals.json"), "w") as f:
+            json.dump(self.pipeline.opened, f, indent=2, default=str)
+
+    def report(self, elapsed):
+        total = len(self.trades)
+        wins = sum(1 for t in self.trades if t["profit_percent"] >= 0)
+        pnl = sum(t["profit_percent"] for t in self.trades)
+        wr = wins / total * 100 if total else 0.0
+        print(f"🧪 Replay: {self.candles} candles in {elapsed:.1f}s ({self.candles / max(elapsed, 1e-9):,.0f} candles/s)")
+        print(f"   Signals: {len(self.pipeline.opened)} | Closed: {total} | Open: {len(self.index)}")
+        print(f"   WR {wr:.1f}% | Total PnL {pnl:.2f}% | Avg {pnl / total if total else 0.0:.4f}%")
+        print(f"   Output: {os.path.abspath(self.out_dir)}")
+
+
+def _ms(day):
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay kline historis lewat pipeline signal")
+    ap.add_argument("--symbols", help="comma separated, default semua file di --data")
+    ap.add_argument("--data", default=REPLAY_KLINES)
+    ap.add_argument("--out", default=REPLAY_OUT)
+    ap.add_argument("--start", help="YYYY-MM-DD (UTC)")
+    ap.add_argument("--end", help="YYYY-MM-DD (UTC, eksklusif)")
+    ap.add_argument("--days", type=int, default=30, help="dipakai kalau --start kosong")
+    ap.add_argument("--download", action="store_true", help="download kline dari Binance dulu")
+    ap.add_argument("--mode", choices=("batch", "incremental"), help="default EVAL_MODE")
+    ap.add_argument("--archive", nargs="?", const=ARCHIVE_DIR, help="baca dari arsip kline (default data/archive)")
+    args = ap.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    end_ms = _ms(args.end) if args.end else None
+    start_ms = _ms(args.start) if args.start else None
+
+    if args.download:
+        if not symbols:
+            ap.error("--download butuh --symbols")
+        end_ms = end_ms or int(datetime.now(timezone.utc).timestamp() * 1000)
+        start_ms = start_ms or end_ms - int(timedelta(days=args.days).total_seconds() * 1000)
+        asyncio.run(download_klines(symbols, STREAM_TFS, start_ms, end_ms, args.data))
+
+    if args.archive:
+        data = load_archive(args.archive, symbols, STREAM_TFS, start_ms, end_ms)
+    else:
+        data = load_klines(args.data, symbols, STREAM_TFS, start_ms, end_ms)
+    if not data:
+        print(f"⚠️ Tidak ada data kline di {args.archive or args.data}")
+        return
+    asyncio.run(ReplayEngine(data, args.mode, args.out).run())
+
+
+if __name__ == "__main__":
+    main()
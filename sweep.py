@@ -0,0 +1,381 @@
+"""
+Parameter sweep threshold signal_engine_v2 + TP/SL ATR di kline historis,
+paralel di semua core.
+
+    python sweep.py --symbols BTCUSDT,ETHUSDT --grid vol_mult=1.2,1.5,2 --grid rsi_buy=50,55,60
+    python sweep.py --random 300 --workers 8 --rank expectancy
+    python sweep.py --archive --tf 5m --start 2024-01-01 --end 2024-04-01
+
+Data sama dengan replay.py (<data>/<SYMBOL>_<tf>.npy atau --archive). TF yang
+tidak ada filenya dibangun dari BASE_TF. Tiap worker memegang satu symbol:
+indikator (EMA per span, RSI/MFI per periode, ATR, ...) dihitung sekali lalu
+dipakai semua kombinasi parameter; sinyal di-cache per parameter sinyal jadi
+variasi TP/SL hanya mengulang simulasi. TP/SL dicek ke high/low candle
+BASE_TF setelah close candle sinyal (prioritas sama dengan tracker).
+Hasil: ranking di layar + data/sweep/results.json.
+"""
+import argparse, itertools, json, os, random, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import utils.signal_engine_v2 as engine
+from gm_signal_bot import ALERT_COOLDOWN_SEC, BASE_TF, HISTORY_LEN, SL_ATR, TIMEFRAMES, TP_ATR
+from replay import REPLAY_KLINES, load_archive, load_klines
+from utils.indicators import atr as compute_atr
+from utils.kline_archive import ARCHIVE_DIR, list_symbols
+from utils.kline_buffer import interval_to_ms
+from utils.trigger_index import resolve_hit
+
+SWEEP_OUT = os.path.join(os.path.dirname(__file__), "data", "sweep")
+
+PARAM_DEFAULTS = {
+    "ema_fast": engine.EMA_FAST, "ema_med": engine.EMA_MED, "ema_long": engine.EMA_LONG, "ema_trend": engine.EMA_TREND,
+    "rsi_period": engine.RSI_PERIOD, "mfi_period": engine.MFI_PERIOD,
+    "vol_mult": engine.VOL_MULT, "atr_pct_min": engine.ATR_PCT_MIN,
+    "rsi_buy": engine.RSI_BUY, "rsi_short": engine.RSI_SHORT,
+    "tp1": TP_ATR[0], "tp2": TP_ATR[1], "tp3": TP_ATR[2], "sl": SL_ATR,
+}
+SIGNAL_KEYS = ("ema_fast", "ema_med", "ema_long", "ema_trend", "rsi_period", "mfi_period",
+               "vol_mult", "atr_pct_min", "rsi_buy", "rsi_short")
+DEFAULT_GRID = {
+    "ema_fast": [5, 8, 13], "ema_med": [21, 34],
+    "vol_mult": [1.2, 1.5, 2.0], "atr_pct_min": [0.001, 0.002, 0.003],
+    "rsi_buy": [50, 55, 60], "sl": [0.6, 0.8, 1.2],
+}
+RANK_KEYS = {"expectancy": True, "win_rate": True, "pnl": True, "max_drawdown": False}
+
+
+# ==========================
+# INDIKATOR (MEMO PER SERI)
+# ==========================
+class IndicatorCache:
+    """
+    Indikator satu seri (symbol, tf) dengan rumus yang sama dengan
+    detect_signal; tiap (indikator, periode) dihitung sekali. EMA dihitung
+    per window `window` candle seperti buffer live (HISTORY_LEN), bukan
+    seluruh seri, supaya threshold hasil tuning sama dengan yang dikirim bot.
+    """
+
+    def __init__(self, rows, step, window=HISTORY_LEN):
+        self.window = window
+        self.df = pd.DataFrame(rows[:, 1:], columns=["open", "high", "low", "close", "volume"])
+        self.close_ms = rows[:, 0].astype(np.int64) + step
+        self._memo = {}
+        self.hits = 0
+
+    def _get(self, key, fn):
+        v = self._memo.get(key)
+        if v is None:
+            v = self._memo[key] = fn()
+        else:
+            self.hits += 1
+        return v
+
+    def col(self, name):
+        return self._get(("col", name), lambda: self.df[name].to_numpy(dtype=np.float64))
+
+    def prev(self, name):
+        return self._get(("prev", name), lambda: np.r_[np.nan, self.col(name)[:-1]])
+
+    def _ema_pair(self, span):
+        return self._get(("ema", span), lambda: engine.ema_windowed(self.col("close"), span, self.window))
+
+    def ema(self, span):
+        return self._ema_pair(span)[0]
+
+    def ema_prev(self, span):
+        return self._ema_pair(span)[1]
+
+    def rsi(self, period):
+        return self._get(("rsi", period), lambda: engine.compute_rsi(self.df["close"], period).to_numpy())
+
+    def mfi(self, period):
+        return self._get(("mfi", period), lambda: engine.compute_mfi(self.df, period).to_numpy())
+
+    def atr(self):
+        return self._get(("atr",), lambda: compute_atr(self.df["high"], self.df["low"], self.df["close"]).to_numpy())
+
+    def vol_ma20(self):
+        return self._get(("vol_ma20",), lambda: self.df["volume"].rolling(20).mean().to_numpy())
+
+    def avg_body(self):
+        return self._get(("avg_body",), lambda: self.df["close"].pct_change().abs().rolling(20).mean().to_numpy())
+
+    def active(self):
+        """Filter jam aktif per bar (close time), sama dengan time_ok."""
+        def fn():
+            sod = self.close_ms % 86_400_000
+            return (sod >= engine.ACTIVE_HOUR_START * 3_600_000) & (sod <= engine.ACTIVE_HOUR_END * 3_600_000)
+        return self._get(("active",), fn)
+
+    def signals(self, p):
+        """Returns (index bar, side) sinyal untuk parameter p (tanpa cooldown)."""
+        key = ("signals",) + tuple(p[k] for k in SIGNAL_KEYS)
+
+        def fn():
+            with np.errstate(all="ignore"):
+                side, _, _ = engine.evaluate_signal_arrays(
+                    ema_fast_now=self.ema(p["ema_fast"]), ema_fast_prev=self.ema_prev(p["ema_fast"]),
+                    ema_med_now=self.ema(p["ema_med"]), ema_med_prev=self.ema_prev(p["ema_med"]),
+                    ema_long_now=self.ema(p["ema_long"]), ema_trend_now=self.ema(p["ema_trend"]),
+                    rsi_now=self.rsi(p["rsi_period"]), mfi_now=self.mfi(p["mfi_period"]),
+                    vol_now=self.col("volume"), vol_ma20=self.vol_ma20(), atr_now=self.atr(),
+                    last=tuple(self.col(f) for f in ("open", "high", "low", "close")),
+                    prev=tuple(self.prev(f) for f in ("open", "high", "low", "close")),
+                    avg_body=self.avg_body(), params=p,
+                )
+            warmup = max(p["ema_trend"], p["mfi_period"], p["rsi_period"], 30) - 1
+            side[:warmup] = 0
+            side[~self.active()] = 0
+            idx = np.flatnonzero(side)
+            return idx, side[idx]
+        return self._get(key, fn)
+
+
+def resample(rows, base_step, step):
+    """Candle TF besar dari candle base (hanya bucket lengkap, sejajar epoch)."""
+    if not len(rows):
+        return rows
+    bucket = rows[:, 0].astype(np.int64) // step * step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    out = np.column_stack([
+        bucket[starts], rows[starts, 1],
+        np.maximum.reduceat(rows[:, 2], starts), np.minimum.reduceat(rows[:, 3], starts),
+        rows[ends - 1, 4], np.add.reduceat(rows[:, 5], starts),
+    ]).astype(np.float64)
+    return out[(ends - starts) == step // base_step]
+
+
+# ==========================
+# SIMULASI TP/SL
+# ==========================
+def _first_hit(high, low, start, up, down):
+    """Index candle base pertama dengan high >= up atau low <= down, None kalau tidak ada."""
+    n, size = len(high), 256
+    while start < n:
+        end = min(n, start + size)
+        hit = (high[start:end] >= up) | (low[start:end] <= down)
+        if hit.any():
+            return start + int(np.argmax(hit))
+        start, size = end, size * 2
+    return None
+
+
+def simulate(cache, p, base, cooldown_ms):
+    """Trade hasil parameter p: list (exit_ms, profit %). Signal yang belum kena TP/SL tidak dihitung."""
+    idx, sides = cache.signals(p)
+    b_open = base[:, 0].astype(np.int64)
+    b_high, b_low = base[:, 2], base[:, 3]
+    step = int(b_open[1] - b_open[0]) if len(b_open) > 1 else 60_000
+    close, atr = cache.col("close"), cache.atr()
+    trades, open_n, last = [], 0, None
+    for i, side in zip(idx.tolist(), sides.tolist()):
+        t = int(cache.close_ms[i])
+        if last is not None and t - last < cooldown_ms:
+            continue
+        last = t
+        price, a = float(close[i]), float(atr[i])
+        d = 1 if side > 0 else -1
+        s = {"side": "buy" if d > 0 else "short", "tp1": price + d * p["tp1"] * a, "tp2": price + d * p["tp2"] * a,
+             "tp3": price + d * p["tp3"] * a, "sl": price - d * p["sl"] * a}
+        if d > 0:
+            up, down = min(s["tp1"], s["tp2"], s["tp3"]), s["sl"]
+        else:
+            up, down = s["sl"], max(s["tp1"], s["tp2"], s["tp3"])
+        j = _first_hit(b_high, b_low, int(np.searchsorted(b_open, t)), up, down)
+        if j is None:
+            open_n += 1
+            continue
+        _, level = resolve_hit(s, float(b_high[j]), float(b_low[j]))
+        profit = (level - price) / price * 100 if d > 0 else (price - level) / price * 100
+        trades.append((int(b_open[j]) + step, profit))
+    return trades, open_n
+
+
+def metrics(trades, open_n=0):
+    if not trades:
+        return {"trades": 0, "open": open_n, "win_rate": 0.0, "expectancy": 0.0, "pnl": 0.0, "max_drawdown": 0.0}
+    trades = sorted(trades)
+    profit = np.array([t[1] for t in trades])
+    equity = np.cumsum(profit)
+    drawdown = np.maximum.accumulate(np.r_[0.0, equity])[1:] - equity
+    return {
+        "trades": len(profit), "open": open_n,
+        "win_rate": round(float((profit >= 0).mean() * 100), 2),
+        "expectancy": round(float(profit.mean()), 4),
+        "pnl": round(float(profit.sum()), 2),
+        "max_drawdown": round(float(drawdown.max()), 2),
+    }
+
+
+# ==========================
+# WORKER
+# ==========================
+def _load(source, symbol, tfs, start_ms, end_ms):
+    """Hanya TF yang tersimpan; sisanya di-resample dari BASE_TF."""
+    kind, path = source
+    if kind == "archive":
+        tfs = [tf for tf in tfs if os.path.isdir(os.path.join(path, tf, symbol))]
+        return load_archive(path, [symbol], tfs, start_ms, end_ms) if tfs else {}
+    tfs = [tf for tf in tfs if os.path.exists(os.path.join(path, f"{symbol}_{tf}.npy"))]
+    return load_klines(path, [symbol], tfs, start_ms, end_ms) if tfs else {}
+
+
+def run_symbol(job):
+    """Worker: satu symbol, semua TF x semua parameter. Returns {i: (trades, open)}."""
+    source, symbol, tfs, start_ms, end_ms, params = job
+    data = _load(source, symbol, list(dict.fromkeys([BASE_TF] + tfs)), start_ms, end_ms)
+    base = data.get((symbol, BASE_TF))
+    if base is None or len(base) < 2:
+        return symbol, {}, 0
+    base_step = interval_to_ms(BASE_TF)
+    out, hits = {}, 0
+    for tf in tfs:
+        step = interval_to_ms(tf)
+        rows = data.get((symbol, tf))
+        if rows is None:
+            rows = resample(base, base_step, step)
+        if len(rows) < 2:
+            continue
+        cache = IndicatorCache(rows, step)
+        for i, p in enumerate(params):
+            trades, open_n = simulate(cache, p, base, ALERT_COOLDOWN_SEC * 1000)
+            prev = out.get(i, ([], 0))
+            out[i] = (prev[0] + trades, prev[1] + open_n)
+        hits += cache.hits
+    return symbol, out, hits
+
+
+# ==========================
+# PARAMETER GRID
+# ==========================
+def _value(v):
+    v = v.strip()
+    try:
+        return int(v)
+    except ValueError:
+        return float(v)
+
+
+def parse_grid(items):
+    grid = {}
+    for item in items or ():
+        name, _, values = item.partition("=")
+        if name not in PARAM_DEFAULTS:
+            raise SystemExit(f"parameter tidak dikenal: {name} (pilihan: {', '.join(PARAM_DEFAULTS)})")
+        grid[name] = [_value(v) for v in values.split(",") if v.strip()]
+    return grid or DEFAULT_GRID
+
+
+def valid(p):
+    return (p["ema_fast"] < p["ema_med"] < p["ema_long"] <= p["ema_trend"]
+            and p["rsi_short"] <= p["rsi_buy"] and p["tp1"] > 0 and p["sl"] > 0)
+
+
+def param_sets(grid, n_random=0, seed=0):
+    """Grid lengkap, atau n_random kombinasi acak dari grid (random search)."""
+    names = list(grid)
+    if n_random:
+        rng = random.Random(seed)
+        combos = {tuple(rng.choice(grid[k]) for k in names) for _ in range(n_random * 4)}
+        combos = sorted(combos)
+        rng.shuffle(combos)
+    else:
+        combos = itertools.product(*(grid[k] for k in names))
+    out = []
+    for combo in combos:
+        p = dict(PARAM_DEFAULTS, **dict(zip(names, combo)))
+        if valid(p):
+            out.append(p)
+        if n_random and len(out) >= n_random:
+            break
+    return out
+
+
+def _ms(day):
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Parameter sweep signal_engine_v2")
+    ap.add_argument("--symbols", help="comma separated, default semua data")
+    ap.add_argument("--data", default=REPLAY_KLINES)
+    ap.add_argument("--archive", nargs="?", const=ARCHIVE_DIR, help="baca dari arsip kline")
+    ap.add_argument("--tf", default=",".join(TIMEFRAMES), help="TF yang dievaluasi (default TIMEFRAMES)")
+    ap.add_argument("--start", help="YYYY-MM-DD (UTC)")
+    ap.add_argument("--end", help="YYYY-MM-DD (UTC, eksklusif)")
+    ap.add_argument("--days", type=int, help="N hari terakhir sebelum --end")
+    ap.add_argument("--grid", action="append", help="name=v1,v2,... (boleh berulang), default grid bawaan")
+    ap.add_argument("--random", type=int, default=0, help="random search N kombinasi dari grid")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--rank", choices=tuple(RANK_KEYS), default="expectancy")
+    ap.add_argument("--min-trades", type=int, default=20)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", default=SWEEP_OUT)
+    args = ap.parse_args()
+
+    tfs = [tf.strip() for tf in args.tf.split(",") if tf.strip()]
+    end_ms = _ms(args.end) if args.end else None
+    start_ms = _ms(args.start) if args.start else None
+    if args.days:
+        end_ms = end_ms or int(datetime.now(timezone.utc).timestamp() * 1000)
+        start_ms = end_ms - int(timedelta(days=args.days).total_seconds() * 1000)
+
+    source = ("archive", args.archive) if args.archive else ("npy", args.data)
+    if args.symbols:
+        symbols = [s.strip().upper() for s in args.symbols.split(",")]
+    elif args.archive:
+        symbols = list_symbols(BASE_TF, args.archive)
+    else:
+        suffix = f"_{BASE_TF}.npy"
+        symbols = sorted(f[:-len(suffix)] for f in os.listdir(args.data) if f.endswith(suffix)) \
+            if os.path.isdir(args.data) else []
+    if not symbols:
+        print(f"⚠️ Tidak ada data kline di {args.archive or args.data}")
+        return
+
+    params = param_sets(parse_grid(args.grid), args.random, args.seed)
+    print(f"🔬 Sweep {len(params)} parameter sets x {len(symbols)} symbols x {len(tfs)} TF, {args.workers} workers")
+
+    t0 = time.perf_counter()
+    merged = [([], 0) for _ in params]
+    memo_hits = 0
+    jobs = [(source, s, tfs, start_ms, end_ms, params) for s in symbols]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for sym, out, hits in pool.map(run_symbol, jobs):
+            memo_hits += hits
+            for i, (trades, open_n) in out.items():
+                merged[i] = (merged[i][0] + trades, merged[i][1] + open_n)
+    elapsed = time.perf_counter() - t0
+
+    results = []
+    for p, (trades, open_n) in zip(params, merged):
+        changed = {k: v for k, v in p.items() if v != PARAM_DEFAULTS[k]}
+        results.append({"params": p, "changed": changed, **metrics(trades, open_n)})
+    higher = RANK_KEYS[args.rank]
+    eligible = [r for r in results if r["trades"] >= args.min_trades]
+    eligible.sort(key=lambda r: (r[args.rank] if higher else -r[args.rank], r["expectancy"]), reverse=True)
+
+    print(f"⏱️ {elapsed:.1f}s ({len(params) * len(symbols) * len(tfs) / max(elapsed, 1e-9):,.1f} series-evals/s, "
+          f"{memo_hits} cached indicator lookups)")
+    print(f"{'#':>3} {'trades':>6} {'WR%':>6} {'exp%':>8} {'pnl%':>8} {'maxDD%':>7}  params")
+    for n, r in enumerate(eligible[:args.top], 1):
+        print(f"{n:>3} {r['trades']:>6} {r['win_rate']:>6.1f} {r['expectancy']:>8.4f} {r['pnl']:>8.2f} "
+              f"{r['max_drawdown']:>7.2f}  {r['changed'] or 'default'}")
+    if not eligible:
+        print(f"⚠️ Tidak ada parameter dengan >= {args.min_trades} trades")
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, "results.json"), "w") as f:
+        json.dump({"rank": args.rank, "symbols": symbols, "timeframes": tfs,
+                   "results": eligible + [r for r in results if r["trades"] < args.min_trades]}, f, indent=2)
+    print(f"   Output: {os.path.abspath(os.path.join(args.out, 'results.json'))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modul bot ada di root repo (tanpa package)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
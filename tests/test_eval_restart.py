@@ -0,0 +1,70 @@
+import asyncio
+
+from utils.eval_workers import EvalWorkerPool
+from utils.kline_buffer import KlineStore
+
+
+class CountingPipeline:
+    """Pipeline worker minimal: candle PING membalas jumlah bar history BTCUSDT."""
+
+    def __init__(self):
+        self.store = KlineStore(300)
+        self.batcher = self
+        self.sink = None
+
+    async def flush(self):
+        pass
+
+    async def on_closed_kline(self, sym, tf, t, *a, evaluate=True):
+        if sym == "PING":
+            await self.sink(sym, tf, {"n": len(self.store.get("BTCUSDT", "1m"))})
+
+    def drop_symbol(self, sym):
+        pass
+
+
+def factory():
+    return CountingPipeline()
+
+
+async def wait_until(cond, timeout=10):
+    for _ in range(int(timeout / 0.02)):
+        if cond():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+def test_seed_sent_while_pipe_closed_is_flushed_after_respawn():
+    async def run():
+        got = []
+
+        async def on_signal(sym, tf, sig):
+            got.append(sig)
+
+        async def on_restart(i):
+            pass
+
+        st = KlineStore(300)
+        for k in range(120):
+            st.append("BTCUSDT", "1m", k * 60000, 1, 1, 1, 1, 1)
+        pool = EvalWorkerPool(1, factory, on_signal, on_restart)
+        pool.start()
+        spawn = pool._spawn
+
+        def seed_then_spawn(i):
+            assert pool._inboxes[i].closed
+            pool.seed(st, ["BTCUSDT"])   # pipe lama sudah ditutup, worker baru belum ada
+            spawn(i)
+        pool._spawn = seed_then_spawn
+        try:
+            pool.procs[0].kill()
+            assert await wait_until(lambda: pool.restarts and 0 not in pool._restarting)
+            pool.send_candle("PING", "1m", 1, 1, 1, 1, 1, 1)
+            assert await wait_until(lambda: got)
+            return got, pool._pending_bytes[0]
+        finally:
+            await pool.close(timeout=1)
+
+    got, pending = asyncio.run(run())
+    assert got == [{"n": 120}] and pending == 0
@@ -0,0 +1,77 @@
+import asyncio
+
+import utils.backfill as backfill
+from gm_signal_bot import SignalPipeline
+from loadtest.http_stub import json_response, serve_http
+from utils.http_client import close_client
+
+STEP = 60_000
+T0 = 1_700_000_000_000 // STEP * STEP
+
+
+def kline(t):
+    p = 100 + (t - T0) / STEP
+    return [t, str(p), str(p + 1), str(p - 1), str(p + 0.5), "10", t + STEP - 1]
+
+
+async def run_gap(monkeypatch, late, drop=False):
+    requests = []
+
+    def handler(method, path, query, body, headers):
+        requests.append(query)
+        if drop:   # symbol keluar dari universe selama fetch
+            pipeline.drop_symbol("BTCUSDT")
+        start, limit = int(query["startTime"]), int(query["limit"])
+        return json_response([kline(start + i * STEP) for i in range(limit)])
+
+    server = await serve_http(handler)
+    monkeypatch.setattr(backfill, "FAPI", f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+    monkeypatch.setattr(backfill, "_gap_limiter", None)
+    try:
+        pipeline = SignalPipeline(bot=None)
+        pipeline.symbols.add("BTCUSDT")
+        buf = pipeline.store.get("BTCUSDT", "1m")
+        for i in range(50):   # history backfill, bar terakhir di T0
+            buf.append(T0 - (49 - i) * STEP, 1, 2, 0.5, 1.5, 10)
+
+        # candle websocket pertama melompat 4 bar (close di antara backfill dan subscribe)
+        await pipeline.on_closed_kline("BTCUSDT", "1m", T0 + 5 * STEP, 1, 2, 0.5, 1.5, 10)
+        for t in late:   # datang selama gap masih diambil
+            await pipeline.on_closed_kline("BTCUSDT", "1m", t, 1, 2, 0.5, 1.5, 10)
+        await asyncio.gather(*pipeline._tasks)
+        return buf.view("open_time").tolist(), requests, pipeline
+    finally:
+        server.close()
+        await close_client()
+
+
+def test_forward_gap_is_refetched(monkeypatch):
+    times, requests, pipeline = asyncio.run(run_gap(monkeypatch, []))
+    assert times[-6:] == [T0 + i * STEP for i in range(6)]
+    assert len(requests) == 1 and int(requests[0]["startTime"]) == T0 + STEP
+    assert not pipeline._gaps
+
+
+def test_candles_during_fill_keep_order(monkeypatch):
+    late = [T0 + 6 * STEP, T0 + 5 * STEP, T0 + 7 * STEP]   # termasuk duplikat
+    times, _, _ = asyncio.run(run_gap(monkeypatch, late))
+    assert times[-8:] == [T0 + i * STEP for i in range(8)]
+
+
+def test_contiguous_candle_does_not_fetch(monkeypatch):
+    async def run():
+        pipeline = SignalPipeline(bot=None)
+        buf = pipeline.store.get("BTCUSDT", "1m")
+        buf.append(T0, 1, 2, 0.5, 1.5, 10)
+        await pipeline.on_closed_kline("BTCUSDT", "1m", T0 + STEP, 1, 2, 0.5, 1.5, 10)
+        return pipeline, buf
+
+    pipeline, buf = asyncio.run(run())
+    assert not pipeline._tasks and buf.last_open_time == T0 + STEP
+
+
+def test_symbol_dropped_during_fill_is_not_recreated(monkeypatch):
+    _, requests, pipeline = asyncio.run(run_gap(monkeypatch, [T0 + 6 * STEP], drop=True))
+    assert len(requests) == 1
+    assert not [k for k in pipeline.store.keys() if k[0] == "BTCUSDT"]
+    assert "BTCUSDT" not in pipeline.resamplers and not pipeline._gaps
@@ -0,0 +1,30 @@
+import json
+import threading
+
+from utils.history_store import HistoryStore
+
+
+def test_legacy_import_runs_once_across_processes(tmp_path):
+    legacy = tmp_path / "signals_history.json"
+    legacy.write_text(json.dumps([{"symbol": "BTCUSDT", "timeframe": "1m", "result": "TP1",
+                                   "profit_percent": 0.5, "timestamp": f"2024-05-01T00:00:{i:02d}"}
+                                  for i in range(50)]))
+    db = str(tmp_path / "history.db")
+    # satu koneksi per "worker shard", semuanya start bersamaan
+    stores = [HistoryStore(db) for _ in range(4)]
+    assert all(s.count() == 0 for s in stores)   # tidak ada impor dari __init__
+    results = [None] * len(stores)
+    barrier = threading.Barrier(len(stores))
+
+    def run(i):
+        barrier.wait()
+        results[i] = stores[i].import_json(str(legacy))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(stores))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0, 0, 0, 50]
+    assert stores[0].count() == 50
+    assert stores[0].import_json(str(legacy)) == 0
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import utils.stream_manager as sm
+from utils.stream_manager import StreamConnection
+
+STREAM = "btcusdt@kline_1m"
+
+
+def frame(e_ms, final):
+    x = "true" if final else "false"
+    return f'{{"stream":"{STREAM}","data":{{"e":"kline","E":{e_ms},"s":"BTCUSDT","k":{{"x":{x}}}}}}}'
+
+
+def run_frames(frames):
+    """Frame masuk lewat intake lalu diproses; returns (conn, [stale, ...])."""
+    async def run():
+        got = []
+
+        async def on_message(raw, stale):
+            got.append(stale)
+
+        conn = StreamConnection("t", on_message)
+        proc = asyncio.create_task(conn._process())
+        for f in frames:
+            conn._intake(STREAM, f() if callable(f) else f)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        proc.cancel()
+        return conn, got
+    return asyncio.run(run())
+
+
+def test_partials_dropped_at_intake():
+    now = int(time.time() * 1000)
+    conn, got = run_frames([frame(now, False), frame(now, False), frame(now, True)])
+    assert got == [False] and conn.partials == 2 and conn.depth == 0
+
+
+def test_host_clock_ahead_does_not_stall_evaluation():
+    # jam host maju 8 detik: semua pesan terlihat lag 8s
+    ahead = lambda: frame(int((time.time() - 8) * 1000), True)
+    conn, got = run_frames([ahead] * 3)
+    assert got == [False] * 3 and 7.5 < conn.skew < 8.5
+
+
+def test_real_lag_still_shed_with_skew(monkeypatch):
+    monkeypatch.setattr(sm, "INGEST_LAG_SHED_SEC", 5)
+    ahead = lambda: frame(int((time.time() - 8) * 1000), True)
+    late = lambda: frame(int((time.time() - 20) * 1000), True)
+    _, got = run_frames([ahead, late, ahead])
+    assert got == [False, True, False]
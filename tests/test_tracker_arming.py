@@ -0,0 +1,80 @@
+import asyncio
+
+import tracker as tracker_mod
+from tracker import PriceTracker
+from utils.signal_registry import SignalRegistry
+
+
+def make_tracker(monkeypatch, tmp_path):
+    recorded, sent = [], []
+
+    async def record_result(rec):
+        recorded.append(rec)
+    monkeypatch.setattr(tracker_mod, "record_result", record_result)
+    t = PriceTracker(bot=object(), registry=SignalRegistry(str(tmp_path / "active.json"), load=False))
+
+    async def send_msg(text):
+        sent.append(text)
+    t.send_msg = send_msg
+    return t, recorded
+
+
+def buy(entry, sl, opened_at):
+    return {"symbol": "BTCUSDT", "tf": "1m", "side": "buy", "entry": entry,
+            "tp1": entry + 1, "tp2": entry + 2, "tp3": entry + 3, "sl": sl,
+            "status": "OPEN", "opened_at": opened_at}
+
+
+def test_entry_candle_range_does_not_close_new_signal(monkeypatch, tmp_path):
+    t, recorded = make_tracker(monkeypatch, tmp_path)
+    t.on_price("BTCUSDT", 100.5, 98.0)   # wick candle entry (sebelum signal dibuka)
+    t.registry.open("new", buy(100.1, 99.3, "t1"))
+    t.on_price("BTCUSDT", 100.12)        # mark price setelah entry
+    closed = asyncio.run(t.evaluate())
+    assert closed == [] and recorded == []
+    assert "new" in t.registry and "new" in t.index
+
+    t.on_price("BTCUSDT", 100.0, 99.2)   # candle berikutnya menembus SL
+    closed = asyncio.run(t.evaluate())
+    assert [rec["result"] for _, rec in closed] == ["SL"]
+
+
+def test_range_before_open_still_hits_existing_signal(monkeypatch, tmp_path):
+    t, recorded = make_tracker(monkeypatch, tmp_path)
+    t.registry.open("old", buy(100.5, 99.0, "t0"))
+    t.on_price("BTCUSDT", 100.5, 98.0)
+    t.registry.open("new", buy(100.1, 99.3, "t1"))
+    closed = asyncio.run(t.evaluate())
+    assert [s["opened_at"] for s, _ in closed] == ["t0"]
+    assert "new" in t.registry and "old" not in t.registry
+
+
+def test_second_open_keeps_checking_first_signal(monkeypatch, tmp_path):
+    # signal 1m dan 5m dibuka di boundary yang sama, wick di antaranya menembus SL signal pertama
+    t, recorded = make_tracker(monkeypatch, tmp_path)
+    t.on_price("BTCUSDT", 100.5, 98.0)
+    t.registry.open("a", buy(100.1, 99.3, "t1"))
+    t.on_price("BTCUSDT", 100.2, 99.0)
+    t.registry.open("b", buy(100.1, 98.5, "t2"))
+    closed = asyncio.run(t.evaluate())
+    assert [(s["opened_at"], rec["result"]) for s, rec in closed] == [("t1", "SL")]
+    assert "b" in t.registry
+
+
+def test_shared_store_sync_is_rate_limited(monkeypatch, tmp_path):
+    from utils.shared_store import SqliteStore
+    shared = SqliteStore(str(tmp_path / "shared.db"))
+    monkeypatch.setattr(tracker_mod, "record_result", lambda rec: asyncio.sleep(0))
+    t = PriceTracker(bot=object(), shared=shared, registry=SignalRegistry(str(tmp_path / "active.json"), load=False))
+    t.send_msg = lambda text: asyncio.sleep(0)
+    calls = []
+    version = shared.active_version
+    monkeypatch.setattr(shared, "active_version", lambda: calls.append(1) or version())
+
+    shared.put_active("a", buy(100.1, 99.3, "t1"))   # dibuka worker lain
+    asyncio.run(t.evaluate())
+    assert "a" in t.registry and len(calls) == 1
+    t.on_price("BTCUSDT", 100.2, 99.0)
+    closed = asyncio.run(t.evaluate())
+    assert len(calls) == 1 and [rec["result"] for _, rec in closed] == ["SL"]
+    assert shared.active() == {}
@@ -0,0 +1,31 @@
+import heapq
+import random
+
+from utils.volume_ranking import VolumeRanking
+
+
+def test_incremental_candidates_match_full_sort():
+    rng = random.Random(7)
+    syms = [f"S{i:03d}USDT" for i in range(300)]
+    r = VolumeRanking(20, exit_band=5)
+    r.update([{"s": s, "q": rng.random() * 1e6} for s in syms])
+    for step in range(200):
+        # stream hanya mengirim symbol yang berubah
+        r.update([{"s": s, "q": rng.random() * 1e6} for s in rng.sample(syms, 40)])
+        if step == 100:
+            r.set_allowed(syms[:250])
+        r.rerank()
+        assert r.cands == set(heapq.nlargest(25, r.volumes, key=r.volumes.__getitem__))
+        assert len(r.members) == 20 and r.members <= r.cands
+    assert len(r._cand_heap) + len(r._rest_heap) <= 4 * len(r.volumes) + 64 + 40
+
+
+def test_member_near_cutoff_does_not_flap():
+    r = VolumeRanking(2, exit_band=1, swap_margin=0.1)
+    r.update([{"s": "AUSDT", "q": 100}, {"s": "BUSDT", "q": 90}, {"s": "CUSDT", "q": 80}])
+    r.rerank()
+    assert r.top() == ["AUSDT", "BUSDT"]
+    r.update([{"s": "CUSDT", "q": 95}])   # lewat B, tapi kurang dari margin 10%
+    assert not r.rerank()
+    r.update([{"s": "CUSDT", "q": 120}])
+    assert r.rerank() and r.top() == ["CUSDT", "AUSDT"]
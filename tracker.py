@@ -1,93 +1,186 @@
 
-import time, os, json
-import requests
+import asyncio, itertools, os, json, time
+import websockets
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from utils.data_store import load_json, save_json, append_history
+from utils.http_client import get_json
+from utils.shared_store import call as store_call
+from utils.signal_registry import get_registry
 from utils.stats_manager import record_result
-from telegram import Bot
+from utils.telegram_utils import make_bot, send_message_async, PRIORITY_UPDATE
+from utils.trigger_index import TriggerIndex
 
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-FAPI = os.getenv("BINANCE_REST_URL","https://fapi.binance.com")
 POLL = int(os.getenv("CHECK_PRICE_INTERVAL","20"))
+# mode shard: versi signal aktif di shared store dicek paling sering tiap N detik (bukan tiap tick harga)
+SHARED_RELOAD_SEC = float(os.getenv("SHARED_RELOAD_SEC", "2"))
+# satu stream untuk semua symbol: mark price tiap 1 detik
+MARK_STREAM = os.getenv("BINANCE_FAPI_URL", "wss://fstream.binance.com") + "/ws/!markPrice@arr@1s"
+def trade_result(s, tag, level, price, now):
+    """Tandai signal CLOSED. Returns record history (format stats_manager)."""
+    side = s["side"]
+    entry = s["entry"]
+    s["status"]="CLOSED"
+    s["closed_at"]=now
+    s["closed_by"]=tag
+    s["closed_price"]=price
+    # compute profit percent approx
+    profit = (level - entry) / entry * 100 if side=='buy' else (entry - level)/entry*100
+    return {"symbol":s["symbol"],"timeframe":s.get("tf"),"side":side,"entry":entry,"exit":level,"result":tag,"profit_percent":profit,"timestamp":now,"confidence":s.get("confidence")}
 
-bot = Bot(token=TELEGRAM_TOKEN)
-
-def get_price(sym):
-    try:
-        r = requests.get(FAPI + "/fapi/v1/ticker/price", params={"symbol":sym}, timeout=8)
-        r.raise_for_status()
-        return float(r.json().get("price",0))
-    except:
-        return None
-
-def send_msg(text):
-    try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=text, parse_mode="Markdown")
-    except Exception as e:
-        print("tg error", e)
-
-def load_active():
-    p = os.path.join(os.path.dirname(__file__),"data","signals_active.json")
-    if not os.path.exists(p):
-        return {}
-    return json.load(open(p))
-
-def save_active(d):
-    p = os.path.join(os.path.dirname(__file__),"data","signals_active.json")
-    json.dump(d, open(p,"w"), indent=2, default=str)
-
-def check_signals():
-    active = load_active()
-    changed = False
-    now = datetime.now(timezone.utc).isoformat()
-    for uid, s in list(active.items()):
-        if s.get("status") != "OPEN": continue
-        sym = s["symbol"]
-        price = get_price(sym)
-        if price is None: continue
-        side = s["side"]
-        entry = s["entry"]
-        tp1, tp2, tp3, sl = s["tp1"], s["tp2"], s["tp3"], s["sl"]
-        hit = None
-        if side=="buy":
-            if price >= tp3: hit=("TP3", tp3)
-            elif price >= tp2: hit=("TP2", tp2)
-            elif price >= tp1: hit=("TP1", tp1)
-            elif price <= sl: hit=("SL", sl)
+def match_hits(index, ranges, now, skip=None):
+    """
+    Cek range harga (symbol -> (high, low)) terhadap TriggerIndex.
+    skip: symbol -> {uid} signal yang belum aktif saat range ini terkumpul.
+    Yields (uid, signal, record) untuk tiap signal yang kena TP/SL.
+    """
+    for sym, (high, low) in ranges.items():
+        if skip and sym in skip:
+            hits = index.match_except(sym, high, low, skip[sym])
         else:
-            if price <= tp3: hit=("TP3", tp3)
-            elif price <= tp2: hit=("TP2", tp2)
-            elif price <= tp1: hit=("TP1", tp1)
-            elif price >= sl: hit=("SL", sl)
-        if hit:
-            tag, level = hit
-            s["status"]="CLOSED"
-            s["closed_at"]=now
-            s["closed_by"]=tag
-            s["closed_price"]=price
-            # compute profit percent approx
-            profit = (level - entry) / entry * 100 if side=='buy' else (entry - level)/entry*100
-            rec = {"symbol":sym,"timeframe":s.get("tf"),"side":side,"entry":entry,"exit":level,"result":tag,"profit_percent":profit,"timestamp":now}
-            append_history(rec)
-            record_result(rec)
-            del active[uid]
-            save_active(active)
-            send_msg(f"✅ {sym} ({s.get('tf')}) | {tag} Hit @ {level:.8f}\nPnL: {profit:.4f}%")
-            changed = True
-    return changed
-
-def start_tracker():
-    print("Tracker started")
-    while True:
-        try:
-            check_signals()
-        except Exception as e:
-            print("tracker error", e)
-        time.sleep(POLL)
-
-async def start_tracker_async():
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, start_tracker)
+            hits = index.match(sym, high, low)
+        for uid, s, (tag, level) in hits:
+            # harga ekstrem yang memicu hit
+            price = high if (s["side"] == "buy") == (tag != "SL") else low
+            yield uid, s, trade_result(s, tag, level, price, now)
+
+
+class PriceTracker:
+    """
+    Tracker TP/SL berbasis stream. Harga masuk lewat on_price (mark price
+    stream, polling bulk ticker, atau high/low candle dari gm_signal_bot);
+    hit dicek terhadap high/low sejak evaluasi terakhir sehingga wick di
+    antara update tetap tertangkap.
+    Signal aktif dimiliki SignalRegistry (sama dengan yang dipakai
+    gm_signal_bot); TriggerIndex mengikuti event opened/updated/closed.
+    shared: store bersama worker shard. Registry disamakan dengan store dan
+    signal ditutup lewat close_active, jadi tiap hit hanya dicatat/dikirim
+    oleh satu worker (termasuk signal milik worker yang sudah mati).
+    Signal baru hanya dicek terhadap harga yang masuk setelah event opened:
+    range symbol itu dipotong per signal yang dibuka, dan tiap potongan
+    hanya dicek terhadap signal yang sudah terbuka saat potongan itu terkumpul.
+    """
+
+    def __init__(self, bot=None, shared=None, registry=None):
+        self.bot = bot
+        self.shared = shared
+        self.registry = registry if registry is not None else get_registry()
+        self.index = TriggerIndex()
+        for uid, s in self.registry.items():
+            self.index.add(uid, s)
+        self.registry.on("opened", self._on_opened)
+        self.registry.on("updated", self.index.add)   # level bisa berubah
+        self.registry.on("closed", lambda uid, s: self.index.remove(uid))
+        self._version = None
+        self._reloaded = 0.0
+        self.ranges = {}   # symbol -> [high, low]
+        # symbol -> ([range sebelum signal ke-k dibuka], [uid signal ke-k]) sejak evaluasi terakhir
+        self.unarmed = {}
+        self.reload()
+
+    def _on_opened(self, uid, s):
+        self.index.add(uid, s)
+        ranges, uids = self.unarmed.setdefault(s["symbol"], ([], []))
+        ranges.append(self.ranges.pop(s["symbol"], None))
+        uids.append(uid)
+
+    def _segments(self, unarmed):
+        """Potongan range urut waktu: potongan ke-k tidak dicek ke signal ke-k dan sesudahnya."""
+        for sym, (ranges, uids) in unarmed.items():
+            for k, r in enumerate(ranges):
+                if r is not None:
+                    yield {sym: r}, {sym: set(uids[k:])}
+
+    def reload(self):
+        """Mode shard: samakan registry dengan shared store, hanya kalau versinya berubah."""
+        if self.shared is None:
+            return
+        version = self.shared.active_version()
+        if version != self._version:
+            self.registry.sync(self.shared.active())
+            self._version = version
+
+    async def reload_async(self):
+        """reload() dari event loop: dibatasi SHARED_RELOAD_SEC, query store di thread."""
+        if self.shared is None or time.monotonic() - self._reloaded < SHARED_RELOAD_SEC:
+            return
+        self._reloaded = time.monotonic()
+        version = await store_call(self.shared, "active_version")
+        if version != self._version:
+            self.registry.sync(await store_call(self.shared, "active"))
+            self._version = version
+
+    def on_price(self, sym, high, low=None):
+        low = high if low is None else low
+        r = self.ranges.get(sym)
+        if r is None:
+            self.ranges[sym] = [high, low]
+        else:
+            if high > r[0]: r[0] = high
+            if low < r[1]: r[1] = low
+
+    async def evaluate(self):
+        """Cek semua signal OPEN terhadap range harga yang terkumpul."""
+        await self.reload_async()
+        ranges, self.ranges = self.ranges, {}
+        unarmed, self.unarmed = self.unarmed, {}
+        if not ranges and not unarmed:
+            return []
+        now = datetime.now(timezone.utc).isoformat()
+        closed = []
+        # hanya signal yang levelnya tersentuh yang diambil dari index;
+        # range sebelum signal baru dibuka dicek dulu, tanpa signal yang dibuka sesudahnya
+        hits = itertools.chain(
+            *(match_hits(self.index, seg, now, skip=skip) for seg, skip in self._segments(unarmed)),
+            match_hits(self.index, ranges, now))
+        for uid, s, rec in hits:
+            self.registry.close(uid)
+            if self.shared is not None and not await store_call(self.shared, "close_active", uid):
+                continue  # sudah ditutup tracker worker lain
+            await record_result(rec)  # sekaligus append ke history
+            closed.append((s, rec))
+        if closed:
+            for s, rec in closed:
+                await self.send_msg(f"✅ {rec['symbol']} ({s.get('tf')}) | {rec['result']} Hit @ {rec['exit']:.8f}\nPnL: {rec['profit_percent']:.4f}%")
+        return closed
+
+    async def send_msg(self, text):
+        if self.bot is None:
+            self.bot = make_bot(TELEGRAM_TOKEN)
+        await send_message_async(self.bot, TELEGRAM_CHAT_ID, text, priority=PRIORITY_UPDATE)
+
+    async def run_stream(self):
+        """Mark price semua symbol dari satu koneksi websocket."""
+        async with websockets.connect(MARK_STREAM, ping_interval=20, ping_timeout=10) as ws:
+            print("Tracker stream connected")
+            async for raw in ws:
+                for item in json.loads(raw):
+                    self.on_price(item["s"], float(item["p"]))
+                await self.evaluate()
+
+    async def poll_once(self):
+        """Fallback: 1 request bulk /ticker/price untuk semua symbol."""
+        for item in await get_json("/fapi/v1/ticker/price", timeout=8):
+            self.on_price(item["symbol"], float(item["price"]))
+        return await self.evaluate()
+
+    async def run(self):
+        print("Tracker started")
+        while True:
+            try:
+                await self.run_stream()
+            except Exception as e:
+                print("tracker stream error", e)
+            # stream putus: polling bulk sampai reconnect berikutnya
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print("tracker error", e)
+            await asyncio.sleep(POLL)
+
+
+async def start_tracker_async(tracker=None):
+    tracker = tracker or PriceTracker()
+    await tracker.run()
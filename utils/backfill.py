@@ -0,0 +1,230 @@
+
+import asyncio
+import os
+import time
+
+import httpx
+import numpy as np
+
+from .http_client import FAPI, backoff, get_client
+from .kline_archive import KLINE_ARCHIVE, read_range
+from .kline_buffer import interval_to_ms
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+CACHE_DIR = os.path.join(DATA_DIR, "klines")
+
+# Binance USDT-M: 2400 weight / menit per IP. Sisakan ruang untuk caller lain.
+WEIGHT_PER_MIN = int(os.getenv("BACKFILL_WEIGHT_PER_MIN", "1800"))
+CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "10"))
+MAX_LIMIT = 1500
+
+
+def klines_weight(limit):
+    """Request weight /fapi/v1/klines berdasarkan parameter limit."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class WeightLimiter:
+    """Token bucket sederhana untuk request weight per menit."""
+
+    def __init__(self, per_minute=WEIGHT_PER_MIN):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, weight):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+
+    def sync_used(self, used_weight):
+        """Samakan bucket dengan header X-MBX-USED-WEIGHT-1M dari Binance."""
+        self._refill()
+        self.tokens = min(self.tokens, max(0.0, self.capacity - float(used_weight)))
+
+    def pause(self, seconds):
+        """Kosongkan bucket supaya request berikutnya menunggu (429/418)."""
+        self._refill()
+        self.tokens = -seconds * self.rate
+
+
+# ==========================
+# DISK CACHE
+# ==========================
+def cache_path(symbol, tf):
+    return os.path.join(CACHE_DIR, f"{symbol}_{tf}.npy")
+
+
+def load_cached(symbol, tf):
+    """Array (n, 6): open_time, open, high, low, close, volume (float64)."""
+    p = cache_path(symbol, tf)
+    if not os.path.exists(p):
+        return np.empty((0, 6))
+    try:
+        arr = np.load(p)
+        return arr if arr.ndim == 2 and arr.shape[1] == 6 else np.empty((0, 6))
+    except Exception as e:
+        print(f"⚠️ Cache kline rusak {p}: {e}")
+        return np.empty((0, 6))
+
+
+def save_cached(symbol, tf, rows):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    p = cache_path(symbol, tf)
+    tmp = p + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, rows)
+    os.replace(tmp, p)
+
+
+def merge_rows(old, new, keep):
+    """Gabung dua array kline, buang duplikat open_time, sisakan `keep` bar terakhir."""
+    rows = np.concatenate([old, new]) if len(old) else new
+    if not len(rows):
+        return rows
+    rows = rows[np.argsort(rows[:, 0], kind="stable")]
+    # open_time sama: ambil yang terakhir (data baru menang)
+    last = np.r_[rows[1:, 0] != rows[:-1, 0], True]
+    return rows[last][-keep:]
+
+
+# ==========================
+# FETCH
+# ==========================
+async def fetch_klines(client, limiter, symbol, tf, limit, start_time=None, retries=3):
+    """Ambil kline yang sudah closed sebagai array (n, 6)."""
+    params = {"symbol": symbol, "interval": tf, "limit": min(int(limit), MAX_LIMIT)}
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+
+    for attempt in range(retries):
+        await limiter.acquire(klines_weight(params["limit"]))
+        try:
+            r = await client.get(f"{FAPI}/fapi/v1/klines", params=params)
+            used = r.headers.get("X-MBX-USED-WEIGHT-1M")
+            if used:
+                limiter.sync_used(used)
+            if r.status_code in (418, 429):
+                wait = float(r.headers.get("Retry-After", 60))
+                print(f"⚠️ Rate limited ({r.status_code}) saat backfill, tunggu {wait}s")
+                limiter.pause(wait)
+                continue
+            r.raise_for_status()
+            now_ms = time.time() * 1000
+            rows = [
+                [float(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])]
+                for k in r.json()
+                if float(k[6]) < now_ms  # buang candle yang belum close
+            ]
+            return np.array(rows, dtype=np.float64).reshape(-1, 6)
+        except (httpx.HTTPError, ValueError) as e:
+            if attempt == retries - 1:
+                print(f"⚠️ Gagal backfill {symbol} {tf}: {e}")
+                return np.empty((0, 6))
+            await asyncio.sleep(backoff(attempt))
+    return np.empty((0, 6))
+
+
+async def fetch_range(client, limiter, symbol, tf, start_ms, end_ms):
+    """Ambil semua kline closed di [start_ms, end_ms) dengan paging MAX_LIMIT."""
+    step = interval_to_ms(tf)
+    chunks = []
+    t = int(start_ms) // step * step
+    while t < end_ms:
+        need = min(MAX_LIMIT, -(-(int(end_ms) - t) // step))
+        rows = await fetch_klines(client, limiter, symbol, tf, need, start_time=t)
+        if not len(rows):
+            break
+        chunks.append(rows[rows[:, 0] < end_ms])
+        t = int(rows[-1, 0]) + step
+    return np.concatenate(chunks) if chunks else np.empty((0, 6))
+
+
+_gap_limiter = None
+
+
+async def fetch_gap(symbol, tf, start_ms, end_ms):
+    """Bar yang hilang di tengah stream websocket (limiter sendiri, di luar backfill startup)."""
+    global _gap_limiter
+    if _gap_limiter is None:
+        _gap_limiter = WeightLimiter()
+    return await fetch_range(get_client(), _gap_limiter, symbol, tf, start_ms, end_ms)
+
+
+async def backfill_symbol(client, limiter, sem, store, symbol, tf, limit):
+    """Isi history 1 (symbol, tf) dari cache lalu ambil gap-nya dari REST."""
+    step = interval_to_ms(tf)
+    cached = load_cached(symbol, tf)
+    now_ms = int(time.time() * 1000)
+    last_closed_open = (now_ms // step - 1) * step
+    if KLINE_ARCHIVE:
+        # candle rekaman websocket sebelum restart mengurangi gap yang diambil dari REST
+        cached = merge_rows(cached, read_range(symbol, tf, last_closed_open - limit * step, now_ms), limit)
+
+    start_time, need = None, limit
+    if len(cached):
+        last_t = int(cached[-1, 0])
+        missing = (last_closed_open - last_t) // step
+        if missing <= 0:
+            need = 0
+        elif missing < limit:
+            start_time, need = last_t + step, missing
+        else:
+            cached = cached[:0]  # gap terlalu besar: cache tidak terpakai
+
+    fetched = np.empty((0, 6))
+    if need:
+        async with sem:
+            fetched = await fetch_klines(client, limiter, symbol, tf, need, start_time)
+
+    rows = merge_rows(cached, fetched, limit)
+    if len(fetched):
+        save_cached(symbol, tf, rows)
+
+    buf = store.get(symbol, tf)
+    for r in rows:
+        buf.append(int(r[0]), r[1], r[2], r[3], r[4], r[5])
+    return len(fetched), len(rows)
+
+
+async def backfill_history(store, symbols, timeframes, limit=None):
+    """
+    Seed KlineStore untuk semua symbol/timeframe secara paralel sebelum
+    websocket jalan. Menghormati request weight limit Binance dan hanya
+    mengambil gap sejak cache terakhir di data/klines.
+    """
+    limit = min(int(limit or store.capacity), MAX_LIMIT)
+    limiter = WeightLimiter()
+    sem = asyncio.Semaphore(CONCURRENCY)
+    t0 = time.time()
+    client = get_client()
+    results = await asyncio.gather(
+        *(backfill_symbol(client, limiter, sem, store, s, tf, limit) for s in symbols for tf in timeframes),
+        return_exceptions=True,
+    )
+
+    fetched = sum(r[0] for r in results if isinstance(r, tuple))
+    seeded = sum(r[1] for r in results if isinstance(r, tuple))
+    errors = [r for r in results if isinstance(r, BaseException)]
+    for e in errors[:3]:
+        print(f"⚠️ Backfill error: {e}")
+    print(f"📥 Backfill {len(symbols)} symbols x {len(timeframes)} TF: "
+          f"{seeded} bars ({fetched} dari REST) dalam {time.time() - t0:.1f}s")
+    return seeded
@@ -0,0 +1,215 @@
+"""
+Chart signal (candle, EMA, entry/TP/SL) dirender di process pool terpisah
+dengan backend Agg, jadi matplotlib tidak pernah jalan di event loop.
+
+Tiap proses worker membuat satu template figure saat start (axes, koleksi
+candle, garis EMA dan level) dan per chart hanya mengganti datanya. Chart
+yang tidak selesai dalam CHART_BUDGET_SEC dibatalkan dan signal dikirim
+sebagai teks biasa. Budget hanya membatasi waktu tunggu: render yang sudah
+jalan di worker tidak bisa dihentikan, jadi setelah timeout pool diganti baru
+dan proses lama dibiarkan selesai lalu keluar.
+"""
+import asyncio
+import io
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .metrics import CHARTS, STAGE_SECONDS
+from .signal_engine_v2 import EMA_FAST, EMA_MED, EMA_LONG, EMA_TREND
+
+SIGNAL_CHARTS = os.getenv("SIGNAL_CHARTS", "0") == "1"   # kirim signal sebagai foto chart + caption
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_BARS = int(os.getenv("CHART_BARS", "80"))
+CHART_BUDGET_SEC = float(os.getenv("CHART_BUDGET_SEC", "3"))   # antri + render, lewat dari ini = teks
+CHART_DPI = 100
+CHART_SIZE = (8, 5)
+EMA_SPANS = (EMA_FAST, EMA_MED, EMA_LONG, EMA_TREND)   # sama dengan EMA yang dipakai signal
+CAPTION_MAX = 1024   # batas caption foto Telegram
+
+_COLORS = {"up": "#26a69a", "down": "#ef5350", "entry": "#1e88e5", "tp": "#43a047", "sl": "#e53935"}
+_EMA_COLORS = ("#ffb300", "#8e24aa", "#546e7a", "#212121")
+_template = None
+_CHART_STAGE = STAGE_SECONDS.labels(stage="chart")
+
+
+# ==========================
+# WORKER (proses chart)
+# ==========================
+class _Template:
+    """Figure + artist yang dipakai ulang untuk semua chart di proses ini."""
+
+    def __init__(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        from matplotlib.collections import LineCollection, PolyCollection
+        from matplotlib.figure import Figure
+
+        self.fig = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+        # margin tetap (bukan bbox_inches="tight" yang menggambar figure dua kali)
+        gs = self.fig.add_gridspec(2, 1, height_ratios=(4, 1), hspace=0.05, left=0.08, right=0.98, top=0.94, bottom=0.06)
+        self.ax = self.fig.add_subplot(gs[0])
+        self.ax_vol = self.fig.add_subplot(gs[1], sharex=self.ax)
+        self.ax.tick_params(labelbottom=False, labelsize=8)
+        self.ax_vol.tick_params(labelsize=8)
+        for a in (self.ax, self.ax_vol):
+            a.grid(alpha=0.2)
+        self.wicks = LineCollection([], linewidths=0.8)
+        self.bodies = PolyCollection([], linewidths=0)
+        self.volume = PolyCollection([], linewidths=0, alpha=0.6)
+        self.ax.add_collection(self.wicks)
+        self.ax.add_collection(self.bodies)
+        self.ax_vol.add_collection(self.volume)
+        self.emas = [self.ax.plot([], [], lw=1.1, color=c, label=f"EMA{s}")[0] for s, c in zip(EMA_SPANS, _EMA_COLORS)]
+        self.ax.legend(loc="upper left", fontsize=7, frameon=False)
+        self.levels = {}
+        for name in ("entry", "tp1", "tp2", "tp3", "sl"):
+            color = _COLORS["tp" if name.startswith("tp") else name]
+            self.levels[name] = (
+                self.ax.axhline(np.nan, color=color, lw=1, ls="-" if name == "entry" else "--"),
+                self.ax.text(0, 0, name.upper(), color=color, fontsize=7, va="bottom", ha="right"),
+            )
+        self.title = self.ax.set_title("", fontsize=10, loc="left")
+
+    def render(self, job):
+        o, h, l, c, v = (np.asarray(job[f], dtype=np.float64) for f in ("open", "high", "low", "close", "volume"))
+        emas = [_ema(c, s) for s in EMA_SPANS]
+        n = min(len(c), job.get("bars", CHART_BARS))
+        o, h, l, c, v = o[-n:], h[-n:], l[-n:], c[-n:], v[-n:]
+        x = np.arange(n, dtype=np.float64)
+        up = c >= o
+        colors = np.where(up, _COLORS["up"], _COLORS["down"])
+
+        self.wicks.set_segments(np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1))
+        self.wicks.set_color(colors)
+        lo, hi = np.minimum(o, c), np.maximum(o, c)
+        hi = np.where(hi - lo > 0, hi, lo + (h.max() - l.min()) * 1e-3)  # doji tetap terlihat
+        self.bodies.set_verts(_boxes(x, lo, hi))
+        self.bodies.set_facecolor(colors)
+        self.volume.set_verts(_boxes(x, np.zeros(n), v))
+        self.volume.set_facecolor(colors)
+        for line, e in zip(self.emas, emas):
+            line.set_data(x, e[-n:])
+
+        trade = job["trade"]
+        ys = [l.min(), h.max()]
+        for name, (line, label) in self.levels.items():
+            y = trade.get(name)
+            line.set_ydata([y, y] if y is not None else [np.nan, np.nan])
+            label.set_visible(y is not None)
+            if y is not None:
+                label.set_position((n - 0.5, y))
+                ys.append(y)
+        pad = (max(ys) - min(ys)) * 0.05 or max(ys) * 0.001
+        self.ax.set_xlim(-1, n + 1)
+        self.ax.set_ylim(min(ys) - pad, max(ys) + pad)
+        self.ax_vol.set_ylim(0, v.max() * 1.1 if n and v.max() > 0 else 1)
+        self.title.set_text(f"{trade['symbol']} {trade['tf']} {trade['side'].upper()} @ {trade['entry']:.6g}")
+
+        out = io.BytesIO()
+        self.fig.savefig(out, format="png", dpi=CHART_DPI)
+        return out.getvalue()
+
+
+def _ema(x, span):
+    """EMA (adjust=False) seperti pandas ewm."""
+    a = 2.0 / (span + 1)
+    out = np.empty_like(x)
+    if len(x):
+        out[0] = x[0]
+        for i in range(1, len(x)):
+            out[i] = a * x[i] + (1 - a) * out[i - 1]
+    return out
+
+
+def _boxes(x, lo, hi, width=0.6):
+    w = width / 2
+    return np.stack([np.column_stack(p) for p in ((x - w, lo), (x - w, hi), (x + w, hi), (x + w, lo))], axis=1)
+
+
+def _init_worker():
+    global _template
+    _template = _Template()
+
+
+def render_png(job):
+    """Jalan di proses worker: job (kolom history + trade) -> bytes PNG."""
+    global _template
+    if _template is None:
+        _template = _Template()
+    return _template.render(job)
+
+
+# ==========================
+# SISI EVENT LOOP
+# ==========================
+def chart_job(buf, trade, bars=CHART_BARS):
+    """
+    Snapshot history dari KlineRingBuffer (salinan, buffer terus berjalan).
+    EMA butuh history lebih panjang dari jumlah bar yang digambar: 3x span
+    EMA terpanjang (EMA_TREND), dibatasi isi buffer seperti di engine.
+    """
+    n = min(len(buf), bars + 3 * max(EMA_SPANS))
+    job = {f: np.array(buf.view(f, n)) for f in ("open", "high", "low", "close", "volume")}
+    job["trade"] = {k: trade.get(k) for k in ("symbol", "tf", "side", "entry", "tp1", "tp2", "tp3", "sl")}
+    job["bars"] = bars
+    return job
+
+
+class ChartRenderer:
+    """
+    Pool proses chart. render() returns PNG bytes atau None kalau melewati
+    budget / error (pemanggil lalu kirim teks saja). Burst signal dirender
+    paralel di semua worker; job yang masih antri saat budget habis dibatalkan
+    dan pool diganti baru (render yang sedang jalan tidak bisa dihentikan).
+    """
+
+    def __init__(self, workers=CHART_WORKERS, budget=CHART_BUDGET_SEC):
+        self.workers = workers
+        self.budget = budget
+        self._pool = None
+        self.rendered = 0
+        self.fallbacks = 0
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn"), initializer=_init_worker)
+            print(f"🖼️ Started {self.workers} chart workers")
+        return self
+
+    async def render(self, job):
+        self.start()
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        pool = self._pool
+        try:
+            png = await asyncio.wait_for(loop.run_in_executor(pool, render_png, job), self.budget)
+        except asyncio.TimeoutError:
+            self.fallbacks += 1
+            CHARTS.inc(result="timeout")
+            print(f"⚠️ Chart {job['trade']['symbol']} lewat budget {self.budget}s, kirim teks")
+            if pool is self._pool:
+                # worker yang macet tetap sibuk sampai render selesai: job berikut ke pool baru
+                self.close()
+                self.start()
+            return None
+        except Exception as e:
+            self.fallbacks += 1
+            CHARTS.inc(result="error")
+            print(f"⚠️ Chart error: {e}")
+            return None
+        self.rendered += 1
+        CHARTS.inc(result="ok")
+        _CHART_STAGE.observe(time.perf_counter() - t0)
+        return png
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {"workers": self.workers, "rendered": self.rendered, "fallbacks": self.fallbacks}
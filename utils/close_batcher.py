@@ -0,0 +1,55 @@
+
+import asyncio
+
+
+class CloseBatcher:
+    """
+    Collect closed candles per (timeframe, open_time) boundary.
+
+    All symbols close at the same instant, so the first close for a boundary
+    opens a short collection window; when it expires the callback receives
+    every symbol that closed in it and can evaluate them in one pass:
+
+        await on_flush(tf, open_time, symbols)
+
+    window=None: no timer, the caller flushes (replay with a simulated clock).
+    """
+
+    def __init__(self, on_flush, window=0.3):
+        self.on_flush = on_flush
+        self.window = None if window is None else float(window)
+        self._pending = {}   # (tf, open_time) -> list of symbols
+        self._tasks = set()
+
+    def add(self, tf, open_time, symbol):
+        key = (tf, int(open_time))
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = []
+            if self.window is None:
+                pending.append(symbol)
+                return
+            task = asyncio.get_running_loop().create_task(self._flush_later(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        pending.append(symbol)
+
+    @property
+    def pending(self):
+        return sum(len(v) for v in self._pending.values())
+
+    async def _flush_later(self, key):
+        await asyncio.sleep(self.window)
+        await self.flush(key)
+
+    async def flush(self, key=None):
+        """Flush satu boundary (atau semua kalau key None) sekarang juga."""
+        keys = [key] if key is not None else sorted(self._pending, key=lambda k: k[1])
+        for k in keys:
+            symbols = self._pending.pop(k, None)
+            if not symbols:
+                continue
+            try:
+                await self.on_flush(k[0], k[1], list(dict.fromkeys(symbols)))
+            except Exception as e:
+                print(f"Batch eval error {k}: {e}")
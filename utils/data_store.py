@@ -2,24 +2,35 @@
 import json, os
 from datetime import datetime, timezone
 
+from .history_store import get_history_store
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 
-def _path(name):
-    return os.path.join(DATA_DIR, name)
+def _path(name, data_dir=None):
+    return os.path.join(data_dir or DATA_DIR, name)
 
-def load_json(name):
-    p = _path(name)
+def load_json(name, data_dir=None):
+    p = _path(name, data_dir)
     if not os.path.exists(p):
         return {} if name.endswith(".json") else None
     with open(p, "r") as f:
         return json.load(f)
 
-def save_json(name, data):
-    p = _path(name)
-    with open(p, "w") as f:
+def save_json(name, data, data_dir=None):
+    # tulis ke file sementara lalu rename, supaya file tidak pernah setengah jadi
+    p = _path(name, data_dir)
+    tmp = p + ".tmp"
+    with open(tmp, "w") as f:
         json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, p)
 
 def append_history(entry):
-    hist = load_json("signals_history.json") or []
-    hist.append(entry)
-    save_json("signals_history.json", hist)
+    # append-only di SQLite (blocking: dari event loop panggil lewat thread)
+    get_history_store().append(entry)
+
+def import_legacy_history():
+    # signals_history.json lama diimpor sekali saat startup
+    return get_history_store().import_json()
+
+def load_history(symbol=None, timeframe=None, date_from=None, date_to=None, limit=None):
+    return get_history_store().query(symbol, timeframe, date_from, date_to, limit)
@@ -0,0 +1,314 @@
+
+import asyncio
+import multiprocessing as mp
+import os
+import struct
+import zlib
+from collections import deque
+
+import numpy as np
+
+from .metrics import CLOSED_CANDLES, STAGE_SECONDS, merge_deltas, take_deltas
+
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "0"))  # 0 = evaluasi di event loop utama
+# byte antri per worker yang belum terbaca; lewat dari ini candle dibuang (worker mengisi gap dari REST)
+EVAL_QUEUE_BYTES = int(os.getenv("EVAL_QUEUE_MB", "8")) * 1024 * 1024
+WORKER_METRICS_SEC = 5   # interval kirim delta histogram/counter worker ke proses utama
+
+# pesan ingest -> worker, di-pack manual (bukan pickle):
+#   K candle closed, S candle closed tanpa evaluasi (stream lag), H history (seed backfill), D drop symbol
+_CANDLE = struct.Struct("<c20s4sq5d")
+_HISTORY = struct.Struct("<c20s4sI")
+_DROP = struct.Struct("<c20s")
+_FRAME = struct.Struct("!i")   # header panjang pesan, sama dengan Connection.send_bytes
+
+
+def _s(b):
+    return b.rstrip(b"\0").decode()
+
+
+def pack_candle(sym, tf, open_time, o, h, l, c, v, evaluate=True):
+    return _CANDLE.pack(b"K" if evaluate else b"S", sym.encode(), tf.encode(), int(open_time), o, h, l, c, v)
+
+
+def pack_history(sym, tf, buf):
+    """Seluruh isi KlineRingBuffer: header + open_time int64 + (n, 5) float64."""
+    views = buf.views()
+    n = len(buf)
+    prices = np.column_stack([views[f] for f in ("open", "high", "low", "close", "volume")]).astype(np.float64)
+    return _HISTORY.pack(b"H", sym.encode(), tf.encode(), n) + views["open_time"].astype(np.int64).tobytes() + prices.tobytes()
+
+
+def unpack_history(msg):
+    _, sym, tf, n = _HISTORY.unpack_from(msg)
+    off = _HISTORY.size
+    times = np.frombuffer(msg, dtype=np.int64, count=n, offset=off)
+    prices = np.frombuffer(msg, dtype=np.float64, count=n * 5, offset=off + 8 * n).reshape(n, 5)
+    return _s(sym), _s(tf), times, prices
+
+
+def shard_of(symbol, workers):
+    """Worker pemilik symbol (stabil antar proses, tidak pakai hash() yang di-salt)."""
+    return zlib.crc32(symbol.encode()) % workers
+
+
+async def _handle(pipeline, msg):
+    kind = msg[:1]
+    if kind in (b"K", b"S"):
+        _, sym, tf, t, o, h, l, c, v = _CANDLE.unpack(msg)
+        await pipeline.on_closed_kline(_s(sym), _s(tf), t, o, h, l, c, v, evaluate=kind == b"K")
+    elif kind == b"H":
+        sym, tf, times, prices = unpack_history(msg)
+        buf = pipeline.store.get(sym, tf)
+        buf.extend(zip(times.tolist(), *prices.T.tolist()))
+    elif kind == b"D":
+        pipeline.drop_symbol(_s(_DROP.unpack(msg)[1]))
+
+
+def _ship_metrics(outbox):
+    """Delta metrik worker (tahap history..detect, candle closed) ke proses utama."""
+    deltas = take_deltas((STAGE_SECONDS, CLOSED_CANDLES))
+    if deltas:
+        outbox.send((None, "metrics", deltas))
+
+
+async def _ship_metrics_periodic(outbox, interval=WORKER_METRICS_SEC):
+    while True:
+        await asyncio.sleep(interval)
+        _ship_metrics(outbox)
+
+
+async def _serve(inbox, outbox, factory):
+    pipeline = factory()
+
+    async def sink(sym, tf, sig):
+        outbox.send((sym, tf, sig))
+
+    pipeline.sink = sink
+    loop = asyncio.get_running_loop()
+    shipper = loop.create_task(_ship_metrics_periodic(outbox))
+    readable = asyncio.Event()
+    loop.add_reader(inbox.fileno(), readable.set)
+    while True:
+        await readable.wait()
+        readable.clear()
+        while inbox.poll():
+            try:
+                msg = inbox.recv_bytes()
+            except EOFError:
+                await pipeline.batcher.flush()
+                shipper.cancel()
+                _ship_metrics(outbox)
+                return
+            try:
+                await _handle(pipeline, msg)
+            except Exception as e:
+                print(f"⚠️ Eval worker error: {e}")
+        await asyncio.sleep(0)  # beri giliran ke CloseBatcher
+
+
+def _worker_main(inbox, outbox, factory):
+    try:
+        asyncio.run(_serve(inbox, outbox, factory))
+    except KeyboardInterrupt:
+        pass
+
+
+class EvalWorkerPool:
+    """
+    Evaluasi sinyal di beberapa proses, dibagi per symbol.
+
+    Event loop utama hanya decode dan meneruskan candle closed (struct 73 byte)
+    ke worker pemilik symbol. Tiap worker punya history dan pipeline sendiri
+    (factory() -> SignalPipeline) dan mengirim balik (symbol, tf, signal)
+    yang diteruskan ke on_signal di event loop utama.
+
+    Kirim ke worker tidak pernah blocking: pipe non-blocking + buffer per
+    worker (EVAL_QUEUE_BYTES, lewat dari itu candle dibuang). Worker yang mati
+    di-spawn ulang lalu on_restart(i) dipanggil untuk seed history-nya; candle
+    shard itu dibuang sampai seed terkirim (gap diisi worker dari REST).
+    """
+
+    def __init__(self, workers, factory, on_signal, on_restart=None, queue_bytes=EVAL_QUEUE_BYTES):
+        self.workers = int(workers)
+        self.factory = factory
+        self.on_signal = on_signal
+        self.on_restart = on_restart
+        self.queue_bytes = queue_bytes
+        self.procs = []
+        self._inboxes = []
+        self._outboxes = []
+        self._pending = []          # worker -> deque bytes yang belum tertulis ke pipe
+        self._pending_bytes = []
+        self._restarting = set()
+        self._tasks = set()
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.restarts = 0
+        self._closing = False
+
+    def start(self):
+        if self.procs:
+            return
+        self.procs = [None] * self.workers
+        self._inboxes = [None] * self.workers
+        self._outboxes = [None] * self.workers
+        self._pending = [deque() for _ in range(self.workers)]
+        self._pending_bytes = [0] * self.workers
+        for i in range(self.workers):
+            self._spawn(i)
+        print(f"🧵 Started {self.workers} eval workers")
+
+    def _spawn(self, i):
+        ctx = mp.get_context("spawn")
+        in_r, in_w = ctx.Pipe(duplex=False)
+        out_r, out_w = ctx.Pipe(duplex=False)
+        p = ctx.Process(target=_worker_main, args=(in_r, out_w, self.factory), name=f"eval-{i}", daemon=True)
+        p.start()
+        in_r.close()
+        out_w.close()
+        os.set_blocking(in_w.fileno(), False)
+        self.procs[i] = p
+        self._inboxes[i] = in_w
+        self._outboxes[i] = out_r
+        asyncio.get_running_loop().add_reader(out_r.fileno(), self._drain, i)
+
+    def _send(self, sym, payload, droppable=False):
+        i = shard_of(sym, self.workers)
+        if droppable and (i in self._restarting or self._pending_bytes[i] >= self.queue_bytes):
+            self.dropped += 1
+            return False
+        pending = self._pending[i]
+        pending.append(_FRAME.pack(len(payload)) + payload)
+        self._pending_bytes[i] += len(pending[-1])
+        if len(pending) == 1 and not self._inboxes[i].closed:
+            # pipe lama sudah ditutup _restart: frame menunggu _spawn lalu di-flush
+            self._flush(i)
+        return True
+
+    def _flush(self, i):
+        """Tulis sebanyak yang muat ke pipe; sisanya menunggu fd writable."""
+        pending = self._pending[i]
+        loop = asyncio.get_running_loop()
+        try:
+            fd = self._inboxes[i].fileno()
+            while pending:
+                n = os.write(fd, pending[0])
+                self._pending_bytes[i] -= n
+                if n < len(pending[0]):
+                    pending[0] = pending[0][n:]
+                    break
+                pending.popleft()
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            self._worker_died(i, e)
+            return
+        if pending:
+            loop.add_writer(fd, self._flush, i)
+        else:
+            loop.remove_writer(fd)
+
+    def send_candle(self, sym, tf, open_time, o, h, l, c, v, evaluate=True):
+        """Returns False kalau candle dibuang (worker sedang restart / antrian penuh)."""
+        if not self._send(sym, pack_candle(sym, tf, open_time, o, h, l, c, v, evaluate), droppable=True):
+            return False
+        self.sent += 1
+        return True
+
+    def seed(self, store, symbols):
+        """Kirim history (hasil backfill di store) ke worker pemilik symbol."""
+        symbols = set(symbols)
+        for sym, tf in store.keys():
+            if sym in symbols and len(store.get(sym, tf)):
+                self._send(sym, pack_history(sym, tf, store.get(sym, tf)))
+
+    def drop_symbol(self, sym):
+        self._send(sym, _DROP.pack(b"D", sym.encode()))
+
+    def _drain(self, i):
+        conn = self._outboxes[i]
+        try:
+            while conn.poll():
+                sym, tf, sig = conn.recv()
+                if sym is None:
+                    merge_deltas(sig)   # metrik worker
+                    continue
+                self.received += 1
+                task = asyncio.get_running_loop().create_task(self.on_signal(sym, tf, sig))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (EOFError, OSError) as e:
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+            if not self._closing:
+                self._worker_died(i, e)
+
+    def _worker_died(self, i, err):
+        if self._closing or i in self._restarting:
+            return
+        self._restarting.add(i)
+        print(f"⚠️ Eval worker {i} berhenti ({err!r}), spawn ulang")
+        task = asyncio.get_running_loop().create_task(self._restart(i))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _restart(self, i):
+        loop = asyncio.get_running_loop()
+        old = self.procs[i]
+        for conn in (self._inboxes[i], self._outboxes[i]):
+            try:
+                loop.remove_reader(conn.fileno())
+                loop.remove_writer(conn.fileno())
+            except (OSError, ValueError):
+                pass
+            conn.close()
+        self._pending[i].clear()
+        self._pending_bytes[i] = 0
+        if old.is_alive():
+            old.kill()
+        await loop.run_in_executor(None, old.join, 5)
+        try:
+            self._spawn(i)
+            if self._pending[i]:
+                self._flush(i)   # seed / drop yang masuk selama pipe tertutup
+            self.restarts += 1
+            if self.on_restart is not None:
+                # candle shard ini dibuang sampai history terkirim (append lebih lama dari candle terakhir diabaikan)
+                await self.on_restart(i)
+            print(f"🧵 Eval worker {i} jalan lagi (restart ke-{self.restarts})")
+        except Exception as e:
+            print(f"⚠️ Eval worker {i} gagal di-restart: {e}")
+        finally:
+            self._restarting.discard(i)
+
+    async def close(self, timeout=5):
+        """Tutup inbox (worker flush batch yang tersisa), tunggu, lalu kumpulkan hasil terakhir."""
+        self._closing = True
+        loop = asyncio.get_running_loop()
+        for i, conn in enumerate(self._inboxes):
+            if conn.closed:
+                continue
+            loop.remove_writer(conn.fileno())
+            os.set_blocking(conn.fileno(), True)
+            try:
+                for frame in self._pending[i]:
+                    os.write(conn.fileno(), frame)
+            except OSError:
+                pass
+            conn.close()
+        for p in self.procs:
+            await loop.run_in_executor(None, p.join, timeout)
+        for i, conn in enumerate(self._outboxes):
+            if conn.closed:
+                continue
+            self._drain(i)
+            loop.remove_reader(conn.fileno())
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.procs.clear()
+
+    def stats(self):
+        return {"workers": self.workers, "alive": sum(p.is_alive() for p in self.procs),
+                "candles_sent": self.sent, "signals": self.received, "dropped": self.dropped,
+                "restarts": self.restarts}
@@ -0,0 +1,158 @@
+
+import json, os, sqlite3, threading
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+HISTORY_DB = os.path.join(DATA_DIR, "signals_history.db")
+LEGACY_JSON = os.path.join(DATA_DIR, "signals_history.json")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT,
+    timeframe TEXT,
+    side TEXT,
+    result TEXT,
+    entry REAL,
+    exit REAL,
+    profit_percent REAL,
+    timestamp TEXT,
+    day TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_symbol ON history(symbol, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_tf ON history(timeframe, timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_day ON history(day);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INSERT = (
+    "INSERT INTO history (symbol, timeframe, side, result, entry, exit, profit_percent, timestamp, day, data)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class HistoryStore:
+    """
+    Append-only signal history in SQLite (WAL mode).
+
+    Every append is its own transaction, so a crash never leaves a half
+    written file behind, and the cost of an append does not grow with the
+    size of the history. The full record is kept as JSON in `data`; the
+    columns used for filtering are indexed. The legacy signals_history.json
+    is imported once at startup (import_json), not on the append path.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    @staticmethod
+    def _row(entry):
+        ts = str(entry.get("timestamp") or "")
+        return (
+            entry.get("symbol"),
+            entry.get("timeframe", entry.get("tf")),
+            entry.get("side"),
+            entry.get("result"),
+            entry.get("entry"),
+            entry.get("exit"),
+            entry.get("profit_percent"),
+            ts,
+            ts[:10],
+            json.dumps(entry, default=str),
+        )
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        rows = [self._row(e) for e in entries]
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(_INSERT, rows)
+
+    def import_json(self, path=LEGACY_JSON):
+        """
+        Impor signals_history.json lama sekali saja (dicatat di tabel meta).
+        Cek + insert dalam satu transaksi BEGIN IMMEDIATE, jadi dari beberapa
+        worker shard yang start bersamaan hanya satu yang mengimpor.
+        Returns jumlah record yang diimpor.
+        """
+        if not os.path.exists(path):
+            return 0
+        key = "imported:" + os.path.basename(path)
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+        try:
+            with open(path) as f:
+                hist = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Gagal impor {path}: {e}")
+            return 0
+        hist = hist if isinstance(hist, list) else []
+        rows = [self._row(e) for e in hist if isinstance(e, dict)]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                                    (key, str(len(rows)))).rowcount != 1:
+                    self._db.rollback()   # worker lain sudah mengimpor
+                    return 0
+                self._db.executemany(_INSERT, rows)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        print(f"📦 Imported {len(rows)} history records from {path}")
+        return len(rows)
+
+    def query(self, symbol=None, timeframe=None, date_from=None, date_to=None, limit=None):
+        """
+        Ambil record history (urut lama -> baru).
+        date_from/date_to: 'YYYY-MM-DD', inklusif.
+        """
+        where, args = [], []
+        if symbol:
+            where.append("symbol = ?"); args.append(symbol)
+        if timeframe:
+            where.append("timeframe = ?"); args.append(timeframe)
+        if date_from:
+            where.append("day >= ?"); args.append(date_from)
+        if date_to:
+            where.append("day <= ?"); args.append(date_to)
+        sql = "SELECT data FROM history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if limit:
+            # N record terakhir, dikembalikan tetap urut lama -> baru
+            sql += " ORDER BY id DESC LIMIT ?"
+            args.append(int(limit))
+        else:
+            sql += " ORDER BY id"
+        with self._lock:
+            rows = [json.loads(r[0]) for r in self._db.execute(sql, args)]
+        return rows[::-1] if limit else rows
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store = None
+
+def get_history_store():
+    global _store
+    if _store is None:
+        _store = HistoryStore()
+    return _store
@@ -0,0 +1,100 @@
+"""
+Satu httpx.AsyncClient bersama untuk semua REST call (coin_manager, tracker,
+backfill, replay): connection pool + keep-alive, retry dengan jitter, dan
+cache respons (TTL + ETag/Last-Modified kalau server mengirimnya).
+"""
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+FAPI = os.getenv("BINANCE_REST_URL", "https://fapi.binance.com")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+RETRY_BASE = 0.5
+RETRY_CAP = 30.0
+
+_client = None
+_client_loop = None
+_cache = {}   # (url, params) -> [expires, etag, last_modified, data]
+
+
+def get_client():
+    """Client bersama untuk event loop yang sedang jalan (dibuat saat pertama dipakai)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def backoff(attempt):
+    """Full jitter: acak di [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt))
+
+
+def _url(path):
+    return path if path.startswith("http") else FAPI + path
+
+
+async def get_json(path, params=None, cache_ttl=0, retries=HTTP_RETRIES, timeout=None):
+    """
+    GET JSON dengan retry (error jaringan, 5xx, 429/418 + Retry-After).
+    cache_ttl > 0: respons dipakai ulang selama TTL; setelah itu request
+    kondisional (If-None-Match / If-Modified-Since) dan 304 memakai cache.
+    Error terakhir di-raise kalau semua percobaan gagal.
+    """
+    url = _url(path)
+    key = (url, tuple(sorted((params or {}).items())))
+    cached = _cache.get(key) if cache_ttl else None
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[3]
+
+    headers = {}
+    if cached is not None:
+        if cached[1]:
+            headers["If-None-Match"] = cached[1]
+        if cached[2]:
+            headers["If-Modified-Since"] = cached[2]
+
+    client = get_client()
+    for attempt in range(retries):
+        try:
+            r = await client.get(url, params=params, headers=headers, timeout=timeout or HTTP_TIMEOUT)
+            if r.status_code == 304 and cached is not None:
+                cached[0] = time.monotonic() + cache_ttl
+                return cached[3]
+            if r.status_code in (418, 429):
+                wait = float(r.headers.get("Retry-After", 60))
+                print(f"⚠️ Rate limited ({r.status_code}) {url}, tunggu {wait}s")
+                if attempt == retries - 1:
+                    r.raise_for_status()
+                await asyncio.sleep(wait)
+                continue
+            if r.status_code >= 500 and attempt < retries - 1:
+                await asyncio.sleep(backoff(attempt))
+                continue
+            r.raise_for_status()
+            data = r.json()
+            if cache_ttl:
+                _cache[key] = [time.monotonic() + cache_ttl, r.headers.get("ETag"), r.headers.get("Last-Modified"), data]
+            return data
+        except httpx.TransportError:
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(backoff(attempt))
+    raise httpx.HTTPError(f"GET {url} gagal setelah {retries} percobaan")
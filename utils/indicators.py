@@ -1,4 +1,7 @@
 
+import math
+from collections import deque
+
 import numpy as np
 import pandas as pd
 
@@ -21,3 +24,136 @@ def atr(high, low, close, period=14):
     tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
     a = tr.rolling(period).mean()
     return a.fillna(method="bfill")
+
+
+class IncrementalIndicators:
+    """
+    Stateful indicator set for one (symbol, timeframe) stream.
+
+    Every closed candle is pushed with update(); all values are kept in sync in
+    constant time so the last-bar numbers equal what the pandas helpers give on
+    a DataFrame of the last `window` candles (EMA ewm(adjust=False) seeded at the
+    first row of the window, rolling-mean RSI, rolling-sum MFI, rolling-mean ATR,
+    rolling volume mean and rolling mean of abs pct_change).
+    """
+
+    def __init__(self, window, ema_spans=(), rsi_period=14, mfi_period=14,
+                 atr_period=14, vol_period=20, body_period=20):
+        self.window = int(window)
+        self.rsi_period = rsi_period
+        self.mfi_period = mfi_period
+        self.atr_period = atr_period
+        self.vol_period = vol_period
+        self.body_period = body_period
+
+        # close window sebagai ring numpy (bukan deque of float) untuk EMA slide
+        self._closes = np.zeros(self.window, dtype=np.float64)
+        self._pos = 0
+        self._count = 0
+        self.gains = deque(maxlen=rsi_period)
+        self.losses = deque(maxlen=rsi_period)
+        self.money_up = deque(maxlen=mfi_period)
+        self.money_down = deque(maxlen=mfi_period)
+        self.trs = deque(maxlen=atr_period)
+        self.vols = deque(maxlen=vol_period)
+        self.changes = deque(maxlen=body_period)
+
+        # span -> [alpha, ema_now, ema_prev, (1-alpha)^(window-1)]
+        self.emas = {}
+        for span in ema_spans:
+            alpha = 2.0 / (span + 1.0)
+            self.emas[span] = [alpha, np.nan, np.nan, (1.0 - alpha) ** (self.window - 1)]
+
+        self.last = None   # (open, high, low, close)
+        self.prev = None
+        self.typical = None
+
+    def __len__(self):
+        return self._count
+
+    def update(self, o, h, l, c, v):
+        o, h, l, c, v = float(o), float(h), float(l), float(c), float(v)
+        closes = self._closes
+        pos = self._pos
+        prev_close = float(closes[pos - 1]) if self._count else None
+        full = self._count == self.window
+        evicted = float(closes[pos]) if full else None
+        closes[pos] = c
+        self._pos = (pos + 1) % self.window
+        if not full:
+            self._count += 1
+        head = float(closes[self._pos]) if full else None
+
+        # EMA: geser window -> buang bobot seed lama, seed baru = closes[0]
+        for state in self.emas.values():
+            alpha, now, _, decay = state
+            if now != now:
+                state[1] = c
+                state[2] = np.nan
+                continue
+            if full:
+                prev = now + decay * (head - evicted)
+            else:
+                prev = now
+            state[2] = prev
+            state[1] = ((1.0 - alpha) * prev + alpha * c) / ((1.0 - alpha) + alpha)
+
+        # RSI / pct_change / ATR butuh close sebelumnya
+        if prev_close is not None:
+            delta = c - prev_close
+            self.gains.append(max(delta, 0.0))
+            self.losses.append(-min(delta, 0.0))
+            self.changes.append(abs(c / prev_close - 1.0) if prev_close != 0 else np.inf)
+            self.trs.append(max(h - l, abs(h - prev_close), abs(l - prev_close)))
+        else:
+            self.trs.append(h - l)
+
+        # MFI
+        typical = (h + l + c) / 3
+        money = typical * v
+        direction = typical - self.typical if self.typical is not None else 0.0
+        self.money_up.append(money if direction > 0 else 0.0)
+        self.money_down.append(abs(money) if direction < 0 else 0.0)
+        self.typical = typical
+
+        self.vols.append(v)
+        self.prev, self.last = self.last, (o, h, l, c)
+
+    def ema(self, span):
+        return self.emas[span][1]
+
+    def ema_prev(self, span):
+        return self.emas[span][2]
+
+    def rsi(self):
+        if len(self.gains) < self.rsi_period:
+            return 50.0
+        down = math.fsum(self.losses) / self.rsi_period
+        if down == 0:
+            return 50.0
+        up = math.fsum(self.gains) / self.rsi_period
+        return 100 - (100 / (1 + up / down))
+
+    def mfi(self):
+        if self._count < self.mfi_period:
+            return 50.0
+        down = math.fsum(self.money_down)
+        if down == 0:
+            return 50.0
+        return 100 - (100 / (1 + math.fsum(self.money_up) / down))
+
+    def atr(self):
+        if len(self.trs) < self.atr_period:
+            return np.nan
+        return math.fsum(self.trs) / self.atr_period
+
+    def vol_ma(self):
+        if len(self.vols) < self.vol_period:
+            # window masih pendek: vols berisi semua volume yang ada
+            return math.fsum(self.vols) / len(self.vols) if self.vols else np.nan
+        return math.fsum(self.vols) / self.vol_period
+
+    def avg_body(self):
+        if len(self.changes) < self.body_period:
+            return np.nan
+        return math.fsum(self.changes) / self.body_period
@@ -0,0 +1,275 @@
+"""
+Arsip biner kline closed: satu file per (symbol, tf, hari UTC) di
+data/archive/<tf>/<SYMBOL>/<YYYY-MM-DD>.kla.
+
+File berisi blok yang di-append berurutan:
+
+    header <4sIqqI: magic b"KLA1", n baris, open_time pertama, open_time terakhir, panjang payload
+    payload zlib: kolom open_time (int64) lalu open/high/low/close/volume (float64),
+                  tiap kolom byte-shuffle supaya zlib efektif untuk float
+
+Pembaca mmap file, lompat antar header (tanpa decode) dan hanya
+men-decompress blok yang overlap dengan range yang diminta. Blok terakhir
+yang terpotong (crash saat menulis) diabaikan dan dipotong saat append
+berikutnya.
+
+    python -m utils.kline_archive               # ringkasan isi arsip
+"""
+import argparse
+import asyncio
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(DATA_DIR, "archive"))
+KLINE_ARCHIVE = os.getenv("KLINE_ARCHIVE", "0") == "1"   # rekam semua kline closed dari websocket
+ARCHIVE_BLOCK_ROWS = int(os.getenv("ARCHIVE_BLOCK_ROWS", "60"))
+ARCHIVE_MAX_AGE_SEC = int(os.getenv("ARCHIVE_MAX_AGE_SEC", "900"))  # blok ditulis paling lambat setelah ini
+ARCHIVE_FLUSH_SEC = 30
+ZLIB_LEVEL = 6
+
+MAGIC = b"KLA1"
+HEADER = struct.Struct("<4sIqqI")
+DAY_MS = 86_400_000
+
+
+def day_of(open_time):
+    return datetime.fromtimestamp(open_time // DAY_MS * 86400, timezone.utc).strftime("%Y-%m-%d")
+
+
+def archive_path(symbol, tf, day, root=None):
+    return os.path.join(root or ARCHIVE_DIR, tf, symbol, f"{day}.kla")
+
+
+# ==========================
+# FORMAT BLOK
+# ==========================
+def _shuffle(col):
+    return np.ascontiguousarray(col).view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _unshuffle(raw, n, dtype):
+    return np.frombuffer(raw, np.uint8).reshape(8, n).T.copy().view(dtype).ravel()
+
+
+def encode_block(rows):
+    """rows (n, 6) float64 / list tuple -> bytes (header + payload)."""
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    n = len(rows)
+    times = rows[:, 0].astype(np.int64)
+    payload = zlib.compress(_shuffle(times) + b"".join(_shuffle(rows[:, i]) for i in range(1, 6)), ZLIB_LEVEL)
+    return HEADER.pack(MAGIC, n, int(times[0]), int(times[-1]), len(payload)) + payload
+
+
+def decode_block(buf, offset, n, clen):
+    """Payload blok -> array (n, 6) float64."""
+    raw = zlib.decompress(buf[offset:offset + clen])
+    size = 8 * n
+    out = np.empty((n, 6))
+    out[:, 0] = _unshuffle(raw[:size], n, np.int64)
+    for i in range(1, 6):
+        out[:, i] = _unshuffle(raw[i * size:(i + 1) * size], n, np.float64)
+    return out
+
+
+def scan_blocks(buf):
+    """
+    Index blok sebuah file: list (first_open, last_open, offset payload, n, clen).
+    Berhenti di blok pertama yang rusak/terpotong.
+    """
+    blocks, off, size = [], 0, len(buf)
+    while off + HEADER.size <= size:
+        magic, n, first, last, clen = HEADER.unpack_from(buf, off)
+        if magic != MAGIC or off + HEADER.size + clen > size:
+            break
+        blocks.append((first, last, off + HEADER.size, n, clen))
+        off += HEADER.size + clen
+    return blocks
+
+
+def _valid_end(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    blocks = scan_blocks(data)
+    return blocks[-1][2] + blocks[-1][4] if blocks else 0
+
+
+# ==========================
+# PEMBACA
+# ==========================
+def read_file(path, start_ms=None, end_ms=None):
+    """Kline di file arsip dengan open_time di [start_ms, end_ms)."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return np.empty((0, 6))
+    lo = -2 ** 63 if start_ms is None else start_ms
+    hi = 2 ** 63 - 1 if end_ms is None else end_ms
+    parts = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for first, last, off, n, clen in scan_blocks(mm):
+            if last < lo or first >= hi:
+                continue
+            rows = decode_block(mm, off, n, clen)
+            if first < lo or last >= hi:
+                rows = rows[(rows[:, 0] >= lo) & (rows[:, 0] < hi)]
+            parts.append(rows)
+    return np.concatenate(parts) if parts else np.empty((0, 6))
+
+
+def read_range(symbol, tf, start_ms=None, end_ms=None, root=None):
+    """
+    Array (n, 6) open_time, open, high, low, close, volume untuk open_time di
+    [start_ms, end_ms), urut waktu tanpa duplikat (format cache backfill).
+    start_ms/end_ms None = tanpa batas.
+    """
+    if start_ms is None or end_ms is None:
+        d = os.path.join(root or ARCHIVE_DIR, tf, symbol)
+        names = sorted(n for n in os.listdir(d) if n.endswith(".kla")) if os.path.isdir(d) else []
+        lo = day_of(int(start_ms)) if start_ms is not None else ""
+        hi = day_of(int(end_ms) - 1) if end_ms is not None else "9999"
+        paths = [os.path.join(d, n) for n in names if lo <= n[:-4] <= hi]
+    else:
+        paths = [archive_path(symbol, tf, day_of(t), root)
+                 for t in range(int(start_ms) // DAY_MS * DAY_MS, int(end_ms), DAY_MS)]
+    parts = []
+    for path in paths:
+        rows = read_file(path, start_ms, end_ms)
+        if len(rows):
+            parts.append(rows)
+    if not parts:
+        return np.empty((0, 6))
+    rows = np.concatenate(parts)
+    rows = rows[np.argsort(rows[:, 0], kind="stable")]
+    return rows[np.r_[rows[1:, 0] != rows[:-1, 0], True]]
+
+
+def list_symbols(tf, root=None):
+    d = os.path.join(root or ARCHIVE_DIR, tf)
+    return sorted(os.listdir(d)) if os.path.isdir(d) else []
+
+
+# ==========================
+# PEREKAM
+# ==========================
+class KlineArchive:
+    """
+    Rekam kline closed ke arsip. add() hanya menaruh baris di buffer per
+    (symbol, tf); blok ditulis saat berisi ARCHIVE_BLOCK_ROWS baris, berganti
+    hari, atau lebih tua dari ARCHIVE_MAX_AGE_SEC. Kompresi + tulis file
+    dijalankan di thread supaya event loop tidak tertahan.
+    """
+
+    def __init__(self, root=None, block_rows=ARCHIVE_BLOCK_ROWS, max_age=ARCHIVE_MAX_AGE_SEC):
+        self.root = root or ARCHIVE_DIR
+        self.block_rows = block_rows
+        self.max_age = max_age
+        self.buffers = {}             # (symbol, tf) -> [day, since, rows]
+        self.last_open = {}           # (symbol, tf) -> open_time terakhir (buang duplikat reconnect)
+        self._ready = []              # (path, rows) siap ditulis
+        self._checked = set()         # file yang ekornya sudah divalidasi proses ini
+        self._lock = asyncio.Lock()
+        self.rows = 0
+        self.blocks = 0
+        self.bytes = 0
+
+    def add(self, symbol, tf, open_time, o, h, l, c, v):
+        key = (symbol, tf)
+        open_time = int(open_time)
+        if open_time <= self.last_open.get(key, -1):
+            return
+        self.last_open[key] = open_time
+        day = open_time // DAY_MS
+        buf = self.buffers.get(key)
+        if buf is not None and buf[0] != day:
+            self._seal(key)
+            buf = None
+        if buf is None:
+            buf = self.buffers[key] = [day, time.monotonic(), []]
+        buf[2].append((open_time, float(o), float(h), float(l), float(c), float(v)))
+        if len(buf[2]) >= self.block_rows:
+            self._seal(key)
+
+    def drop_symbol(self, symbol):
+        for key in [k for k in self.buffers if k[0] == symbol]:
+            self._seal(key)
+        for key in [k for k in self.last_open if k[0] == symbol]:
+            del self.last_open[key]
+
+    def _seal(self, key):
+        day, _, rows = self.buffers.pop(key)
+        if rows:
+            self._ready.append((archive_path(key[0], key[1], day_of(day * DAY_MS), self.root), rows))
+
+    def _write(self, ready):
+        written = 0
+        for path, rows in ready:
+            blob = encode_block(rows)
+            if path not in self._checked:
+                self._checked.add(path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if os.path.exists(path):
+                    end = _valid_end(path)
+                    if end != os.path.getsize(path):
+                        print(f"⚠️ Arsip {path} terpotong, dipangkas ke {end} bytes")
+                        os.truncate(path, end)
+            with open(path, "ab") as f:
+                f.write(blob)
+            written += len(blob)
+            self.rows += len(rows)
+            self.blocks += 1
+        self.bytes += written
+
+    async def flush(self, force=False):
+        """Tulis blok yang siap (force=True: semua buffer, mis. saat shutdown)."""
+        now = time.monotonic()
+        for key in [k for k, b in self.buffers.items() if force or now - b[1] >= self.max_age]:
+            self._seal(key)
+        ready, self._ready = self._ready, []
+        if ready:
+            async with self._lock:
+                await asyncio.to_thread(self._write, ready)
+
+    async def run_flusher(self, interval=ARCHIVE_FLUSH_SEC):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️ Archive flush error: {e}")
+
+    def stats(self):
+        return {"rows": self.rows, "blocks": self.blocks, "mb": round(self.bytes / 1e6, 2),
+                "buffered": sum(len(b[2]) for b in self.buffers.values())}
+
+
+def _summary(root):
+    files = rows = size = 0
+    per_tf = defaultdict(int)
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if not name.endswith(".kla"):
+                continue
+            p = os.path.join(dirpath, name)
+            with open(p, "rb") as f:
+                blocks = scan_blocks(f.read())
+            n = sum(b[3] for b in blocks)
+            files += 1
+            rows += n
+            size += os.path.getsize(p)
+            per_tf[os.path.relpath(p, root).split(os.sep)[0]] += n
+    print(f"🗄️ {root}: {files} files, {rows} klines, {size / 1e6:.2f} MB "
+          f"({size / max(rows, 1):.1f} bytes/kline)")
+    for tf, n in sorted(per_tf.items()):
+        print(f"   {tf}: {n} klines")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=ARCHIVE_DIR)
+    _summary(ap.parse_args().root)
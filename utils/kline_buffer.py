@@ -0,0 +1,148 @@
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ("open_time", "open", "high", "low", "close", "volume")
+PRICE_FIELDS = FIELDS[1:]
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def interval_to_ms(tf):
+    """'1m' -> 60000, '4h' -> 14400000 (format interval Binance)."""
+    return int(tf[:-1]) * _UNIT_MS[tf[-1]]
+
+
+class KlineRingBuffer:
+    """
+    Preallocated columnar ring buffer for one kline stream.
+
+    Each field lives in its own contiguous array of 2 * capacity slots and every
+    value is written twice (slot i and i + capacity), so the last n values are
+    always one contiguous slice: view() never copies.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._open_time = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._cols = {f: np.zeros(2 * self.capacity, dtype=self.dtype) for f in PRICE_FIELDS}
+        self._pos = 0      # slot berikutnya yang akan ditulis
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def last_open_time(self):
+        if not self._len:
+            return None
+        return int(self._open_time[(self._pos - 1) % self.capacity])
+
+    def append(self, open_time, o, h, l, c, v):
+        """
+        Tambah satu candle. Candle dengan open_time sama dengan yang terakhir
+        menimpa candle itu; candle yang lebih lama diabaikan.
+        Returns True kalau candle baru ditambahkan/ditimpa.
+        """
+        open_time = int(open_time)
+        last = self.last_open_time
+        if last is not None:
+            if open_time < last:
+                return False
+            if open_time == last:
+                self._pos = (self._pos - 1) % self.capacity
+                self._len -= 1
+        i = self._pos
+        j = i + self.capacity
+        self._open_time[i] = self._open_time[j] = open_time
+        cols = self._cols
+        cols["open"][i] = cols["open"][j] = o
+        cols["high"][i] = cols["high"][j] = h
+        cols["low"][i] = cols["low"][j] = l
+        cols["close"][i] = cols["close"][j] = c
+        cols["volume"][i] = cols["volume"][j] = v
+        self._pos = (i + 1) % self.capacity
+        if self._len < self.capacity:
+            self._len += 1
+        return True
+
+    def extend(self, rows):
+        """rows: iterable of (open_time, open, high, low, close, volume)."""
+        for row in rows:
+            self.append(*row)
+
+    def view(self, field, n=None):
+        """Read-only, oldest..newest view of the last n values of a field."""
+        n = self._len if n is None else min(int(n), self._len)
+        start = (self._pos - n) % self.capacity
+        arr = self._open_time if field == "open_time" else self._cols[field]
+        v = arr[start:start + n]
+        v.flags.writeable = False
+        return v
+
+    def views(self, n=None):
+        return {f: self.view(f, n) for f in FIELDS}
+
+    def to_frame(self, n=None):
+        """DataFrame untuk detect_signal (kolom sama dengan history lama)."""
+        return pd.DataFrame(self.views(n))
+
+    def clear(self):
+        self._pos = 0
+        self._len = 0
+
+    @property
+    def nbytes(self):
+        return self._open_time.nbytes + sum(a.nbytes for a in self._cols.values())
+
+
+class KlineStore:
+    """Ring buffers keyed by (symbol, timeframe), created on first use."""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._buffers = {}
+
+    def __contains__(self, key):
+        return key in self._buffers
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def get(self, symbol, tf):
+        key = (symbol, tf)
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = KlineRingBuffer(self.capacity, self.dtype)
+        return buf
+
+    def append(self, symbol, tf, open_time, o, h, l, c, v):
+        return self.get(symbol, tf).append(open_time, o, h, l, c, v)
+
+    def keys(self):
+        return list(self._buffers)
+
+    def drop_symbol(self, symbol):
+        """Hapus semua buffer milik symbol. Returns jumlah buffer yang dihapus."""
+        keys = [k for k in self._buffers if k[0] == symbol]
+        for k in keys:
+            del self._buffers[k]
+        return len(keys)
+
+    @property
+    def nbytes(self):
+        return sum(b.nbytes for b in self._buffers.values())
+
+    def memory_report(self):
+        streams = len(self._buffers)
+        bars = sum(len(b) for b in self._buffers.values())
+        return {
+            "streams": streams,
+            "bars": bars,
+            "capacity": self.capacity,
+            "dtype": self.dtype.name,
+            "bytes": self.nbytes,
+            "mb": round(self.nbytes / 1024 / 1024, 3),
+        }
@@ -0,0 +1,41 @@
+
+import json
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:  # orjson opsional, fallback ke json bawaan
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+# Binance mengirim JSON compact, jadi flag candle belum close selalu persis ini
+_NOT_FINAL = '"x":false'
+_NOT_FINAL_B = b'"x":false'
+
+
+def is_final_kline(raw):
+    """Cek murah dari raw payload: False kalau kline belum close (tanpa parse JSON)."""
+    if isinstance(raw, str):
+        return _NOT_FINAL not in raw
+    return _NOT_FINAL_B not in raw
+
+
+def decode_closed_kline(raw):
+    """
+    Decode payload kline combined stream (atau raw /ws stream).
+    Returns None untuk kline yang belum close atau payload non-kline,
+    selain itu tuple (symbol, tf, open_time, open, high, low, close, volume, event_time).
+    """
+    if not is_final_kline(raw):
+        return None
+    msg = _loads(raw)
+    data = msg.get("data", msg)
+    k = data.get("k")
+    if not k or not k.get("x"):
+        return None
+    return (
+        k["s"], k["i"], int(k["t"]),
+        float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]),
+        int(data.get("E") or k["T"]),
+    )
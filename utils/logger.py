@@ -1,6 +1,39 @@
+import json, logging, os, time
+
+# LOG_FORMAT=json -> satu objek JSON per baris (field tambahan lewat extra={"fields": {...}})
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": round(record.created, 3),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        out.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
 
-import logging, os
 def get_logger(name=__name__):
     level = os.getenv("LOG_LEVEL", "INFO")
-    logging.basicConfig(level=getattr(logging, level))
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter("%(levelname)s:%(name)s:%(message)s"))
+        root.addHandler(handler)
+    root.setLevel(getattr(logging, level))
     return logging.getLogger(name)
@@ -0,0 +1,272 @@
+"""
+Metrik ringan tanpa dependency: counter, histogram (bucket tetap) dan gauge
+callback, di-expose dalam format teks Prometheus lewat endpoint HTTP lokal
+(METRICS_HOST:METRICS_PORT/metrics).
+"""
+import asyncio
+import bisect
+import os
+
+from utils.logger import get_logger
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 = endpoint nonaktif
+METRICS_LOG_SEC = int(os.getenv("METRICS_LOG_SEC", "300"))  # ringkasan latency ke log (0 = nonaktif)
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _fmt_labels(names, values, extra=""):
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter:
+    """Counter monotonic dengan label. labels(...) untuk dipakai di hot path."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._children = {}
+
+    def labels(self, **labels):
+        return self.child(tuple(str(labels.get(n, "")) for n in self.labelnames))
+
+    def child(self, key):
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _CounterChild()
+        return child
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {child.value:g}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Perkiraan kuantil (batas atas bucket), None kalau kosong."""
+        if not self.count:
+            return None
+        target, acc = q * self.count, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            acc += n
+            if acc >= target:
+                return bound
+        return float("inf")
+
+
+class Histogram:
+    """Histogram bucket kumulatif ala Prometheus, dengan label."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+
+    def labels(self, **labels):
+        return self.child(tuple(str(labels.get(n, "")) for n in self.labelnames))
+
+    def child(self, key):
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def samples(self):
+        for key, child in self._children.items():
+            acc = 0
+            for bound, n in zip(self.buckets + (float("inf"),), child.counts):
+                acc += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {acc}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {child.sum:g}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, key)} {child.count}"
+
+
+class Gauge:
+    """Gauge yang nilainya dibaca dari callback saat scrape: fn() -> angka atau {label: angka}."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labelname=None):
+        self.name, self.help, self.fn, self.labelname = name, help, fn, labelname
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return
+        if isinstance(value, dict):
+            for label, v in value.items():
+                yield f'{self.name}{{{self.labelname}="{label}"}} {v:g}'
+        elif value is not None:
+            yield f"{self.name} {value:g}"
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def counter(name, help, labelnames=()):
+    return _register(Counter(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name, help, fn, labelname=None):
+    return _register(Gauge(name, help, fn, labelname))
+
+
+def take_deltas(metrics):
+    """
+    Nilai counter/histogram di proses ini sejak panggilan terakhir (lalu di-nol-kan).
+    Dipakai eval worker untuk mengirim metriknya ke proses utama (lihat merge_deltas).
+    """
+    out = []
+    for m in metrics:
+        for key, child in m._children.items():
+            if isinstance(child, _HistogramChild):
+                if child.count:
+                    out.append((m.name, key, (child.counts, child.sum, child.count)))
+                    child.counts, child.sum, child.count = [0] * len(child.counts), 0.0, 0
+            elif child.value:
+                out.append((m.name, key, child.value))
+                child.value = 0.0
+    return out
+
+
+def merge_deltas(deltas):
+    """Tambahkan hasil take_deltas dari proses lain ke metrik proses ini."""
+    by_name = {m.name: m for m in _registry}
+    for name, key, value in deltas:
+        m = by_name.get(name)
+        if m is None:
+            continue
+        child = m.child(tuple(key))
+        if isinstance(child, _HistogramChild):
+            counts, total, count = value
+            child.counts = [a + b for a, b in zip(child.counts, counts)]
+            child.sum += total
+            child.count += count
+        else:
+            child.inc(value)
+
+
+def render():
+    """Semua metrik dalam format teks Prometheus."""
+    lines = []
+    for m in _registry:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.samples())
+    return "\n".join(lines) + "\n"
+
+
+# ==========================
+# METRIK PIPELINE
+# ==========================
+STAGE_SECONDS = histogram(
+    "signal_stage_seconds",
+    "Latency per tahap pipeline: exchange (E -> terima), close_to_recv (close kline -> terima), "
+    "decode, history, indicators, detect, cooldown, chart, tg_enqueue, tg_ack (antri -> ack Telegram)",
+    ("stage",),
+)
+CLOSE_TO_ALERT = histogram("signal_close_to_alert_seconds", "Close candle sampai Telegram ack (end-to-end)")
+WS_MESSAGES = counter("ws_messages_total", "Pesan websocket diterima per koneksi", ("conn",))
+WS_RECONNECTS = counter("ws_reconnects_total", "Reconnect websocket per koneksi", ("conn",))
+WS_CLOSED = counter("ws_closed_candles_total", "Kline closed (final) diterima per koneksi", ("conn",))
+WS_DROPPED = counter("ws_dropped_total", "Pesan websocket yang dibuang per koneksi (partial = kline belum close, eval_queue)",
+                     ("conn", "reason"))
+CLOSED_CANDLES = counter("closed_candles_total", "Candle closed yang masuk history (termasuk TF hasil resample)", ("tf",))
+SIGNALS = counter("signals_total", "Signal terdeteksi (sent / cooldown) per koneksi symbol-nya", ("tf", "result", "conn"))
+CHARTS = counter("signal_charts_total", "Chart signal per hasil (ok, timeout, error)", ("result",))
+INGEST_LAG = histogram("ingest_lag_seconds", "Lag per pesan websocket saat diproses (waktu proses - event time E)", ("conn",))
+INGEST_SHED = counter("ingest_shed_total", "Candle final yang diproses saat lag (history saja tanpa evaluasi)", ("conn",))
+TG_MESSAGES = counter("telegram_messages_total", "Pesan Telegram per hasil (sent, failed, dropped, retry)", ("result",))
+
+
+def summary():
+    """Ringkasan p50/p95 (ms) per tahap + total counter, untuk log terstruktur."""
+    out = {}
+    for key, child in STAGE_SECONDS._children.items():
+        if child.count:
+            out[f"{key[0]}_p50_ms"] = round(child.quantile(0.5) * 1000, 2)
+            out[f"{key[0]}_p95_ms"] = round(child.quantile(0.95) * 1000, 2)
+    e2e = CLOSE_TO_ALERT.labels()
+    if e2e.count:
+        out["close_to_alert_p95_ms"] = round(e2e.quantile(0.95) * 1000, 2)
+    for m in (WS_MESSAGES, WS_RECONNECTS, WS_CLOSED, WS_DROPPED, CLOSED_CANDLES, SIGNALS, TG_MESSAGES):
+        out[m.name] = sum(c.value for c in m._children.values())
+    return out
+
+
+async def log_summary_periodic(interval=METRICS_LOG_SEC):
+    log = get_logger("metrics")
+    while True:
+        await asyncio.sleep(interval)
+        log.info("pipeline metrics", extra={"fields": summary()})
+
+
+async def serve_metrics(port=METRICS_PORT, host=METRICS_HOST):
+    """Endpoint HTTP lokal: GET /metrics (format teks Prometheus)."""
+
+    async def on_conn(reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            path = request.split(b" ", 2)[1] if request.count(b" ") >= 2 else b"/"
+            if path.split(b"?")[0] in (b"/metrics", b"/"):
+                body, status = render().encode(), "200 OK"
+            else:
+                body, status = b"not found\n", "404 Not Found"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_conn, host, port)
+    print(f"📈 Metrics at http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,69 @@
+
+from .kline_buffer import interval_to_ms
+
+
+class CandleResampler:
+    """
+    Build higher-timeframe candles for one symbol from closed base candles.
+
+    Buckets are aligned to epoch like Binance klines (a 5m candle opens at a
+    multiple of 300000 ms). A bucket is emitted as soon as its last base candle
+    arrives; if base candles are missing (gap, reconnect) the partial bucket is
+    emitted when the first candle of a later bucket arrives.
+    """
+
+    def __init__(self, base_tf, targets):
+        self.base_tf = base_tf
+        self.base_ms = interval_to_ms(base_tf)
+        self.steps = {}
+        for tf in targets:
+            step = interval_to_ms(tf)
+            if step <= self.base_ms or step % self.base_ms:
+                raise ValueError(f"{tf} bukan kelipatan {base_tf}")
+            self.steps[tf] = step
+        self._partial = {}   # tf -> [bucket_open, o, h, l, c, v]
+        self.gaps = 0
+
+    @staticmethod
+    def supports(base_tf, tf):
+        step, base = interval_to_ms(tf), interval_to_ms(base_tf)
+        return step > base and step % base == 0
+
+    def add(self, open_time, o, h, l, c, v):
+        """
+        Masukkan 1 base candle closed.
+        Returns list of (tf, open_time, open, high, low, close, volume) yang selesai.
+        """
+        open_time = int(open_time)
+        out = []
+        for tf, step in self.steps.items():
+            bucket = open_time - open_time % step
+            p = self._partial.get(tf)
+            if p is not None and p[0] != bucket:
+                if bucket < p[0]:
+                    continue  # candle lama / out of order
+                # bucket sebelumnya tidak lengkap (ada gap) -> keluarkan apa adanya
+                self.gaps += 1
+                out.append((tf, *p))
+                p = None
+            if p is None:
+                p = self._partial[tf] = [bucket, o, h, l, c, v]
+            else:
+                if h > p[2]: p[2] = h
+                if l < p[3]: p[3] = l
+                p[4] = c
+                p[5] += v
+            if open_time + self.base_ms == bucket + step:
+                out.append((tf, *p))
+                del self._partial[tf]
+        return out
+
+    def prime(self, rows):
+        """
+        Isi bucket yang sedang berjalan dari history base (mis. hasil backfill)
+        tanpa mengeluarkan candle. rows: (open_time, open, high, low, close, volume).
+        """
+        gaps = self.gaps
+        for row in rows:
+            self.add(*row)
+        self.gaps = gaps
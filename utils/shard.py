@@ -0,0 +1,149 @@
+"""
+Sharding universe symbol ke beberapa proses / node main.py.
+
+Tiap worker (SHARD_ID unik) menulis heartbeat ke shared store; worker yang
+heartbeat-nya lebih tua dari SHARD_TTL_SEC dianggap mati. Symbol dibagi
+lewat consistent hash ring atas worker yang hidup, jadi saat worker
+bergabung / mati hanya symbol miliknya yang pindah. Refresh universe
+(exchangeInfo, stream !ticker@arr) hanya jalan di satu worker: pemegang
+lease "universe" (lihat ShardCoordinator.lead).
+"""
+import asyncio
+import bisect
+import hashlib
+import os
+import time
+
+SHARD_ID = os.getenv("SHARD_ID", "")   # kosong = satu proses pegang semua symbol
+SHARD_HEARTBEAT_SEC = float(os.getenv("SHARD_HEARTBEAT_SEC", "5"))
+SHARD_TTL_SEC = float(os.getenv("SHARD_TTL_SEC", "20"))
+RING_VNODES = 64
+PRUNE_EVERY_SEC = 300
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring dengan RING_VNODES titik per node."""
+
+    def __init__(self, nodes=(), vnodes=RING_VNODES):
+        self.nodes = tuple(sorted(nodes))
+        points = sorted((_hash(f"{n}#{i}"), n) for n in self.nodes for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._nodes = [p[1] for p in points]
+
+    def owner(self, key):
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[i]
+
+    def assign(self, keys):
+        """{node: [key, ...]} untuk semua node (termasuk yang tidak kebagian)."""
+        out = {n: [] for n in self.nodes}
+        for k in keys:
+            out[self.owner(k)].append(k)
+        return out
+
+
+class ShardCoordinator:
+    """
+    Heartbeat + pembagian symbol untuk satu worker. on_change(symbols)
+    dipanggil dengan bagian worker ini setiap kali universe atau daftar
+    worker hidup berubah.
+    """
+
+    def __init__(self, store, worker_id=SHARD_ID, on_change=None,
+                 heartbeat=SHARD_HEARTBEAT_SEC, ttl=SHARD_TTL_SEC):
+        self.store = store
+        self.worker_id = worker_id
+        self.on_change = on_change
+        self.heartbeat = heartbeat
+        self.ttl = ttl
+        self.universe = []
+        self.ring = HashRing([worker_id])
+        self.mine = set()
+        self._last_prune = 0.0
+
+    def owns(self, sym):
+        return sym in self.mine
+
+    async def start(self, symbols):
+        """Daftar ke store dan hitung bagian awal. Returns list symbol milik worker ini."""
+        if self.store.universe() is None:
+            await asyncio.to_thread(self.store.put_universe, symbols)
+        await self.tick(publish=False)
+        return sorted(self.mine)
+
+    async def set_universe(self, symbols):
+        """Universe baru dari coin_manager: dibagikan ke semua worker lewat store."""
+        await asyncio.to_thread(self.store.put_universe, symbols)
+        await self.tick()
+
+    async def tick(self, publish=True):
+        now = time.time()
+        await asyncio.to_thread(self.store.heartbeat, self.worker_id, now, {"symbols": len(self.mine)})
+        live = await asyncio.to_thread(self.store.workers, now, self.ttl)
+        universe = await asyncio.to_thread(self.store.universe)
+        nodes = tuple(sorted(set(live) | {self.worker_id}))
+        if nodes != self.ring.nodes:
+            gone = set(self.ring.nodes) - set(nodes)
+            joined = set(nodes) - set(self.ring.nodes)
+            print(f"🧩 Shard {self.worker_id}: workers {list(nodes)}"
+                  + (f" (mati: {sorted(gone)})" if gone else "") + (f" (baru: {sorted(joined)})" if joined else ""))
+            self.ring = HashRing(nodes)
+        if universe is not None:
+            self.universe = universe
+        mine = {s for s in self.universe if self.ring.owner(s) == self.worker_id}
+        if mine != self.mine:
+            print(f"🧩 Shard {self.worker_id}: {len(mine)}/{len(self.universe)} symbols "
+                  f"(+{len(mine - self.mine)} -{len(self.mine - mine)})")
+            self.mine = mine
+            if publish and self.on_change is not None:
+                res = self.on_change(sorted(mine))
+                if asyncio.iscoroutine(res):
+                    await res
+        if now - self._last_prune >= PRUNE_EVERY_SEC:
+            self._last_prune = now
+            await asyncio.to_thread(self.store.prune, now)
+
+    async def lead(self, factory, key="universe"):
+        """
+        Jalankan factory() (coroutine, mis. refresh_symbols_periodic) hanya
+        selama worker ini memegang lease key. Lease diperpanjang tiap
+        heartbeat; kalau pemegangnya mati, worker lain mengambil alih setelah ttl.
+        """
+        task = None
+        try:
+            while True:
+                try:
+                    held = await asyncio.to_thread(self.store.claim_lease, key, self.worker_id, time.time(), self.ttl)
+                except Exception as e:
+                    print(f"⚠️ Shard lease error: {e}")
+                    held = task is not None
+                if held and task is None:
+                    print(f"🧩 Shard {self.worker_id}: pegang lease {key}")
+                    task = asyncio.create_task(factory())
+                elif not held and task is not None:
+                    print(f"🧩 Shard {self.worker_id}: lease {key} pindah ke worker lain")
+                    task.cancel()
+                    task = None
+                await asyncio.sleep(self.heartbeat)
+        finally:
+            if task is not None:
+                task.cancel()
+                self.store.release_lease(key, self.worker_id)
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.heartbeat)
+                try:
+                    await self.tick()
+                except Exception as e:
+                    print(f"⚠️ Shard heartbeat error: {e}")
+        finally:
+            # keluar rapi: worker lain langsung mengambil alih tanpa menunggu TTL
+            self.store.remove_worker(self.worker_id)
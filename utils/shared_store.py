@@ -0,0 +1,241 @@
+"""
+State bersama antar worker shard: cooldown alert, dedupe pesan Telegram,
+signal aktif dan heartbeat worker. Dipilih lewat SHARED_STORE:
+
+    sqlite:///path/shared.db   semua worker di host / volume yang sama (default data/shared_state.db)
+    memory                     satu proses (perilaku tanpa sharding)
+
+Universe symbol juga disimpan di sini: tulisan terakhir (dari worker mana
+pun) menjadi daftar yang dibagi semua worker lewat hash ring. Lease
+(claim_lease) memilih satu worker yang menjalankan tugas tunggal seperti
+refresh universe.
+Semua klaim (cooldown, dedupe, close signal) atomik: dari beberapa worker
+yang berebut key yang sama, tepat satu yang menang.
+"""
+import asyncio, json, os, sqlite3, threading, time
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+SHARED_STORE = os.getenv("SHARED_STORE", "sqlite:///" + os.path.join(DATA_DIR, "shared_state.db"))
+DEDUPE_TTL_SEC = int(os.getenv("DEDUPE_TTL_SEC", "3600"))
+COOLDOWN_KEEP_SEC = 86400   # cooldown lebih tua dari ini dibuang saat prune
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cooldown (key TEXT PRIMARY KEY, ts REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS dedupe (key TEXT PRIMARY KEY, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS active (uid TEXT PRIMARY KEY, symbol TEXT NOT NULL, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, seen REAL NOT NULL, info TEXT);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS lease (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('active_version', 0);
+"""
+
+
+class MemoryStore:
+    """Store satu proses (dict), API sama dengan SqliteStore."""
+
+    shared = False
+
+    def __init__(self):
+        self.cooldowns = {}
+        self.dedupe = {}
+        self.signals = {}
+        self.heartbeats = {}
+        self.leases = {}
+        self.symbols = None
+        self.version = 0
+
+    def claim_cooldown(self, key, now, cooldown):
+        """True (dan catat now) kalau alert terakhir key sudah >= cooldown detik lalu."""
+        if now - self.cooldowns.get(key, 0.0) < cooldown:
+            return False
+        self.cooldowns[key] = now
+        return True
+
+    def release_symbol(self, sym):
+        """Symbol keluar dari universe: cooldown lokalnya tidak perlu disimpan lagi."""
+        for key in [k for k in self.cooldowns if k.split("|", 1)[0] == sym]:
+            del self.cooldowns[key]
+
+    def claim_once(self, key, now, ttl=DEDUPE_TTL_SEC):
+        """True untuk klaim pertama key dalam ttl detik."""
+        if self.dedupe.get(key, 0.0) > now:
+            return False
+        self.dedupe[key] = now + ttl
+        return True
+
+    def put_active(self, uid, signal):
+        self.signals[uid] = signal
+        self.version += 1
+
+    def close_active(self, uid):
+        """Hapus signal aktif. True hanya untuk pemanggil yang benar-benar menghapusnya."""
+        if self.signals.pop(uid, None) is None:
+            return False
+        self.version += 1
+        return True
+
+    def active(self, symbols=None):
+        return {u: s for u, s in self.signals.items() if symbols is None or s["symbol"] in symbols}
+
+    def active_version(self):
+        return self.version
+
+    def put_universe(self, symbols):
+        self.symbols = list(symbols)
+
+    def universe(self):
+        return self.symbols
+
+    def heartbeat(self, worker_id, now, info=None):
+        self.heartbeats[worker_id] = now
+
+    def claim_lease(self, key, owner, now, ttl):
+        """True kalau owner memegang (atau baru mendapat) lease key sampai now + ttl."""
+        cur = self.leases.get(key)
+        if cur is not None and cur[0] != owner and cur[1] > now:
+            return False
+        self.leases[key] = (owner, now + ttl)
+        return True
+
+    def release_lease(self, key, owner):
+        if self.leases.get(key, (None,))[0] == owner:
+            del self.leases[key]
+
+    def workers(self, now, ttl):
+        return sorted(w for w, seen in self.heartbeats.items() if seen >= now - ttl)
+
+    def remove_worker(self, worker_id):
+        self.heartbeats.pop(worker_id, None)
+
+    def prune(self, now):
+        self.dedupe = {k: e for k, e in self.dedupe.items() if e > now}
+        self.cooldowns = {k: t for k, t in self.cooldowns.items() if t >= now - COOLDOWN_KEEP_SEC}
+
+
+class SqliteStore:
+    """
+    Store bersama di SQLite (WAL). Tiap proses punya koneksi sendiri; klaim
+    memakai satu statement upsert bersyarat sehingga atomik antar proses.
+    """
+
+    shared = True
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.executescript(_SCHEMA)
+
+    def _write(self, sql, args=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, args).rowcount
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def claim_cooldown(self, key, now, cooldown):
+        return self._write(
+            "INSERT INTO cooldown (key, ts) VALUES (?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET ts = excluded.ts WHERE cooldown.ts <= ?",
+            (key, now, now - cooldown)) == 1
+
+    def release_symbol(self, sym):
+        # cooldown tetap berlaku untuk worker yang mengambil alih symbol
+        pass
+
+    def claim_once(self, key, now, ttl=DEDUPE_TTL_SEC):
+        return self._write(
+            "INSERT INTO dedupe (key, expires) VALUES (?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET expires = excluded.expires WHERE dedupe.expires <= ?",
+            (key, now + ttl, now)) == 1
+
+    def put_active(self, uid, signal):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO active (uid, symbol, data) VALUES (?, ?, ?)",
+                             (uid, signal["symbol"], json.dumps(signal, default=str)))
+            self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'active_version'")
+
+    def close_active(self, uid):
+        with self._lock, self._db:
+            if self._db.execute("DELETE FROM active WHERE uid = ?", (uid,)).rowcount != 1:
+                return False
+            self._db.execute("UPDATE meta SET value = value + 1 WHERE key = 'active_version'")
+            return True
+
+    def active(self, symbols=None):
+        rows = self._read("SELECT uid, symbol, data FROM active")
+        return {uid: json.loads(data) for uid, sym, data in rows if symbols is None or sym in symbols}
+
+    def active_version(self):
+        return self._read("SELECT value FROM meta WHERE key = 'active_version'")[0][0]
+
+    def put_universe(self, symbols):
+        self._write("INSERT OR REPLACE INTO kv (key, value) VALUES ('universe', ?)", (json.dumps(list(symbols)),))
+
+    def universe(self):
+        rows = self._read("SELECT value FROM kv WHERE key = 'universe'")
+        return json.loads(rows[0][0]) if rows else None
+
+    def heartbeat(self, worker_id, now, info=None):
+        self._write("INSERT OR REPLACE INTO workers (id, seen, info) VALUES (?, ?, ?)",
+                    (worker_id, now, json.dumps(info or {})))
+
+    def claim_lease(self, key, owner, now, ttl):
+        return self._write(
+            "INSERT INTO lease (key, owner, expires) VALUES (?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires"
+            " WHERE lease.owner = excluded.owner OR lease.expires <= ?",
+            (key, owner, now + ttl, now)) == 1
+
+    def release_lease(self, key, owner):
+        self._write("DELETE FROM lease WHERE key = ? AND owner = ?", (key, owner))
+
+    def workers(self, now, ttl):
+        return [r[0] for r in self._read("SELECT id FROM workers WHERE seen >= ? ORDER BY id", (now - ttl,))]
+
+    def remove_worker(self, worker_id):
+        self._write("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def prune(self, now):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM dedupe WHERE expires <= ?", (now,))
+            self._db.execute("DELETE FROM cooldown WHERE ts < ?", (now - COOLDOWN_KEEP_SEC,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+async def call(store, method, *args):
+    """
+    Panggil method store dari event loop. SqliteStore bisa menunggu lock
+    worker lain (sampai timeout koneksi), jadi dijalankan di thread;
+    MemoryStore langsung dipanggil.
+    """
+    fn = getattr(store, method)
+    if store.shared:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def open_store(url=SHARED_STORE):
+    """SHARED_STORE url -> store."""
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SqliteStore(url[len("sqlite:///"):])
+    raise ValueError(f"SHARED_STORE tidak dikenal: {url}")
+
+
+if __name__ == "__main__":
+    store = open_store()
+    now = time.time()
+    print(f"🗃️ {SHARED_STORE}")
+    print(f"   workers hidup: {store.workers(now, 60)}")
+    print(f"   signal aktif: {len(store.active())}")
@@ -1,8 +1,9 @@
 # utils/signal_engine_v2.py
+import os
 import numpy as np
 import pandas as pd
-from datetime import datetime, timezone, time as dtime
-from .indicators import atr as compute_atr
+from datetime import datetime, timezone
+from .indicators import atr as compute_atr, IncrementalIndicators
 
 # Config parameters (bisa di-expose ke .env nanti)
 EMA_FAST = 8
@@ -14,8 +15,12 @@ RSI_PERIOD = 14
 MFI_PERIOD = 14
 VOL_MULT = 1.5
 ATR_PCT_MIN = 0.002  # 0.2% minimal volatility
-ACTIVE_HOUR_START = 8   # UTC
-ACTIVE_HOUR_END = 22    # UTC
+RSI_BUY = 55         # RSI & MFI harus di atas ini untuk buy
+RSI_SHORT = 45       # ... dan di bawah ini untuk short
+RSI_STRONG_BUY = 65
+RSI_STRONG_SHORT = 35
+ACTIVE_HOUR_START = int(os.getenv("ACTIVE_HOUR_START", "8"))   # UTC
+ACTIVE_HOUR_END = int(os.getenv("ACTIVE_HOUR_END", "22"))       # UTC, 24 = sampai akhir hari
 
 # helpers
 def body_size(o, c):
@@ -24,42 +29,49 @@ def body_size(o, c):
 def is_bullish(row): return float(row["close"]) > float(row["open"])
 def is_bearish(row): return float(row["close"]) < float(row["open"])
 
-def detect_bullish_engulfing(df):
-    if len(df) < 2: return False
-    a = df.iloc[-2]; b = df.iloc[-1]
-    if is_bearish(a) and is_bullish(b):
-        body_a = body_size(a["open"], a["close"])
-        body_b = body_size(b["open"], b["close"])
-        return body_b >= 1.5 * body_a and b["open"] < a["close"] and b["close"] > a["open"]
+def bullish_engulfing(o1, c1, o2, c2):
+    if c1 < o1 and c2 > o2:
+        return body_size(o2, c2) >= 1.5 * body_size(o1, c1) and o2 < c1 and c2 > o1
     return False
 
-def detect_bearish_engulfing(df):
-    if len(df) < 2: return False
-    a = df.iloc[-2]; b = df.iloc[-1]
-    if is_bullish(a) and is_bearish(b):
-        body_a = body_size(a["open"], a["close"])
-        body_b = body_size(b["open"], b["close"])
-        return body_b >= 1.5 * body_a and b["open"] > a["close"] and b["close"] < a["open"]
+def bearish_engulfing(o1, c1, o2, c2):
+    if c1 > o1 and c2 < o2:
+        return body_size(o2, c2) >= 1.5 * body_size(o1, c1) and o2 > c1 and c2 < o1
     return False
 
-def detect_hammer(df):
-    if len(df) < 1: return False
-    b = df.iloc[-1]
-    o,h,l,c = float(b["open"]), float(b["high"]), float(b["low"]), float(b["close"])
+def hammer(o, h, l, c):
     body = abs(c-o)
     lower_shadow = min(o,c) - l
     upper_shadow = h - max(o,c)
     return lower_shadow >= 2 * body and upper_shadow <= body
 
-def detect_shooting_star(df):
-    if len(df) < 1: return False
-    b = df.iloc[-1]
-    o,h,l,c = float(b["open"]), float(b["high"]), float(b["low"]), float(b["close"])
+def shooting_star(o, h, l, c):
     body = abs(c-o)
     upper_shadow = h - max(o,c)
     lower_shadow = min(o,c) - l
     return upper_shadow >= 2 * body and lower_shadow <= body
 
+def _ohlc(row):
+    return float(row["open"]), float(row["high"]), float(row["low"]), float(row["close"])
+
+def detect_bullish_engulfing(df):
+    if len(df) < 2: return False
+    a = df.iloc[-2]; b = df.iloc[-1]
+    return bullish_engulfing(float(a["open"]), float(a["close"]), float(b["open"]), float(b["close"]))
+
+def detect_bearish_engulfing(df):
+    if len(df) < 2: return False
+    a = df.iloc[-2]; b = df.iloc[-1]
+    return bearish_engulfing(float(a["open"]), float(a["close"]), float(b["open"]), float(b["close"]))
+
+def detect_hammer(df):
+    if len(df) < 1: return False
+    return hammer(*_ohlc(df.iloc[-1]))
+
+def detect_shooting_star(df):
+    if len(df) < 1: return False
+    return shooting_star(*_ohlc(df.iloc[-1]))
+
 def compute_rsi(series: pd.Series, period=RSI_PERIOD):
     delta = series.diff()
     up = delta.clip(lower=0).rolling(period).mean()
@@ -78,9 +90,11 @@ def compute_mfi(df: pd.DataFrame, period=MFI_PERIOD):
     mfi = 100 - (100 / (1 + mfr))
     return mfi.fillna(50)
 
-def time_ok():
-    now = datetime.now(timezone.utc).time()
-    return dtime(ACTIVE_HOUR_START,0) <= now <= dtime(ACTIVE_HOUR_END,0)
+def time_ok(now=None):
+    """now: datetime UTC (jam simulasi saat replay), default jam sekarang."""
+    t = (now or datetime.now(timezone.utc)).time()
+    sod = t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+    return ACTIVE_HOUR_START * 3600 <= sod <= ACTIVE_HOUR_END * 3600
 
 def recommend_leverage(confidence:int, atr_pct:float):
     """
@@ -107,18 +121,19 @@ def recommend_leverage(confidence:int, atr_pct:float):
 
     return f"{base_min}x–{base_max}x"
 
-def detect_signal(df: pd.DataFrame):
+def detect_signal(df: pd.DataFrame, now=None):
     """
     df: DataFrame with columns open, high, low, close, volume (ordered oldest..newest)
     returns dict if signal found:
       {"side":"buy"/"short","price":..., "atr":..., "atr_pct":..., "confidence":int, "vol":..., "reason":...}
     otherwise None
+    now: datetime UTC for the time filter (simulated clock in replay), default now
     """
     if df is None or len(df) < max(EMA_TREND, MFI_PERIOD, RSI_PERIOD, 30):
         return None
 
     # time filter
-    if not time_ok():
+    if not time_ok(now):
         return None
 
     closes = df["close"].astype(float)
@@ -132,58 +147,96 @@ def detect_signal(df: pd.DataFrame):
     ema_long = closes.ewm(span=EMA_LONG, adjust=False).mean()
     ema_trend = closes.ewm(span=EMA_TREND, adjust=False).mean()
 
-    ema_fast_now = ema_fast.iloc[-1]
-    ema_med_now = ema_med.iloc[-1]
-    ema_long_now = ema_long.iloc[-1]
-    ema_trend_now = ema_trend.iloc[-1]
-
-    ema_fast_prev = ema_fast.iloc[-2]
-    ema_med_prev = ema_med.iloc[-2]
-
-    # Momentum
-    rsi = compute_rsi(closes)
-    mfi = compute_mfi(df)
-    rsi_now = rsi.iloc[-1]
-    mfi_now = mfi.iloc[-1]
-
     # Volume
     vol_ma20 = vols.rolling(20).mean().iloc[-1] if len(vols)>=20 else vols.mean()
-    vol_now = vols.iloc[-1]
-    vol_ok = vol_now >= VOL_MULT * (vol_ma20 if vol_ma20>0 else 1)
 
     # ATR
     atr_s = compute_atr(highs, lows, closes)
-    atr_now = atr_s.iloc[-1]
-    price_now = float(closes.iloc[-1])
+
+    avg_body = None
+    if len(df) > 20:
+        avg_body = closes.pct_change().abs().rolling(20).mean().iloc[-1]
+
+    return evaluate_signal(
+        ema_fast_now=ema_fast.iloc[-1], ema_fast_prev=ema_fast.iloc[-2],
+        ema_med_now=ema_med.iloc[-1], ema_med_prev=ema_med.iloc[-2],
+        ema_long_now=ema_long.iloc[-1], ema_trend_now=ema_trend.iloc[-1],
+        rsi_now=compute_rsi(closes).iloc[-1], mfi_now=compute_mfi(df).iloc[-1],
+        vol_now=vols.iloc[-1], vol_ma20=vol_ma20, atr_now=atr_s.iloc[-1],
+        last=_ohlc(df.iloc[-1]), prev=_ohlc(df.iloc[-2]), avg_body=avg_body,
+    )
+
+
+def make_indicator_state(window):
+    """Buat IncrementalIndicators dengan parameter engine ini."""
+    return IncrementalIndicators(
+        window,
+        ema_spans=(EMA_FAST, EMA_MED, EMA_LONG, EMA_TREND),
+        rsi_period=RSI_PERIOD,
+        mfi_period=MFI_PERIOD,
+    )
+
+
+def detect_signal_incremental(state: IncrementalIndicators, now=None):
+    """
+    Same rules as detect_signal, read from an IncrementalIndicators state
+    (see make_indicator_state) instead of recomputing over a DataFrame.
+    """
+    if state is None or len(state) < max(EMA_TREND, MFI_PERIOD, RSI_PERIOD, 30):
+        return None
+
+    # time filter
+    if not time_ok(now):
+        return None
+
+    return evaluate_signal(
+        ema_fast_now=state.ema(EMA_FAST), ema_fast_prev=state.ema_prev(EMA_FAST),
+        ema_med_now=state.ema(EMA_MED), ema_med_prev=state.ema_prev(EMA_MED),
+        ema_long_now=state.ema(EMA_LONG), ema_trend_now=state.ema(EMA_TREND),
+        rsi_now=state.rsi(), mfi_now=state.mfi(),
+        vol_now=state.vols[-1], vol_ma20=state.vol_ma(), atr_now=state.atr(),
+        last=state.last, prev=state.prev, avg_body=state.avg_body(),
+    )
+
+
+def evaluate_signal(ema_fast_now, ema_fast_prev, ema_med_now, ema_med_prev,
+                    ema_long_now, ema_trend_now, rsi_now, mfi_now, vol_now,
+                    vol_ma20, atr_now, last, prev, avg_body):
+    """
+    Apply the signal rules to last-bar indicator values.
+    last/prev: (open, high, low, close) of the newest and previous candle.
+    avg_body: rolling mean of abs pct_change, None when there is not enough data.
+    """
+    vol_ok = vol_now >= VOL_MULT * (vol_ma20 if vol_ma20>0 else 1)
+
+    price_now = float(last[3])
     atr_pct = atr_now / price_now if price_now>0 else 0.0
     if atr_pct < ATR_PCT_MIN:
         return None  # too low volatility
 
     # Candle patterns
-    bull_eng = detect_bullish_engulfing(df)
-    bear_eng = detect_bearish_engulfing(df)
-    hammer = detect_hammer(df)
-    shoot = detect_shooting_star(df)
+    bull_eng = bullish_engulfing(prev[0], prev[3], last[0], last[3])
+    bear_eng = bearish_engulfing(prev[0], prev[3], last[0], last[3])
+    is_hammer = hammer(*last)
+    shoot = shooting_star(*last)
     breakout = False
-    if len(df) > 20:
-        avg_body = df["close"].astype(float).pct_change().abs().rolling(20).mean().iloc[-1]
-        if avg_body and avg_body>0:
-            bsize = body_size(df.iloc[-1]["open"], df.iloc[-1]["close"])
-            breakout = (bsize/price_now) >= 1.8 * avg_body
+    if avg_body and avg_body>0:
+        bsize = body_size(last[0], last[3])
+        breakout = (bsize/price_now) >= 1.8 * avg_body
 
     # Trend alignment (cross)
     long_trend = (ema_fast_prev <= ema_med_prev) and (ema_fast_now > ema_med_now) and (ema_fast_now > ema_long_now) and (price_now > ema_trend_now)
     short_trend = (ema_fast_prev >= ema_med_prev) and (ema_fast_now < ema_med_now) and (ema_fast_now < ema_long_now) and (price_now < ema_trend_now)
 
     # Compose conditions
-    buy_cond = long_trend and (rsi_now > 55) and (mfi_now > 55) and vol_ok and (bull_eng or hammer or breakout)
-    short_cond = short_trend and (rsi_now < 45) and (mfi_now < 45) and vol_ok and (bear_eng or shoot or breakout)
+    buy_cond = long_trend and (rsi_now > RSI_BUY) and (mfi_now > RSI_BUY) and vol_ok and (bull_eng or is_hammer or breakout)
+    short_cond = short_trend and (rsi_now < RSI_SHORT) and (mfi_now < RSI_SHORT) and vol_ok and (bear_eng or shoot or breakout)
 
     if buy_cond:
         confidence = 80
         if bull_eng: confidence += 6
         if vol_now > 2 * (vol_ma20 if vol_ma20>0 else 1): confidence += 6
-        if rsi_now > 65 and mfi_now > 65: confidence += 6
+        if rsi_now > RSI_STRONG_BUY and mfi_now > RSI_STRONG_BUY: confidence += 6
         confidence = min(confidence, 98)
         return {
             "side": "buy",
@@ -199,7 +252,7 @@ def detect_signal(df: pd.DataFrame):
         confidence = 80
         if bear_eng: confidence += 6
         if vol_now > 2 * (vol_ma20 if vol_ma20>0 else 1): confidence += 6
-        if rsi_now < 35 and mfi_now < 35: confidence += 6
+        if rsi_now < RSI_STRONG_SHORT and mfi_now < RSI_STRONG_SHORT: confidence += 6
         confidence = min(confidence, 98)
         return {
             "side": "short",
@@ -212,3 +265,294 @@ def detect_signal(df: pd.DataFrame):
         }
 
     return None
+
+
+# ==========================
+# VECTORIZED (ARRAY) RULES
+# ==========================
+_EMA_WEIGHTS = {}
+
+def _ema_weights(span, n):
+    """Bobot ewm(adjust=False) sehingga ema[-1] == x @ w untuk x dengan panjang n."""
+    key = (span, n)
+    w = _EMA_WEIGHTS.get(key)
+    if w is None:
+        alpha = 2.0 / (span + 1.0)
+        w = alpha * (1.0 - alpha) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        w[0] = (1.0 - alpha) ** (n - 1)
+        _EMA_WEIGHTS[key] = w
+    return w
+
+def ema_windowed(closes, span, window=None):
+    """
+    EMA tiap bar seperti buffer live dengan `window` candle terakhir (ewm
+    seeded di bar pertama window, sama dengan detect_signals_batch /
+    IncrementalIndicators). Returns (ema_now, ema_prev) per bar; ema_prev
+    memakai window yang sama tanpa bar itu. window=None: seluruh seri.
+    """
+    x = np.asarray(closes, dtype=np.float64)
+    full = pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+    now, prev = full.copy(), np.r_[np.nan, full[:-1]]
+    if window is None or len(x) < window:
+        return now, prev
+    windows = np.lib.stride_tricks.sliding_window_view(x, window)
+    now[window - 1:] = windows @ _ema_weights(span, window)
+    # bar i >= window: window [i-window+1, i-1]
+    prev[window:] = windows[1:, :-1] @ _ema_weights(span, window - 1)
+    return now, prev
+
+def candle_pattern_arrays(prev, last):
+    """
+    Elementwise bullish_engulfing / bearish_engulfing / hammer / shooting_star.
+    prev/last: (open, high, low, close) tuples of arrays.
+    Returns (bull_eng, bear_eng, hammer, shooting_star) boolean arrays.
+    """
+    o1, c1 = prev[0], prev[3]
+    o2, h2, l2, c2 = last
+    body1 = np.abs(c1 - o1)
+    body2 = np.abs(c2 - o2)
+    bull_eng = (c1 < o1) & (c2 > o2) & (body2 >= 1.5 * body1) & (o2 < c1) & (c2 > o1)
+    bear_eng = (c1 > o1) & (c2 < o2) & (body2 >= 1.5 * body1) & (o2 > c1) & (c2 < o1)
+    upper = h2 - np.maximum(o2, c2)
+    lower = np.minimum(o2, c2) - l2
+    is_hammer = (lower >= 2 * body2) & (upper <= body2)
+    shoot = (upper >= 2 * body2) & (lower <= body2)
+    return bull_eng, bear_eng, is_hammer, shoot
+
+def evaluate_signal_arrays(ema_fast_now, ema_fast_prev, ema_med_now, ema_med_prev,
+                           ema_long_now, ema_trend_now, rsi_now, mfi_now, vol_now,
+                           vol_ma20, atr_now, last, prev, avg_body, details=None, params=None):
+    """
+    Elementwise numpy version of evaluate_signal. Every argument is an array of
+    the same shape (last/prev are (open, high, low, close) tuples of arrays,
+    avg_body uses NaN for "not enough data").
+    Returns (side, confidence, atr_pct): side is 1 buy, -1 short, 0 none.
+    details: optional dict, filled with every intermediate condition array.
+    params: optional overrides of vol_mult, atr_pct_min, rsi_buy, rsi_short
+    (parameter sweep), default the module constants.
+    """
+    params = params or {}
+    vol_mult = params.get("vol_mult", VOL_MULT)
+    atr_pct_min = params.get("atr_pct_min", ATR_PCT_MIN)
+    rsi_buy = params.get("rsi_buy", RSI_BUY)
+    rsi_short = params.get("rsi_short", RSI_SHORT)
+    o2, h2, l2, c2 = last
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_base = np.where(vol_ma20 > 0, vol_ma20, 1)
+        vol_ok = vol_now >= vol_mult * vol_base
+
+        price_now = c2
+        atr_pct = np.where(price_now > 0, atr_now / price_now, 0.0)
+        atr_ok = ~(atr_pct < atr_pct_min)
+
+        # Candle patterns
+        bull_eng, bear_eng, is_hammer, shoot = candle_pattern_arrays(prev, last)
+        breakout = (avg_body > 0) & ((np.abs(c2 - o2) / price_now) >= 1.8 * avg_body)
+
+        # Trend alignment (cross)
+        long_trend = (ema_fast_prev <= ema_med_prev) & (ema_fast_now > ema_med_now) & (ema_fast_now > ema_long_now) & (price_now > ema_trend_now)
+        short_trend = (ema_fast_prev >= ema_med_prev) & (ema_fast_now < ema_med_now) & (ema_fast_now < ema_long_now) & (price_now < ema_trend_now)
+
+        buy_cond = atr_ok & long_trend & (rsi_now > rsi_buy) & (mfi_now > rsi_buy) & vol_ok & (bull_eng | is_hammer | breakout)
+        short_cond = atr_ok & short_trend & (rsi_now < rsi_short) & (mfi_now < rsi_short) & vol_ok & (bear_eng | shoot | breakout)
+        short_cond &= ~buy_cond
+
+        big_vol = vol_now > 2 * vol_base
+        conf_buy = 80 + 6 * bull_eng + 6 * big_vol + 6 * ((rsi_now > RSI_STRONG_BUY) & (mfi_now > RSI_STRONG_BUY))
+        conf_short = 80 + 6 * bear_eng + 6 * big_vol + 6 * ((rsi_now < RSI_STRONG_SHORT) & (mfi_now < RSI_STRONG_SHORT))
+
+    side = np.where(buy_cond, 1, np.where(short_cond, -1, 0))
+    confidence = np.minimum(np.where(buy_cond, conf_buy, conf_short), 98)
+    if details is not None:
+        details.update(
+            vol_ok=vol_ok, atr_ok=atr_ok, bull_eng=bull_eng, bear_eng=bear_eng, hammer=is_hammer,
+            shooting_star=shoot, breakout=breakout, long_trend=long_trend, short_trend=short_trend,
+        )
+    return side, confidence, atr_pct
+
+def detect_signals_batch(opens, highs, lows, closes, volumes, now=None):
+    """
+    Evaluate the last bar of many symbols at once.
+    Inputs are (symbols, bars) float arrays, oldest..newest, same bar count for
+    every row. Returns a list with a detect_signal-style dict or None per row.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n_sym, n = closes.shape
+    if n_sym == 0 or n < max(EMA_TREND, MFI_PERIOD, RSI_PERIOD, 30):
+        return [None] * n_sym
+
+    # time filter
+    if not time_ok(now):
+        return [None] * n_sym
+
+    opens = np.asarray(opens, dtype=np.float64)
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+
+    # EMAs: ewm(adjust=False) di bar terakhir = dot product dengan bobot tetap
+    emas = {}
+    for span in (EMA_FAST, EMA_MED, EMA_LONG, EMA_TREND):
+        emas[span] = (closes @ _ema_weights(span, n), closes[:, :-1] @ _ema_weights(span, n - 1))
+
+    # RSI (rolling mean)
+    delta = np.diff(closes[:, -(RSI_PERIOD + 1):], axis=1)
+    up = np.clip(delta, 0, None).sum(axis=1) / RSI_PERIOD
+    down = -np.clip(delta, None, 0).sum(axis=1) / RSI_PERIOD
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(down == 0, 50.0, 100 - (100 / (1 + up / down)))
+
+    # MFI (rolling sum)
+    typical = (highs[:, -(MFI_PERIOD + 1):] + lows[:, -(MFI_PERIOD + 1):] + closes[:, -(MFI_PERIOD + 1):]) / 3
+    money = typical[:, 1:] * volumes[:, -MFI_PERIOD:]
+    direction = np.diff(typical, axis=1)
+    m_up = np.where(direction > 0, money, 0).sum(axis=1)
+    m_down = np.abs(np.where(direction < 0, money, 0)).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mfi = np.where(m_down == 0, 50.0, 100 - (100 / (1 + m_up / m_down)))
+
+    # ATR (rolling mean 14)
+    prev_c = closes[:, -15:-1]
+    h14, l14 = highs[:, -14:], lows[:, -14:]
+    tr = np.maximum(h14 - l14, np.maximum(np.abs(h14 - prev_c), np.abs(l14 - prev_c)))
+    atr_now = tr.mean(axis=1)
+
+    vol_ma20 = volumes[:, -20:].mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_body = np.abs(closes[:, -20:] / closes[:, -21:-1] - 1).mean(axis=1)
+
+    last = (opens[:, -1], highs[:, -1], lows[:, -1], closes[:, -1])
+    prev = (opens[:, -2], highs[:, -2], lows[:, -2], closes[:, -2])
+    side, confidence, atr_pct = evaluate_signal_arrays(
+        ema_fast_now=emas[EMA_FAST][0], ema_fast_prev=emas[EMA_FAST][1],
+        ema_med_now=emas[EMA_MED][0], ema_med_prev=emas[EMA_MED][1],
+        ema_long_now=emas[EMA_LONG][0], ema_trend_now=emas[EMA_TREND][0],
+        rsi_now=rsi, mfi_now=mfi, vol_now=volumes[:, -1], vol_ma20=vol_ma20,
+        atr_now=atr_now, last=last, prev=prev, avg_body=avg_body,
+    )
+
+    out = [None] * n_sym
+    for i in np.flatnonzero(side):
+        out[i] = {
+            "side": "buy" if side[i] > 0 else "short",
+            "price": float(closes[i, -1]),
+            "atr": float(atr_now[i]),
+            "atr_pct": float(atr_pct[i]),
+            "vol": float(volumes[i, -1]),
+            "confidence": int(confidence[i]),
+            "reason": "EMA+RSI+MFI+Volume+Candle"
+        }
+    return out
+
+
+# ==========================
+# WHOLE-SERIES RULES
+# ==========================
+def candle_patterns_series(df: pd.DataFrame):
+    """
+    detect_bullish_engulfing / detect_bearish_engulfing / detect_hammer /
+    detect_shooting_star for every bar at once (bar i = helper on df[:i+1]).
+    """
+    o, h, l, c = (df[f].to_numpy(dtype=np.float64) for f in ("open", "high", "low", "close"))
+    prev = tuple(np.r_[np.nan, x[:-1]] for x in (o, h, l, c))
+    bull_eng, bear_eng, is_hammer, shoot = candle_pattern_arrays(prev, (o, h, l, c))
+    return pd.DataFrame(
+        {"bull_eng": bull_eng, "bear_eng": bear_eng, "hammer": is_hammer, "shooting_star": shoot},
+        index=df.index,
+    )
+
+def _bar_times_ns(df, times):
+    """Waktu tiap bar (ns epoch UTC) untuk filter jam, None = jam sekarang."""
+    if times is None:
+        if "close_time" in df:
+            times = df["close_time"]
+        elif isinstance(df.index, pd.DatetimeIndex):
+            times = df.index
+        else:
+            return None
+    times = pd.Series(np.asarray(times))
+    if np.issubdtype(times.dtype, np.number):
+        return pd.to_datetime(times, unit="ms", utc=True).to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return pd.to_datetime(times, utc=True).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+def detect_signals_series(df: pd.DataFrame, times=None, window=None):
+    """
+    detect_signal for every bar of df in one pass: row i equals
+    detect_signal(df.iloc[:i+1], now=time of bar i).
+    window: live history length (HISTORY_LEN); row i then equals the live bot
+    on its last `window` candles, df.iloc[max(0, i-window+1):i+1].
+
+    times: per-bar time for the active-hours filter (epoch ms or datetimes),
+    default the df["close_time"] column (ms) or a DatetimeIndex, otherwise the
+    current time like detect_signal(now=None).
+    Returns a DataFrame on df.index: side (1 buy, -1 short, 0 none), confidence,
+    price, atr, atr_pct, vol plus every condition column (rsi, mfi, vol_ok,
+    atr_ok, time_ok, bull_eng, bear_eng, hammer, shooting_star, breakout,
+    long_trend, short_trend). series_signals() turns it into detect_signal dicts.
+    """
+    n = len(df)
+    closes = df["close"].astype(float)
+    highs = df["high"].astype(float)
+    lows = df["low"].astype(float)
+    vols = df["volume"].astype(float)
+
+    # indikator yang sama dengan detect_signal, dihitung sekali untuk seluruh kolom
+    ema_fast, ema_fast_prev = ema_windowed(closes, EMA_FAST, window)
+    ema_med, ema_med_prev = ema_windowed(closes, EMA_MED, window)
+    ema_long, _ = ema_windowed(closes, EMA_LONG, window)
+    ema_trend, _ = ema_windowed(closes, EMA_TREND, window)
+    vol_ma20 = vols.rolling(20).mean().to_numpy()
+    atr_s = compute_atr(highs, lows, closes).to_numpy()
+    avg_body = closes.pct_change().abs().rolling(20).mean().to_numpy()
+    rsi = compute_rsi(closes).to_numpy()
+    mfi = compute_mfi(df).to_numpy()
+
+    o, h, l, c = (x.to_numpy(dtype=np.float64) for x in (df["open"].astype(float), highs, lows, closes))
+    shift = lambda x: np.r_[np.nan, x[:-1]]
+    details = {}
+    side, confidence, atr_pct = evaluate_signal_arrays(
+        ema_fast_now=ema_fast, ema_fast_prev=ema_fast_prev,
+        ema_med_now=ema_med, ema_med_prev=ema_med_prev,
+        ema_long_now=ema_long, ema_trend_now=ema_trend,
+        rsi_now=rsi, mfi_now=mfi, vol_now=vols.to_numpy(), vol_ma20=vol_ma20, atr_now=atr_s,
+        last=(o, h, l, c), prev=(shift(o), shift(h), shift(l), shift(c)), avg_body=avg_body,
+        details=details,
+    )
+
+    # warm-up dan filter jam, sama seperti guard di awal detect_signal
+    ready = np.arange(n) >= max(EMA_TREND, MFI_PERIOD, RSI_PERIOD, 30) - 1
+    ns = _bar_times_ns(df, times)
+    if ns is None:
+        active = np.full(n, time_ok())
+    else:
+        sod = ns % 86_400_000_000_000
+        hour = 3_600_000_000_000
+        active = (sod >= ACTIVE_HOUR_START * hour) & (sod <= ACTIVE_HOUR_END * hour)
+    side = np.where(ready & active, side, 0)
+
+    out = pd.DataFrame({
+        "side": side.astype(np.int8),
+        "confidence": np.where(side != 0, confidence, 0).astype(np.int16),
+        "price": c, "atr": atr_s, "atr_pct": atr_pct, "vol": vols.to_numpy(),
+        "rsi": rsi, "mfi": mfi, "time_ok": active,
+    }, index=df.index)
+    for k, v in details.items():
+        out[k] = v
+    return out
+
+def series_signals(res: pd.DataFrame):
+    """{index: detect_signal-style dict} for the bars of detect_signals_series with a signal."""
+    hits = res[res["side"] != 0]
+    return {
+        idx: {
+            "side": "buy" if r.side > 0 else "short",
+            "price": float(r.price),
+            "atr": float(r.atr),
+            "atr_pct": float(r.atr_pct),
+            "vol": float(r.vol),
+            "confidence": int(r.confidence),
+            "reason": "EMA+RSI+MFI+Volume+Candle"
+        }
+        for idx, r in zip(hits.index, hits.itertuples(index=False))
+    }
@@ -0,0 +1,244 @@
+import asyncio, atexit, json, os, threading
+from collections import defaultdict
+
+from .shard import SHARD_ID
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+# tiap worker shard punya snapshot + WAL sendiri (sumber bersama tetap shared store)
+ACTIVE_PATH = os.path.join(DATA_DIR, f"signals_active.{SHARD_ID}.json" if SHARD_ID else "signals_active.json")
+SNAPSHOT_SEC = float(os.getenv("REGISTRY_SNAPSHOT_SEC", "10"))
+EVENTS = ("opened", "updated", "closed")
+
+
+class SignalRegistry:
+    """
+    Satu pemilik signal aktif untuk bot dan tracker, di memori, index per uid
+    dan per symbol. Perubahan lewat open / update / close, dan listener
+    on(event, fn(uid, signal)) dipanggil untuk opened / updated / closed.
+
+    Persistensi: tiap event di-append ke write-ahead log kecil
+    (signals_active.json.wal, satu baris JSON dengan nomor urut), lalu
+    snapshot debounced menulis semua signal ke signals_active.json secara
+    atomik (tmp + fsync + rename) dan membuang WAL yang sudah tercakup.
+    Restart = baca snapshot + replay WAL. Path harga (on_price/evaluate)
+    tidak pernah menyentuh disk.
+    """
+
+    def __init__(self, path=ACTIVE_PATH, load=True):
+        self.path = path
+        self.wal_path = path + ".wal"
+        self.signals = {}                      # uid -> signal
+        self.by_symbol = defaultdict(dict)     # symbol -> {uid: signal}
+        self._listeners = defaultdict(list)
+        self._seq = 0           # nomor urut event terakhir
+        self._snap_seq = 0      # event terakhir yang sudah ada di snapshot
+        self._wal = None
+        self._lock = threading.Lock()   # snapshot bisa jalan di thread
+        self._write_lock = threading.Lock()   # snapshot exit vs flusher di thread: satu .tmp
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if load:
+            self.recover()
+
+    def __len__(self):
+        return len(self.signals)
+
+    def __contains__(self, uid):
+        return uid in self.signals
+
+    def get(self, uid):
+        return self.signals.get(uid)
+
+    def items(self):
+        return self.signals.items()
+
+    def for_symbol(self, sym):
+        return self.by_symbol.get(sym, {})
+
+    @property
+    def dirty(self):
+        return self._seq != self._snap_seq
+
+    def on(self, event, fn):
+        if event not in EVENTS:
+            raise ValueError(f"event tidak dikenal: {event}")
+        self._listeners[event].append(fn)
+
+    def _emit(self, event, uid, s):
+        for fn in self._listeners[event]:
+            try:
+                fn(uid, s)
+            except Exception as e:
+                print(f"⚠️ Registry listener {event} error: {e}")
+
+    # ==========================
+    # EVENT
+    # ==========================
+    def open(self, uid, signal):
+        self._apply("open", uid, signal)
+        self._log("open", uid, signal)
+        self._emit("opened", uid, signal)
+
+    def update(self, uid, **fields):
+        s = self.signals.get(uid)
+        if s is None:
+            return None
+        self._apply("update", uid, fields)
+        self._log("update", uid, fields)
+        self._emit("updated", uid, s)
+        return s
+
+    def close(self, uid, **fields):
+        """Keluarkan signal dari registry. Returns signal (sudah di-update fields) atau None."""
+        s = self.signals.get(uid)
+        if s is None:
+            return None
+        s.update(fields)
+        self._apply("close", uid, None)
+        self._log("close", uid, None)
+        self._emit("closed", uid, s)
+        return s
+
+    def sync(self, signals):
+        """Samakan isi registry dengan daftar dari luar (mis. shared store antar worker shard)."""
+        for uid in [u for u in self.signals if u not in signals]:
+            self.close(uid)
+        for uid, s in signals.items():
+            cur = self.signals.get(uid)
+            if cur is None:
+                self.open(uid, s)
+            elif cur != s:
+                self.update(uid, **s)
+
+    def _apply(self, op, uid, data):
+        if op == "open":
+            old = self.signals.get(uid)
+            if old is not None:
+                self.by_symbol[old["symbol"]].pop(uid, None)
+            self.signals[uid] = data
+            self.by_symbol[data["symbol"]][uid] = data
+        elif op == "update":
+            s = self.signals.get(uid)
+            if s is not None:
+                s.update(data)
+        elif op == "close":
+            s = self.signals.pop(uid, None)
+            if s is not None:
+                bucket = self.by_symbol[s["symbol"]]
+                bucket.pop(uid, None)
+                if not bucket:
+                    del self.by_symbol[s["symbol"]]
+
+    # ==========================
+    # PERSISTENSI
+    # ==========================
+    def _log(self, op, uid, data):
+        with self._lock:
+            self._seq += 1
+            if self._wal is None:
+                self._wal = open(self.wal_path, "a")
+            self._wal.write(json.dumps({"seq": self._seq, "op": op, "uid": uid, "data": data}, default=str) + "\n")
+            self._wal.flush()
+
+    def recover(self):
+        """Snapshot + replay WAL (baris terakhir yang terpotong dibuang)."""
+        snap = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Snapshot {self.path} rusak, mulai dari WAL saja: {e}")
+        if "signals" in snap and "seq" in snap:
+            signals, self._seq = snap["signals"], int(snap["seq"])
+        else:
+            signals = snap   # format lama signals_active.json: {uid: signal}
+        for uid, s in signals.items():
+            if s.get("status", "OPEN") == "OPEN":
+                self._apply("open", uid, s)
+        replayed = 0
+        for path in (self.wal_path + ".1", self.wal_path):
+            if not os.path.exists(path):
+                continue
+            good = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except ValueError:
+                        break
+                    good += len(line)
+                    if e["seq"] <= self._seq:
+                        continue
+                    self._apply(e["op"], e["uid"], e["data"])
+                    self._seq = e["seq"]
+                    replayed += 1
+            if good != os.path.getsize(path):
+                # baris terakhir terpotong (crash saat menulis): buang supaya append berikutnya terbaca
+                print(f"⚠️ WAL {path} terpotong, dipangkas ke {good} bytes")
+                os.truncate(path, good)
+        # yang dipulihkan dari WAL belum ada di snapshot
+        self._snap_seq = self._seq - replayed
+        if self.signals or replayed:
+            print(f"📂 Registry: {len(self.signals)} signal aktif ({replayed} event dari WAL)")
+
+    def _rotate(self):
+        """Di event loop: salin state + pindahkan WAL aktif ke .wal.1 (event baru ke WAL baru)."""
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+            old = self.wal_path + ".1"
+            if os.path.exists(self.wal_path):
+                if os.path.exists(old):
+                    # snapshot sebelumnya gagal: .wal.1 belum tercakup, sambung saja
+                    with open(self.wal_path) as src, open(old, "a") as dst:
+                        dst.write(src.read())
+                    os.remove(self.wal_path)
+                else:
+                    os.replace(self.wal_path, old)
+            return self._seq, {u: dict(s) for u, s in self.signals.items()}
+
+    def _write(self, seq, signals):
+        with self._write_lock:
+            if seq < self._snap_seq:
+                return   # snapshot yang lebih baru sudah ditulis
+            self._write_locked(seq, signals)
+
+    def _write_locked(self, seq, signals):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"seq": seq, "signals": signals}, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # snapshot sudah mencakup semua event di .wal.1
+        try:
+            os.remove(self.wal_path + ".1")
+        except FileNotFoundError:
+            pass
+        self._snap_seq = max(self._snap_seq, seq)
+
+    def snapshot(self):
+        if not self.dirty:
+            return False
+        self._write(*self._rotate())
+        return True
+
+    async def run_flusher(self, interval=SNAPSHOT_SEC):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.dirty:
+                    await asyncio.to_thread(self._write, *self._rotate())
+            except Exception as e:
+                print(f"⚠️ Registry snapshot error: {e}")
+
+
+_registry = None
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = SignalRegistry()
+        atexit.register(_registry.snapshot)
+    return _registry
@@ -1,42 +1,174 @@
 
-import json, os
+import asyncio, atexit, json, os
 from datetime import datetime, timezone
 
 from .data_store import load_json, save_json, append_history
+from .shard import SHARD_ID
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+# worker shard menulis counter trade yang dia tutup sendiri ke data/shards/<SHARD_ID>/
+STATS_DIR = os.path.join(DATA_DIR, "shards", SHARD_ID) if SHARD_ID else None
+FLUSH_INTERVAL = int(os.getenv("STATS_FLUSH_SEC", "60"))
+RECENT_TRADES = int(os.getenv("STATS_RECENT_TRADES", "5000"))
+HOURLY_KEEP = 24 * 31
 
-def record_result(entry):
-    # entry must contain: symbol, tf, side, entry, exit, result, profit_percent, timestamp
-    append_history(entry)
-    # update daily
-    daily = load_json("daily_stats.json") or {}
-    d = entry.get("timestamp", datetime.now(timezone.utc).isoformat())[:10]
-    rec = daily.get(d, {"total":0,"wins":0,"losses":0,"pnl":0.0})
+def _empty():
+    return {"total":0,"wins":0,"losses":0,"pnl":0.0}
+
+def _add(rec, profit):
     rec["total"] += 1
-    if entry["profit_percent"] >= 0:
+    if profit >= 0:
         rec["wins"] += 1
     else:
         rec["losses"] += 1
-    rec["pnl"] += entry["profit_percent"]
-    daily[d] = rec
-    save_json("daily_stats.json", daily)
-    # update monthly
-    monthly = load_json("monthly_stats.json") or {}
-    m = d[:7]
-    rec2 = monthly.get(m, {"total":0,"wins":0,"losses":0,"pnl":0.0})
-    rec2["total"] += 1
-    if entry["profit_percent"] >= 0:
-        rec2["wins"] += 1
-    else:
-        rec2["losses"] += 1
-    rec2["pnl"] += entry["profit_percent"]
-    monthly[m] = rec2
-    save_json("monthly_stats.json", monthly)
+    rec["pnl"] += profit
+
+def confidence_bucket(conf):
+    if conf is None:
+        return "unknown"
+    lo = int(conf) // 5 * 5
+    return f"{lo}-{lo+4}"
+
+
+class StatsAggregator:
+    """
+    In-memory win/loss/PnL counters updated in O(1) per closed trade.
+
+    Daily and monthly counters keep the daily_stats.json / monthly_stats.json
+    format; per-symbol, per-timeframe and per-confidence counters go to
+    stats_breakdown.json. Files are only written by flush() (interval and
+    shutdown), never on the trade-close path.
+
+    data_dir: folder file stats (default data/, replay menulis ke folder sendiri).
+    load=False: mulai dari nol tanpa membaca file yang sudah ada.
+    """
+
+    def __init__(self, data_dir=None, load=True):
+        self.data_dir = data_dir
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+        self.daily = (load and load_json("daily_stats.json", data_dir)) or {}
+        self.monthly = (load and load_json("monthly_stats.json", data_dir)) or {}
+        breakdown = (load and load_json("stats_breakdown.json", data_dir)) or {}
+        self.by_symbol = breakdown.get("symbol", {})
+        self.by_tf = breakdown.get("timeframe", {})
+        self.by_confidence = breakdown.get("confidence", {})
+        self.hourly = {int(k): v for k, v in breakdown.get("hourly", {}).items()}
+        # prefix sum (wins, pnl) untuk query "N trade terakhir" O(1)
+        self._cum_wins = [0]
+        self._cum_pnl = [0.0]
+        self.dirty = False
+
+    def record(self, entry):
+        profit = entry["profit_percent"]
+        ts = entry.get("timestamp", datetime.now(timezone.utc).isoformat())
+        d = ts[:10]
+        for table, key in (
+            (self.daily, d),
+            (self.monthly, d[:7]),
+            (self.by_symbol, entry.get("symbol") or "unknown"),
+            (self.by_tf, entry.get("timeframe") or entry.get("tf") or "unknown"),
+            (self.by_confidence, confidence_bucket(entry.get("confidence"))),
+        ):
+            rec = table.get(key)
+            if rec is None:
+                rec = table[key] = _empty()
+            _add(rec, profit)
+
+        try:
+            hour = int(datetime.fromisoformat(ts).timestamp() // 3600)
+        except ValueError:
+            hour = int(datetime.now(timezone.utc).timestamp() // 3600)
+        rec = self.hourly.get(hour)
+        if rec is None:
+            rec = self.hourly[hour] = _empty()
+            if len(self.hourly) > HOURLY_KEEP:
+                del self.hourly[min(self.hourly)]
+        _add(rec, profit)
+
+        self._cum_wins.append(self._cum_wins[-1] + (1 if profit >= 0 else 0))
+        self._cum_pnl.append(self._cum_pnl[-1] + profit)
+        if len(self._cum_wins) > 2 * RECENT_TRADES:
+            base_w, base_p = self._cum_wins[-RECENT_TRADES - 1], self._cum_pnl[-RECENT_TRADES - 1]
+            self._cum_wins = [w - base_w for w in self._cum_wins[-RECENT_TRADES - 1:]]
+            self._cum_pnl = [p - base_p for p in self._cum_pnl[-RECENT_TRADES - 1:]]
+        self.dirty = True
+
+    def last_trades(self, n):
+        """Statistik N trade terakhir (maks STATS_RECENT_TRADES)."""
+        n = min(int(n), len(self._cum_wins) - 1)
+        if n <= 0:
+            return _empty()
+        wins = self._cum_wins[-1] - self._cum_wins[-n - 1]
+        return {"total": n, "wins": wins, "losses": n - wins, "pnl": self._cum_pnl[-1] - self._cum_pnl[-n - 1]}
+
+    def rolling_hours(self, hours, now=None):
+        """Statistik trade yang close dalam N jam terakhir."""
+        now = now or datetime.now(timezone.utc)
+        end = int(now.timestamp() // 3600)
+        out = _empty()
+        for h in range(end - int(hours) + 1, end + 1):
+            rec = self.hourly.get(h)
+            if rec:
+                for k in out:
+                    out[k] += rec[k]
+        return out
+
+    def flush(self):
+        if not self.dirty:
+            return False
+        self.dirty = False
+        save_json("daily_stats.json", self.daily, self.data_dir)
+        save_json("monthly_stats.json", self.monthly, self.data_dir)
+        save_json("stats_breakdown.json", {
+            "symbol": self.by_symbol,
+            "timeframe": self.by_tf,
+            "confidence": self.by_confidence,
+            "hourly": {str(k): v for k, v in self.hourly.items()},
+        }, self.data_dir)
+        return True
+
+    async def run_flusher(self, interval=FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Stats flush error: {e}")
+
+
+_stats = None
+
+def get_stats():
+    global _stats
+    if _stats is None:
+        _stats = StatsAggregator(STATS_DIR)
+        atexit.register(_stats.flush)
+    return _stats
+
+async def record_result(entry):
+    # entry must contain: symbol, tf, side, entry, exit, result, profit_percent, timestamp
+    get_stats().record(entry)
+    # append + commit SQLite di thread, bukan di event loop tracker
+    await asyncio.to_thread(append_history, entry)
+
+def daily_all_shards(date_str):
+    """Counter satu hari; mode shard: dijumlah dari file worker lain + memori worker ini."""
+    rec = get_stats().daily.get(date_str)
+    if not SHARD_ID:
+        return rec
+    out = dict(rec) if rec else _empty()
+    root = os.path.join(DATA_DIR, "shards")
+    for worker in os.listdir(root) if os.path.isdir(root) else ():
+        if worker == SHARD_ID:
+            continue
+        other = (load_json("daily_stats.json", os.path.join(root, worker)) or {}).get(date_str)
+        for k in out:
+            out[k] += (other or {}).get(k, 0)
+    return out if out["total"] else None
 
 def generate_daily_report(date_str):
-    daily = load_json("daily_stats.json") or {}
-    rec = daily.get(date_str)
+    rec = daily_all_shards(date_str)
     if not rec:
         return f"No data for {date_str}"
     total = rec["total"]
@@ -49,3 +181,14 @@ Total: {total}
 Wins: {wins} ({win_rate:.1f}%)
 Losses: {losses}
 Avg PnL: {avg:.4f}%"""
+
+def generate_live_report(hours=24, trades=50):
+    """Hit rate live dari counter in-memory (tanpa baca file)."""
+    st = get_stats()
+    lines = ["📊 Live Stats"]
+    for label, rec in ((f"Last {hours}h", st.rolling_hours(hours)), (f"Last {trades} trades", st.last_trades(trades))):
+        total = rec["total"]
+        wr = rec["wins"]/total*100 if total>0 else 0.0
+        avg = rec["pnl"]/total if total>0 else 0.0
+        lines.append(f"{label}: {total} trades | WR {wr:.1f}% | Avg PnL {avg:.4f}%")
+    return "\n".join(lines)
@@ -0,0 +1,420 @@
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+
+import websockets
+
+from utils.kline_decode import is_final_kline
+from utils.metrics import INGEST_LAG, INGEST_SHED, WS_CLOSED, WS_DROPPED, WS_MESSAGES, WS_RECONNECTS, gauge
+
+FSTREAM_BASE = os.getenv("BINANCE_FAPI_URL", "wss://fstream.binance.com")
+# Binance USDT-M: maks 200 stream per koneksi, maks 10 pesan masuk (SUBSCRIBE dll) per detik
+MAX_STREAMS_PER_CONN = int(os.getenv("STREAMS_PER_CONN", "200"))
+CONTROL_INTERVAL = 0.25
+PARAMS_PER_REQUEST = 50
+REBALANCE_SEC = int(os.getenv("REBALANCE_SEC", "300"))
+REBALANCE_RATIO = 1.5
+# frame mentah yang boleh ditahan library websockets; reader memindahkan frame ke intake dalam O(1)
+WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", "1024"))
+# lag (proses - E, dikoreksi selisih jam) di atas ini: candle final hanya masuk history (0 = nonaktif)
+INGEST_LAG_SHED_SEC = float(os.getenv("INGEST_LAG_SHED_SEC", "5"))
+# selisih jam host vs Binance = lag terima terkecil dalam window ini (network normalnya << 1 detik)
+CLOCK_SKEW_WINDOW_SEC = float(os.getenv("CLOCK_SKEW_WINDOW_SEC", "300"))
+CLOCK_SKEW_WARN_SEC = 1.0
+INGEST_YIELD_EVERY = 64   # processor memberi giliran ke reader tiap N pesan
+
+_live_conns = {}
+gauge("ingest_queue_depth", "Candle final di intake per koneksi",
+      lambda: {cid: c.depth for cid, c in _live_conns.items()}, "conn")
+gauge("ingest_lag_max_seconds", "Lag terbesar antar stream per koneksi (pesan terakhir yang diproses)",
+      lambda: {cid: c.max_lag() for cid, c in _live_conns.items()}, "conn")
+gauge("ingest_clock_skew_seconds", "Perkiraan selisih jam host - event time Binance per koneksi",
+      lambda: {cid: c.skew for cid, c in _live_conns.items()}, "conn")
+
+
+def stream_symbol(stream):
+    """'btcusdt@kline_1m' -> 'BTCUSDT'"""
+    return stream.split("@", 1)[0].upper()
+
+
+def _stream_name(raw):
+    """Ambil nama stream dari payload combined stream tanpa parse JSON penuh."""
+    i = raw.find('"stream":"')
+    if i < 0:
+        return None
+    i += 10
+    return raw[i:raw.find('"', i)]
+
+
+def _event_time(raw):
+    """Event time E (ms) dari payload tanpa parse JSON, None kalau tidak ada."""
+    i = raw.find('"E":')
+    if i < 0:
+        return None
+    i += 4
+    j = i
+    while j < len(raw) and raw[j].isdigit():
+        j += 1
+    return int(raw[i:j]) if j > i else None
+
+
+class StreamConnection:
+    """
+    Satu koneksi combined stream (/stream) yang isinya diatur lewat
+    SUBSCRIBE/UNSUBSCRIBE, bukan URL. Setelah reconnect semua stream yang
+    diinginkan di-subscribe ulang.
+
+    Reader dan processor terpisah: reader hanya memindahkan candle final ke
+    FIFO yang tidak pernah di-drop; update non-final tidak punya konsumen
+    (pipeline hanya memproses kline closed) jadi langsung dibuang dan
+    dihitung. Processor memanggil on_message(raw, stale). Lag per stream
+    (waktu proses - E - selisih jam host) di atas INGEST_LAG_SHED_SEC: final
+    dikirim dengan stale=True (history saja, tanpa evaluasi).
+
+    Selisih jam: lag terima terkecil dalam CLOCK_SKEW_WINDOW_SEC dianggap
+    offset jam host terhadap Binance dan dikurangkan, jadi jam host yang
+    maju beberapa detik tidak membuat semua stream dianggap tertinggal.
+    """
+
+    def __init__(self, cid, on_message, base_url=FSTREAM_BASE):
+        self.cid = cid
+        self.url = base_url + "/stream"
+        self.on_message = on_message
+        self.streams = set()
+        self.ws = None
+        self.counts = Counter()        # pesan per stream sejak reset_rates
+        self.since = time.monotonic()
+        self.messages = 0
+        self.reconnects = 0
+        self._m_messages = WS_MESSAGES.labels(conn=cid)
+        self._m_lag = INGEST_LAG.labels(conn=cid)
+        self._m_shed = INGEST_SHED.labels(conn=cid)
+        self._m_closed = WS_CLOSED.labels(conn=cid)
+        self._m_partial = WS_DROPPED.labels(conn=cid, reason="partial")
+        self._finals = deque()         # (stream, raw, E detik) candle final, urut datang
+        self._ready = asyncio.Event()
+        self.lag = {}                  # stream -> lag (detik) pesan terakhir yang diproses
+        self.lagging = set()           # stream dengan lag > INGEST_LAG_SHED_SEC
+        self.partials = 0
+        self.shed = 0
+        self.skew = 0.0                # perkiraan jam host - jam Binance (detik)
+        self._skew_min = [float("inf"), float("inf")]   # lag terima terkecil: window sebelumnya, sekarang
+        self._skew_since = time.monotonic()
+        self._skew_warned = False
+        self._proc = None
+        self._ids = itertools.count(1)
+        self._last_control = 0.0
+        self._control_lock = asyncio.Lock()
+        self._task = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self.streams)
+
+    def start(self):
+        if self._task is None:
+            loop = asyncio.get_running_loop()
+            self._proc = loop.create_task(self._process())
+            self._task = loop.create_task(self.run())
+            _live_conns[self.cid] = self
+        return self._task
+
+    async def close(self):
+        self._closed = True
+        _live_conns.pop(self.cid, None)
+        if self.ws is not None:
+            await self.ws.close()
+        for task in (self._task, self._proc):
+            if task is not None:
+                task.cancel()
+
+    @property
+    def depth(self):
+        return len(self._finals)
+
+    def max_lag(self):
+        return max(self.lag.values(), default=0.0)
+
+    def _intake(self, name, raw):
+        if not is_final_kline(raw):
+            self.partials += 1
+            self._m_partial.inc()
+            return
+        self._m_closed.inc()
+        e = _event_time(raw)
+        if e is not None:
+            e /= 1000
+            self._observe_skew(time.time() - e)
+        self._finals.append((name, raw, e))
+        self._ready.set()
+
+    def _observe_skew(self, recv_lag, now=None):
+        """Minimum lag terima per window (dua window bergulir) = selisih jam host."""
+        now = time.monotonic() if now is None else now
+        if now - self._skew_since >= CLOCK_SKEW_WINDOW_SEC:
+            self._skew_min = [self._skew_min[1], float("inf")]
+            self._skew_since = now
+        if recv_lag < self._skew_min[1]:
+            self._skew_min[1] = recv_lag
+        self.skew = min(self._skew_min)
+        off = abs(self.skew) > CLOCK_SKEW_WARN_SEC
+        if off != self._skew_warned:
+            self._skew_warned = off
+            if off:
+                print(f"⚠️ conn {self.cid}: jam host selisih {self.skew:+.1f}s dari event time Binance, lag dikoreksi")
+            else:
+                print(f"✅ conn {self.cid}: selisih jam host kembali {self.skew:+.2f}s")
+
+    def _is_stale(self, name, e):
+        if e is None:
+            return False
+        lag = time.time() - e - self.skew
+        self.lag[name] = lag
+        self._m_lag.observe(lag)
+        if not INGEST_LAG_SHED_SEC:
+            return False
+        over = lag > INGEST_LAG_SHED_SEC
+        if over != (name in self.lagging):
+            before = len(self.lagging)
+            (self.lagging.add if over else self.lagging.discard)(name)
+            if not before:
+                print(f"⚠️ conn {self.cid}: lag {lag:.1f}s > {INGEST_LAG_SHED_SEC}s, evaluasi stream yang tertinggal di-skip")
+            elif not self.lagging:
+                print(f"✅ conn {self.cid}: lag kembali normal (shed {self.shed} pesan)")
+        return over
+
+    async def _process(self):
+        """Kosongkan intake: candle final urut datang."""
+        n = 0
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._finals:
+                name, raw, e = self._finals.popleft()
+                stale = self._is_stale(name, e)
+                if stale:
+                    self.shed += 1
+                    self._m_shed.inc()
+                try:
+                    await self.on_message(raw, stale)
+                except Exception as e:
+                    print(f"⚠️ conn {self.cid} handler error: {e}")
+                n += 1
+                if n % INGEST_YIELD_EVERY == 0:
+                    await asyncio.sleep(0)  # beri giliran reader
+
+    async def _control(self, method, streams):
+        """Kirim SUBSCRIBE/UNSUBSCRIBE dengan throttle (limit pesan masuk Binance)."""
+        streams = sorted(streams)
+        for i in range(0, len(streams), PARAMS_PER_REQUEST):
+            async with self._control_lock:
+                wait = self._last_control + CONTROL_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                ws = self.ws
+                if ws is None:
+                    return
+                await ws.send(json.dumps({"method": method, "params": streams[i:i + PARAMS_PER_REQUEST], "id": next(self._ids)}))
+                self._last_control = time.monotonic()
+
+    async def subscribe(self, streams):
+        streams = set(streams) - self.streams
+        if not streams:
+            return
+        self.streams |= streams
+        try:
+            await self._control("SUBSCRIBE", streams)
+        except Exception as e:
+            print(f"⚠️ conn {self.cid} SUBSCRIBE gagal (akan diulang saat reconnect): {e}")
+
+    async def unsubscribe(self, streams):
+        streams = set(streams) & self.streams
+        if not streams:
+            return
+        self.streams -= streams
+        for s in streams:
+            self.counts.pop(s, None)
+        try:
+            await self._control("UNSUBSCRIBE", streams)
+        except Exception as e:
+            print(f"⚠️ conn {self.cid} UNSUBSCRIBE gagal: {e}")
+
+    def rate(self):
+        """Pesan per detik sejak reset_rates."""
+        return self.messages / max(time.monotonic() - self.since, 1e-6)
+
+    def symbol_rates(self):
+        dt = max(time.monotonic() - self.since, 1e-6)
+        rates = defaultdict(float)
+        for stream in self.streams:
+            rates[stream_symbol(stream)] += self.counts.get(stream, 0) / dt
+        return rates
+
+    def reset_rates(self):
+        self.counts.clear()
+        self.messages = 0
+        self.since = time.monotonic()
+
+    async def run(self):
+        while not self._closed:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, ping_timeout=10, max_queue=WS_MAX_QUEUE) as ws:
+                    self.ws = ws
+                    print(f"📡 conn {self.cid} connected ({len(self.streams)} streams)")
+                    if self.streams:
+                        await self._control("SUBSCRIBE", self.streams)
+                    async for raw in ws:
+                        name = _stream_name(raw)
+                        if name is None:
+                            continue  # response SUBSCRIBE/UNSUBSCRIBE
+                        self.messages += 1
+                        self._m_messages.inc()
+                        self.counts[name] += 1
+                        self._intake(name, raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ WS error in conn {self.cid}: {e}")
+            finally:
+                self.ws = None
+            if not self._closed:
+                self.reconnects += 1
+                WS_RECONNECTS.inc(conn=self.cid)
+                await asyncio.sleep(5)
+
+
+class StreamManager:
+    """
+    Atur semua koneksi websocket: diff universe symbol baru terhadap yang
+    sedang jalan, SUBSCRIBE/UNSUBSCRIBE di koneksi yang hidup, isi koneksi
+    sampai MAX_STREAMS_PER_CONN, dan rebalance berdasarkan rate pesan.
+    """
+
+    def __init__(self, on_message, stream_names, max_streams=MAX_STREAMS_PER_CONN, base_url=FSTREAM_BASE):
+        self.on_message = on_message
+        self.stream_names = stream_names    # symbol -> list nama stream
+        self.max_streams = max_streams
+        self.base_url = base_url
+        self.conns = []
+        self.owner = {}                     # symbol -> StreamConnection
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+
+    @property
+    def symbols(self):
+        return set(self.owner)
+
+    def _new_conn(self):
+        conn = StreamConnection(next(self._ids), self.on_message, self.base_url)
+        self.conns.append(conn)
+        conn.start()
+        return conn
+
+    def _pick_conn(self, n_streams, pending):
+        """Koneksi dengan rate terendah yang masih muat; buat baru kalau penuh."""
+        load = lambda c: len(c) + len(pending.get(c, ()))
+        fits = [c for c in self.conns if load(c) + n_streams <= self.max_streams]
+        if not fits:
+            return self._new_conn()
+        return min(fits, key=lambda c: (c.rate() if c.messages else 0.0, load(c)))
+
+    async def apply(self, symbols):
+        """
+        Terapkan universe baru. Returns (added, removed) symbol.
+        """
+        async with self._lock:
+            wanted = list(dict.fromkeys(symbols))
+            keep = set(wanted)
+            removed = [s for s in self.owner if s not in keep]
+            added = [s for s in wanted if s not in self.owner]
+
+            by_conn = defaultdict(list)
+            for s in removed:
+                by_conn[self.owner.pop(s)].extend(self.stream_names(s))
+            for conn, streams in by_conn.items():
+                await conn.unsubscribe(streams)
+
+            # semua stream 1 symbol selalu di koneksi yang sama
+            pending = defaultdict(list)
+            for s in added:
+                streams = self.stream_names(s)
+                conn = self._pick_conn(len(streams), pending)
+                pending[conn].extend(streams)
+                self.owner[s] = conn
+            for conn, streams in pending.items():
+                await conn.subscribe(streams)
+
+            await self._drop_empty()
+            if added or removed:
+                print(f"🔁 Universe update: +{len(added)} -{len(removed)} symbols, "
+                      f"{len(self.conns)} conns, {sum(len(c) for c in self.conns)} streams")
+            return added, removed
+
+    def conn_id(self, symbol):
+        """Id koneksi yang memegang symbol (label metrik), "" kalau tidak ada."""
+        conn = self.owner.get(symbol)
+        return conn.cid if conn is not None else ""
+
+    async def close(self):
+        """Tutup semua koneksi (shutdown)."""
+        conns, self.conns = self.conns, []
+        self.owner.clear()
+        await asyncio.gather(*(c.close() for c in conns), return_exceptions=True)
+
+    async def _drop_empty(self):
+        for conn in [c for c in self.conns if not c.streams]:
+            self.conns.remove(conn)
+            await conn.close()
+
+    async def rebalance(self):
+        """
+        Pindahkan symbol dari koneksi tersibuk ke yang paling sepi kalau
+        selisih rate > REBALANCE_RATIO. Subscribe di tujuan dulu, baru
+        unsubscribe di asal, jadi tidak ada candle yang hilang.
+        """
+        async with self._lock:
+            live = [c for c in self.conns if c.messages]
+            if len(live) < 2:
+                return 0
+            busy = max(live, key=lambda c: c.rate())
+            idle = min(live, key=lambda c: c.rate())
+            if busy.rate() <= REBALANCE_RATIO * max(idle.rate(), 1e-6):
+                return 0
+            target = (busy.rate() - idle.rate()) / 2
+            moved = 0.0
+            moves = []
+            for sym, r in sorted(busy.symbol_rates().items(), key=lambda x: -x[1]):
+                streams = self.stream_names(sym)
+                if moved + r > target or len(idle) + len(streams) > self.max_streams:
+                    continue
+                moves.append((sym, streams))
+                moved += r
+            for sym, streams in moves:
+                await idle.subscribe(streams)
+                await busy.unsubscribe(streams)
+                self.owner[sym] = idle
+            for c in self.conns:
+                c.reset_rates()
+            if moves:
+                print(f"⚖️ Rebalanced {len(moves)} symbols conn {busy.cid} -> {idle.cid}")
+            return len(moves)
+
+    async def run_rebalancer(self, interval=REBALANCE_SEC):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                print(f"⚠️ Rebalance error: {e}")
+
+    def stats(self):
+        return [
+            {"conn": c.cid, "streams": len(c), "msg_rate": round(c.rate(), 2), "reconnects": c.reconnects,
+             "queued": c.depth, "lag_max": round(c.max_lag(), 3), "lagging": len(c.lagging),
+             "partials": c.partials, "shed": c.shed, "skew": round(c.skew, 3)}
+            for c in self.conns
+        ]
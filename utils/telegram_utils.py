@@ -1,44 +1,268 @@
 import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+
 from telegram import Bot
+from telegram.error import RetryAfter, TimedOut, NetworkError
 import io
 
+from utils.metrics import CLOSE_TO_ALERT, STAGE_SECONDS, TG_MESSAGES, gauge
+
+# Prioritas antrian: angka kecil dikirim duluan
+PRIORITY_UPDATE = 0   # TP/SL hit
+PRIORITY_SIGNAL = 1   # signal baru
+PRIORITY_INFO = 2     # startup, report, dll
+
+TG_QUEUE_SIZE = int(os.getenv("TG_QUEUE_SIZE", "500"))
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))          # pesan / detik, semua chat
+TG_CHAT_RATE_PER_MIN = float(os.getenv("TG_CHAT_RATE_PER_MIN", "20"))  # limit grup/channel Telegram
+TG_CHAT_BURST = int(os.getenv("TG_CHAT_BURST", "5"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "5"))
+# gabungkan signal yang menumpuk jadi satu pesan digest (0 = nonaktif)
+TG_DIGEST_MIN = int(os.getenv("TG_DIGEST_MIN", "0"))
+TG_DIGEST_MAX = int(os.getenv("TG_DIGEST_MAX", "10"))
+# Bot API lain (mis. stub lokal load test): http://host:port/bot
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+_bots = {}
+_dispatchers = {}
+_TG_ACK = STAGE_SECONDS.labels(stage="tg_ack")
+gauge("telegram_queue_depth", "Pesan yang antri di dispatcher Telegram",
+      lambda: sum(d.depth for d in _dispatchers.values()))
+
+
 def make_bot(token):
-    """Membuat instance Telegram Bot."""
-    return Bot(token=token)
+    """Membuat (atau pakai ulang) instance Telegram Bot untuk token ini."""
+    bot = _bots.get(token)
+    if bot is None:
+        bot = _bots[token] = Bot(token=token, base_url=TELEGRAM_API_URL) if TELEGRAM_API_URL else Bot(token=token)
+    return bot
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def delay(self):
+        """Detik yang harus ditunggu sebelum 1 token tersedia."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds):
+        """Dipanggil setelah RetryAfter: token berikutnya baru ada setelah `seconds`."""
+        self.delay()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class TelegramDispatcher:
+    """
+    Satu antrian kirim Telegram bersama untuk seluruh proses.
 
-async def send_message_async(bot, chat_id, text):
-    """Kirim pesan teks ke Telegram secara aman (support async & sync)."""
-    try:
-        loop = asyncio.get_event_loop()
+    Pesan diproses satu per satu (urutan terjaga per prioritas), dibatasi
+    token bucket global dan per chat, RetryAfter/timeout di-retry, dan TP/SL
+    update selalu didahulukan dari signal baru. Kalau TG_DIGEST_MIN > 0,
+    signal yang menumpuk di antrian digabung jadi satu pesan digest.
+    """
 
-        # Jalankan fungsi send_message di executor biar blocking-safe
-        def _send():
-            resp = bot.send_message(chat_id=chat_id, text=text)
-            # handle kalau hasilnya coroutine
-            if asyncio.iscoroutine(resp):
-                return asyncio.run(resp)
-            return resp
+    def __init__(self, bot, maxsize=TG_QUEUE_SIZE, digest_min=TG_DIGEST_MIN):
+        self.bot = bot
+        self.maxsize = maxsize
+        self._heap = []            # (priority, seq, job)
+        self._wakeup = None
+        self.digest_min = digest_min
+        self.global_bucket = TokenBucket(TG_GLOBAL_RATE, TG_GLOBAL_RATE)
+        self.chat_buckets = {}
+        self._seq = itertools.count()
+        self._worker = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.digests = 0
+        self.latencies = deque(maxlen=500)   # enqueue -> ack (detik)
 
-        response = await loop.run_in_executor(None, _send)
+    def start(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return self._worker
 
-        print(f"✅ Message sent to {chat_id} successfully (message_id: {getattr(response, 'message_id', 'N/A')})")
+    @property
+    def depth(self):
+        return len(self._heap)
+
+    def enqueue(self, chat_id, text=None, priority=PRIORITY_SIGNAL, photo=None, caption=None, parse_mode=None,
+                origin=None):
+        """
+        Masukkan pesan ke antrian. Returns future yang selesai dengan True/False
+        setelah Telegram ack, atau None kalau antrian penuh (pesan di-drop).
+        TP/SL update tidak pernah di-drop: pesan prioritas terendah dibuang dulu.
+        origin: epoch close candle pemicu, untuk metrik latency close -> alert.
+        """
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        job = {
+            "chat_id": chat_id, "text": text, "photo": photo, "caption": caption,
+            "parse_mode": parse_mode, "priority": priority,
+            "enqueued": time.monotonic(), "origin": origin, "future": fut,
+        }
+        if len(self._heap) >= self.maxsize and not (priority == PRIORITY_UPDATE and self._evict_lowest()):
+            self.dropped += 1
+            TG_MESSAGES.inc(result="dropped")
+            print(f"⚠️ Telegram queue penuh, pesan ke {chat_id} di-drop")
+            return None
+        heapq.heappush(self._heap, (priority, next(self._seq), job))
+        self._wakeup.set()
+        return fut
+
+    def _evict_lowest(self):
+        worst = max(self._heap, key=lambda it: (it[0], it[1]))
+        if worst[0] == PRIORITY_UPDATE:
+            return False
+        self._heap.remove(worst)
+        heapq.heapify(self._heap)
+        worst[2]["future"].set_result(False)
+        self.dropped += 1
+        TG_MESSAGES.inc(result="dropped")
         return True
-    except Exception as e:
-        print(f"⚠️ Failed to send message to {chat_id}: {e}")
+
+    def _bucket(self, chat_id):
+        b = self.chat_buckets.get(chat_id)
+        if b is None:
+            b = self.chat_buckets[chat_id] = TokenBucket(TG_CHAT_RATE_PER_MIN / 60.0, TG_CHAT_BURST)
+        return b
+
+    def _take_digest(self, job):
+        """Ambil signal lain untuk chat yang sama yang sudah antri, gabungkan."""
+        same = sorted(it for it in self._heap if it[0] == PRIORITY_SIGNAL and it[2]["chat_id"] == job["chat_id"]
+                      and it[2]["photo"] is None)
+        if len(same) + 1 < self.digest_min:
+            return [job]
+        same = same[:TG_DIGEST_MAX - 1]
+        taken = {id(it[2]) for it in same}
+        self._heap = [it for it in self._heap if id(it[2]) not in taken]
+        heapq.heapify(self._heap)
+        return [job] + [it[2] for it in same]
+
+    async def _run(self):
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            _, _, job = heapq.heappop(self._heap)
+            jobs = [job]
+            if self.digest_min and job["priority"] == PRIORITY_SIGNAL and job["photo"] is None:
+                jobs = self._take_digest(job)
+            if len(jobs) > 1:
+                self.digests += 1
+                n = len(jobs)
+                text = f"📦 *{n} signals*\n\n" + "\n\n━━━━━━━━━━\n\n".join(j["text"] for j in jobs)
+                ok = await self._deliver(dict(job, text=text))
+            else:
+                ok = await self._deliver(job)
+            now, wall = time.monotonic(), time.time()
+            for j in jobs:
+                self.latencies.append(now - j["enqueued"])
+                _TG_ACK.observe(now - j["enqueued"])
+                if ok and j["origin"]:
+                    CLOSE_TO_ALERT.observe(wall - j["origin"])
+                if not j["future"].done():
+                    j["future"].set_result(ok)
+
+    async def _deliver(self, job):
+        chat_bucket = self._bucket(job["chat_id"])
+        for attempt in range(TG_MAX_RETRIES):
+            while True:
+                wait = max(self.global_bucket.delay(), chat_bucket.delay())
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.global_bucket.take()
+            chat_bucket.take()
+            try:
+                if job["photo"] is not None:
+                    resp = await self.bot.send_photo(chat_id=job["chat_id"], photo=job["photo"], caption=job["caption"])
+                else:
+                    resp = await self.bot.send_message(chat_id=job["chat_id"], text=job["text"], parse_mode=job["parse_mode"])
+                self.sent += 1
+                TG_MESSAGES.inc(result="sent")
+                print(f"✅ Message sent to {job['chat_id']} successfully (message_id: {getattr(resp, 'message_id', 'N/A')})")
+                return True
+            except RetryAfter as e:
+                self.retries += 1
+                TG_MESSAGES.inc(result="retry")
+                wait = float(e.retry_after)
+                print(f"⏳ Telegram flood control, retry in {wait}s")
+                chat_bucket.block(wait)
+                self.global_bucket.block(wait)
+            except (TimedOut, NetworkError) as e:
+                self.retries += 1
+                TG_MESSAGES.inc(result="retry")
+                await asyncio.sleep(min(2 ** attempt, 30))
+                print(f"⚠️ Telegram network error ({e}), retry {attempt + 1}")
+            except Exception as e:
+                print(f"⚠️ Telegram error: {e}")
+                break
+        self.failed += 1
+        TG_MESSAGES.inc(result="failed")
+        print(f"⚠️ Failed to send message to {job['chat_id']}")
         return False
 
-async def send_photo_async(bot, chat_id, photo_bytesio, caption=None):
+    def stats(self):
+        lat = sorted(self.latencies)
+        pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 3) if lat else None
+        return {
+            "queue_depth": len(self._heap),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "digests": self.digests,
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+        }
+
+
+def get_dispatcher(bot):
+    """Dispatcher bersama per bot (dibuat saat pertama dipakai)."""
+    key = getattr(bot, "token", id(bot))
+    d = _dispatchers.get(key)
+    if d is None:
+        d = _dispatchers[key] = TelegramDispatcher(bot)
+    return d
+
+
+async def send_message_async(bot, chat_id, text, priority=PRIORITY_SIGNAL, wait=False, parse_mode=None, origin=None):
+    """
+    Kirim pesan teks ke Telegram lewat dispatcher bersama.
+    Default hanya masuk antrian (returns True kalau ter-antri); wait=True
+    menunggu sampai Telegram ack dan mengembalikan hasil kirimnya.
+    """
+    fut = get_dispatcher(bot).enqueue(chat_id, text, priority=priority, parse_mode=parse_mode, origin=origin)
+    if fut is None:
+        return False
+    if wait:
+        return await fut
+    return True
+
+async def send_photo_async(bot, chat_id, photo_bytesio, caption=None, priority=PRIORITY_SIGNAL, wait=False,
+                           origin=None):
     """Kirim foto/chart ke Telegram."""
-    try:
-        loop = asyncio.get_event_loop()
-
-        def _send_photo():
-            resp = bot.send_photo(chat_id=chat_id, photo=photo_bytesio, caption=caption)
-            if asyncio.iscoroutine(resp):
-                return asyncio.run(resp)
-            return resp
-
-        await loop.run_in_executor(None, _send_photo)
-        print(f"📸 Photo sent to {chat_id} successfully")
-    except Exception as e:
-        print(f"⚠️ Failed to send photo to {chat_id}: {e}")
+    fut = get_dispatcher(bot).enqueue(chat_id, priority=priority, photo=photo_bytesio, caption=caption, origin=origin)
+    if fut is None:
+        return False
+    if wait:
+        return await fut
+    return True
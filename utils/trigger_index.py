@@ -0,0 +1,123 @@
+
+import heapq
+from collections import defaultdict
+
+
+def resolve_hit(s, high, low):
+    """
+    Cek level TP/SL terhadap range harga (high/low) sejak evaluasi terakhir.
+    Prioritas: TP3 > TP2 > TP1 > SL.
+    """
+    tp1, tp2, tp3, sl = s["tp1"], s["tp2"], s["tp3"], s["sl"]
+    if s["side"]=="buy":
+        if high >= tp3: return ("TP3", tp3)
+        elif high >= tp2: return ("TP2", tp2)
+        elif high >= tp1: return ("TP1", tp1)
+        elif low <= sl: return ("SL", sl)
+    else:
+        if low <= tp3: return ("TP3", tp3)
+        elif low <= tp2: return ("TP2", tp2)
+        elif low <= tp1: return ("TP1", tp1)
+        elif high >= sl: return ("SL", sl)
+    return None
+
+
+class TriggerIndex:
+    """
+    Per-symbol heaps of trigger levels for open signals.
+
+    Levels that fire on a rising price (buy TPs, short SL) live in a min-heap,
+    levels that fire on a falling price (buy SL, short TPs) in a max-heap. Only
+    the nearest level per direction is indexed; once it fires, resolve_hit
+    picks the final tag with the usual precedence. Removal is lazy, so add and
+    remove are O(log n) / O(1) and a price update only touches fired entries.
+    """
+
+    def __init__(self):
+        self._up = defaultdict(list)     # symbol -> [(level, seq, uid)]
+        self._down = defaultdict(list)   # symbol -> [(-level, seq, uid)]
+        self._signals = {}               # uid -> (seq, signal)
+        self._stale = defaultdict(int)
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._signals)
+
+    def __contains__(self, uid):
+        return uid in self._signals
+
+    def add(self, uid, s):
+        if uid in self._signals:
+            self.remove(uid)
+        self._seq += 1
+        seq = self._seq
+        sym = s["symbol"]
+        self._signals[uid] = (seq, s)
+        if s["side"] == "buy":
+            up, down = min(s["tp1"], s["tp2"], s["tp3"]), s["sl"]
+        else:
+            up, down = s["sl"], max(s["tp1"], s["tp2"], s["tp3"])
+        heapq.heappush(self._up[sym], (up, seq, uid))
+        heapq.heappush(self._down[sym], (-down, seq, uid))
+
+    def remove(self, uid):
+        item = self._signals.pop(uid, None)
+        if item is None:
+            return None
+        sym = item[1]["symbol"]
+        self._stale[sym] += 1
+        if self._stale[sym] > 64 and self._stale[sym] > len(self._up[sym]) // 2:
+            self._compact(sym)
+        return item[1]
+
+    def _alive(self, seq, uid):
+        item = self._signals.get(uid)
+        return item is not None and item[0] == seq
+
+    def _compact(self, sym):
+        self._up[sym] = [e for e in self._up[sym] if self._alive(e[1], e[2])]
+        self._down[sym] = [e for e in self._down[sym] if self._alive(e[1], e[2])]
+        heapq.heapify(self._up[sym])
+        heapq.heapify(self._down[sym])
+        self._stale[sym] = 0
+
+    def match(self, sym, high, low=None):
+        """
+        Ambil semua signal symbol ini yang kena TP/SL pada range high/low.
+        Signal yang kena langsung dikeluarkan dari index.
+        Returns list of (uid, signal, (tag, level)).
+        """
+        low = high if low is None else low
+        fired = []
+        up = self._up.get(sym)
+        while up and up[0][0] <= high:
+            _, seq, uid = heapq.heappop(up)
+            if self._alive(seq, uid):
+                fired.append(uid)
+        down = self._down.get(sym)
+        while down and -down[0][0] >= low:
+            _, seq, uid = heapq.heappop(down)
+            if self._alive(seq, uid):
+                fired.append(uid)
+
+        out = []
+        for uid in dict.fromkeys(fired):
+            s = self._signals[uid][1]
+            hit = resolve_hit(s, high, low)
+            if hit:
+                out.append((uid, s, hit))
+                self.remove(uid)
+            else:
+                self.add(uid, s)  # level terdekat berubah (data signal diedit)
+        return out
+
+    def match_except(self, sym, high, low, skip):
+        """Seperti match, tapi signal di skip (uid) tidak dicek dan tetap di index."""
+        held = [(uid, self._signals[uid][1]) for uid in skip if uid in self._signals]
+        for uid, _ in held:
+            self.remove(uid)
+        try:
+            return self.match(sym, high, low)
+        finally:
+            for uid, s in held:
+                self.add(uid, s)
@@ -0,0 +1,177 @@
+"""
+Ranking top volume live dari stream !ticker@arr (update tiap ~1 detik untuk
+symbol yang berubah), menggantikan download /ticker/24hr per jam.
+"""
+import asyncio
+import heapq
+import json
+import os
+import time
+
+import websockets
+
+TICKER_STREAM = os.getenv("BINANCE_FAPI_URL", "wss://fstream.binance.com") + "/ws/!ticker@arr"
+# symbol di luar top-K tetap dipertahankan selama masih di top-(K + band)
+RANK_EXIT_BAND = int(os.getenv("RANK_EXIT_BAND", "5"))
+# penantang baru menggeser anggota terlemah hanya kalau volumenya lebih besar sekian persen
+RANK_SWAP_MARGIN = float(os.getenv("RANK_SWAP_MARGIN", "0.10"))
+RANK_EVAL_SEC = float(os.getenv("RANK_EVAL_SEC", "5"))
+RANK_STALE_SEC = 120
+
+
+class VolumeRanking:
+    """
+    Top-K symbol berdasarkan quote volume 24 jam dengan hysteresis:
+    - anggota keluar hanya kalau jatuh di bawah peringkat K + exit_band,
+    - non-anggota di top-K masuk kalau ada slot kosong, atau kalau volumenya
+      > (1 + swap_margin) x anggota terlemah (yang lalu digeser keluar).
+    Jadi symbol di sekitar batas tidak keluar-masuk tiap update.
+
+    Kandidat top-(K + band) dijaga incremental dengan dua heap (min-heap
+    kandidat, max-heap sisanya, entry lama dibuang lazy): update satu symbol
+    O(log n), rerank hanya menukar symbol di sekitar batas, bukan sort ulang
+    semua volume.
+    """
+
+    def __init__(self, k, exit_band=RANK_EXIT_BAND, swap_margin=RANK_SWAP_MARGIN, on_change=None):
+        self.k = k
+        self.exit_band = exit_band
+        self.swap_margin = swap_margin
+        self.on_change = on_change     # on_change(top) dipanggil kalau anggota top-K berubah
+        self.volumes = {}              # symbol -> quote volume 24 jam
+        self.allowed = None            # set symbol yang boleh di-ranking (TRADING), None = semua USDT
+        self.members = set()
+        self.cands = set()             # top-(K + band) menurut volume
+        self._cand_heap = []           # (volume, symbol) kandidat, terlemah di atas
+        self._rest_heap = []           # (-volume, symbol) non-kandidat, terkuat di atas
+        self.updated = 0.0             # time.monotonic() update terakhir dari stream/REST
+        self._dirty = False
+
+    def update(self, tickers):
+        """Masukkan ticker dari stream (s, q) atau REST /ticker/24hr (symbol, quoteVolume)."""
+        if not tickers:
+            return
+        for t in tickers:
+            sym = t.get("s") or t.get("symbol")
+            if not sym or not sym.endswith("USDT"):
+                continue
+            if self.allowed is not None and sym not in self.allowed:
+                continue
+            v = float(t.get("q") or t.get("quoteVolume") or 0.0)
+            if self.volumes.get(sym) == v:
+                continue
+            self.volumes[sym] = v
+            self._push(sym, v)
+        self.updated = time.monotonic()
+        self._dirty = True
+
+    def _push(self, sym, v):
+        if sym in self.cands:
+            heapq.heappush(self._cand_heap, (v, sym))
+        else:
+            heapq.heappush(self._rest_heap, (-v, sym))
+
+    def _peek(self, heap, in_cands):
+        """Entry valid teratas (volume terkini, sisi yang benar); entry basi dibuang."""
+        while heap:
+            v, sym = heap[0]
+            if (sym in self.cands) == in_cands and self.volumes.get(sym) == abs(v):
+                return sym
+            heapq.heappop(heap)
+        return None
+
+    def _compact(self):
+        """Heap penuh entry basi (volume sudah berubah): bangun ulang dari state sekarang."""
+        vol = self.volumes
+        self._cand_heap = [(vol[s], s) for s in self.cands]
+        self._rest_heap = [(-v, s) for s, v in vol.items() if s not in self.cands]
+        heapq.heapify(self._cand_heap)
+        heapq.heapify(self._rest_heap)
+
+    def _rebalance(self):
+        """Jaga cands = top-(K + band): isi slot kosong, tukar selama non-kandidat terkuat > kandidat terlemah."""
+        if len(self._cand_heap) + len(self._rest_heap) > 4 * len(self.volumes) + 64:
+            self._compact()
+        n = self.k + self.exit_band
+        vol = self.volumes
+        while True:
+            best = self._peek(self._rest_heap, False)
+            if best is None:
+                return
+            if len(self.cands) < n:
+                heapq.heappop(self._rest_heap)
+                self.cands.add(best)
+                heapq.heappush(self._cand_heap, (vol[best], best))
+                continue
+            worst = self._peek(self._cand_heap, True)
+            if vol[best] <= vol[worst]:
+                return
+            heapq.heappop(self._rest_heap)
+            heapq.heappop(self._cand_heap)
+            self.cands.discard(worst)
+            self.cands.add(best)
+            heapq.heappush(self._cand_heap, (vol[best], best))
+            heapq.heappush(self._rest_heap, (-vol[worst], worst))
+
+    def set_allowed(self, symbols):
+        self.allowed = set(symbols)
+        for sym in [s for s in self.volumes if s not in self.allowed]:
+            del self.volumes[sym]
+        self.members &= self.allowed
+        self.cands &= self.allowed     # entry heap symbol yang dibuang jadi basi
+        self._dirty = True
+
+    @property
+    def stale(self):
+        return time.monotonic() - self.updated > RANK_STALE_SEC
+
+    def top(self):
+        """Anggota saat ini, urut volume terbesar."""
+        return sorted(self.members, key=lambda s: -self.volumes.get(s, 0.0))
+
+    def rerank(self):
+        """Hitung ulang anggota dari kandidat top-(K + band). Returns True kalau berubah."""
+        if not self._dirty:
+            return False
+        self._dirty = False
+        self._rebalance()
+        vol = self.volumes
+        ranked = sorted(self.cands, key=vol.__getitem__, reverse=True)
+        keep = self.members.intersection(ranked)
+        for sym in ranked[:self.k]:
+            if sym in keep:
+                continue
+            if len(keep) < self.k:
+                keep.add(sym)
+                continue
+            weakest = min(keep, key=vol.__getitem__)
+            if vol[sym] > vol[weakest] * (1 + self.swap_margin):
+                keep.discard(weakest)
+                keep.add(sym)
+        changed = keep != self.members
+        self.members = keep
+        return changed
+
+    async def _maybe_publish(self):
+        if self.rerank() and self.on_change is not None:
+            res = self.on_change(self.top())
+            if asyncio.iscoroutine(res):
+                await res
+
+    async def run(self, url=TICKER_STREAM, eval_every=RANK_EVAL_SEC):
+        """Ikuti stream !ticker@arr; ranking dievaluasi tiap eval_every detik."""
+        while True:
+            try:
+                async with websockets.connect(url, ping_interval=20, ping_timeout=10, max_size=None) as ws:
+                    print("📊 Ticker stream connected")
+                    last_eval = 0.0
+                    async for raw in ws:
+                        self.update(json.loads(raw))
+                        if time.monotonic() - last_eval >= eval_every:
+                            last_eval = time.monotonic()
+                            await self._maybe_publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Ticker stream error: {e}")
+            await asyncio.sleep(5)